@@ -0,0 +1,527 @@
+"""Бенчмарки bunker.py.
+
+Запуск (з директорії, де лежить data.json) — усе офлайн, файли пишуться у тимчасову директорію:
+    python benchmarks.py
+    python benchmarks.py generate persistence --sizes 5 500 --scales 1 10
+    python benchmarks.py --output results.json
+    python benchmarks.py --baseline results.json
+
+Кожен бенчмарк проганяється для кожного масштабу каталогу (--scales: data.json,
+розмножений у N разів) і, де це має сенс, для кожного розміру лобі (--sizes).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from array import array
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bunker
+
+DEFAULT_SIZES = [5, 50, 500, 5000]
+DEFAULT_SCALES = [1, 10]
+RESULTS_VERSION = 1
+
+# ================ СИНТЕТИЧНИЙ КАТАЛОГ ================
+
+def _card_copy(entry, copy: int):
+    if isinstance(entry, dict):
+        return {**entry, "card": f"{entry['card']} #{copy}"}
+    return f"{entry} #{copy}"
+
+def scale_data(raw: dict, factor: int) -> dict:
+    """Розмножує картки сирого data.json у factor разів.
+
+    Копії отримують суфікс " #k", тож лишаються унікальними картками,
+    а кількість дублікатів і рідкісність кожної картки у копіях зберігаються.
+    """
+    scaled = dict(raw)
+    for section in bunker.CARD_SECTIONS:
+        cards = raw.get(section, [])
+        scaled[section] = cards + [_card_copy(card, copy) for copy in range(2, factor + 1) for card in cards]
+
+    stages = raw.get("health_with_stages", {})
+    scaled["health_with_stages"] = dict(stages)
+    for copy in range(2, factor + 1):
+        scaled["health_with_stages"].update((f"{name} #{copy}", value) for name, value in stages.items())
+    return scaled
+
+def write_scaled_data(source: str, target: str, factor: int) -> None:
+    """Записує розмножений у factor разів data.json."""
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(scale_data(bunker.load_json_file(source), factor), f, ensure_ascii=False)
+
+# ================ ВИМІРЮВАННЯ ================
+
+class BenchContext:
+    """Каталог одного масштабу та тимчасова директорія для файлів бенчмарків."""
+
+    __slots__ = ("data", "data_path", "workdir", "scale", "sizes", "repeat", "number")
+
+    def __init__(self, data: dict, data_path: str, workdir: str, scale: int, args: argparse.Namespace):
+        self.data = data
+        self.data_path = data_path
+        self.workdir = workdir
+        self.scale = scale
+        self.sizes = args.sizes
+        self.repeat = args.repeat
+        self.number = args.number
+
+    def lobby(self, size: int, seed: int = 0) -> dict:
+        """Свіжа сесія на size гравців, чиї файли пишуться у тимчасову директорію."""
+        names = [f"Гравець {i}" for i in range(1, size + 1)]
+        state = bunker.create_session_state(names, self.data, seed=seed)
+        state["_dir"] = os.path.join(self.workdir, f"lobby_{size}")
+        bunker.ensure_players_dir(state["_dir"])
+        return state
+
+def measure(name: str, ctx: BenchContext, run: Callable, setup: Optional[Callable] = None,
+            players: Optional[int] = None) -> dict:
+    """Вимірює run: найкращий із ctx.repeat запусків та пік пам'яті (tracemalloc).
+
+    setup (якщо є) готує аргумент для run і не входить у час; пам'ять
+    міряється окремим запуском, бо tracemalloc сам уповільнює код.
+    """
+    times = []
+    for _ in range(ctx.repeat):
+        arg = setup() if setup else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            run(arg)
+            times.append(time.perf_counter() - started)
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    result = {
+        "benchmark": name,
+        "scale": ctx.scale,
+        "players": players,
+        "best_ms": best * 1000,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "ops_per_sec": 1 / best if best else 0.0,
+        "peak_kib": peak / 1024,
+    }
+    print_result(result)
+    return result
+
+def print_result(result: dict) -> None:
+    players = f"{result['players']:>5} гравців" if result["players"] is not None else " " * 13
+    print(f"  {result['benchmark']:<26} x{result['scale']:<4} {players}  "
+          f"{result['best_ms']:10.2f} мс  {result['ops_per_sec']:10.1f} оп/с  {result['peak_kib']:10.0f} КіБ")
+
+# ================ ЗДОРОВ'Я ================
+
+def legacy_health(health_pool: list, data: dict, rng: random.Random, used_health: set) -> str:
+    """Стара реалізація: список усіх хвороб перебудовується на кожен виклик."""
+    health_with_stages = data.get("health_with_stages", {})
+    all_health = (
+        [h for h in health_pool if h not in used_health] +
+        [d for d in data.get("health_staged", []) if d not in used_health]
+    )
+
+    if not all_health:
+        return "-"
+
+    health = rng.choice(all_health)
+    used_health.add(health)
+
+    if health in health_with_stages:
+        stage = rng.choice(health_with_stages[health])
+        return f"{health} ({stage})"
+    return health
+
+def bench_health(ctx: BenchContext) -> List[dict]:
+    """Порівнює стару перебудову списку з HealthSampler."""
+    data, number = ctx.data, ctx.number
+    rng = random.Random(0)
+    health_pool = bunker.CardPool(data["health"], bunker.section_indices(data, "health"))
+    sampler = bunker.health_sampler(data)
+
+    cases = {
+        "перебудова списку": lambda: legacy_health(health_pool, data, rng, set()),
+        "HealthSampler": lambda: sampler.draw(rng, set()),
+    }
+
+    print(f"Здоров'я: {len(sampler)} варіантів, {number} вибірок")
+    return compare_calls(ctx, "health", cases)
+
+def compare_calls(ctx: BenchContext, name: str, cases: Dict[str, Callable]) -> List[dict]:
+    """Час одного виклику кожного варіанта (мкс) відносно першого з них."""
+    number = ctx.number
+    baseline = None
+    results = []
+    for label, case in cases.items():
+        elapsed = min(timeit.repeat(case, number=number, repeat=5))
+        per_call = elapsed / number * 1e6
+        baseline = baseline or per_call
+        print(f"  {label:<20} {per_call:8.2f} мкс/виклик  (x{baseline / per_call:.1f})")
+        results.append({
+            "benchmark": f"{name}[{label}]",
+            "scale": ctx.scale,
+            "players": None,
+            "best_ms": per_call / 1000,
+            "mean_ms": per_call / 1000,
+            "ops_per_sec": 1e6 / per_call,
+            "peak_kib": 0.0,
+        })
+    return results
+
+def bench_weighted(ctx: BenchContext) -> List[dict]:
+    """Зважений вибір картки: random.choices (з готовими сумами ваг чи без) проти AliasTable.
+
+    Рідкісності задаються випадково (0.1–10) для карток найбільшої секції,
+    тож результат не залежить від того, чи є ваги у data.json.
+    """
+    data = ctx.data
+    rng = random.Random(0)
+    section = max(bunker.POOL_NAMES, key=lambda name: len(data.get(name, [])))
+    slots = bunker.section_indices(data, section)
+    weights = [rng.uniform(0.1, 10) for _ in slots]
+    cum_weights = list(accumulate(weights))
+    table = bunker.AliasTable(weights)
+
+    cases = {
+        "random.choices": lambda: rng.choices(slots, weights)[0],
+        "choices+cum_weights": lambda: rng.choices(slots, cum_weights=cum_weights)[0],
+        "AliasTable": lambda: slots[table.sample(rng)],
+    }
+
+    print(f"Зважений вибір: {section}, {len(slots)} карток, {ctx.number} вибірок")
+    results = compare_calls(ctx, "weighted", cases)
+
+    order = array(bunker._index_typecode(len(data[section])), slots)
+    results.append(measure("weighted[колода]", ctx, lambda _: bunker.weighted_order(order, weights, rng, table)))
+    return results
+
+# ================ ГЕНЕРАЦІЯ ТА РЕГЕНЕРАЦІЯ ================
+
+def bench_generate(ctx: BenchContext) -> List[dict]:
+    """generate_players для кожного розміру лобі."""
+    results = []
+    for size in ctx.sizes:
+        names = [f"Гравець {i}" for i in range(1, size + 1)]
+        results.append(measure(
+            "generate_players", ctx,
+            lambda rng: bunker.generate_players(names, ctx.data, rng=rng),
+            setup=lambda: random.Random(size),
+            players=size,
+        ))
+    return results
+
+def bench_bulk(ctx: BenchContext) -> List[dict]:
+    """Векторна генерація (generate_players_bulk) проти generate_players для кожного розміру лобі.
+
+    Окремо міряються витягання масивів і складання рядків (PlayerBatch.players).
+    Без NumPy бенчмарк пропускається.
+    """
+    if bunker.load_numpy() is None:
+        print("Векторна генерація: NumPy не встановлено — пропущено")
+        return []
+
+    results = []
+    for size in ctx.sizes:
+        names = [f"Гравець {i}" for i in range(1, size + 1)]
+        loop = measure(
+            "bulk[цикл]", ctx,
+            lambda rng: bunker.generate_players(names, ctx.data, rng=rng),
+            setup=lambda: random.Random(size),
+            players=size,
+        )
+        draw = measure(
+            "bulk[масиви]", ctx,
+            lambda seed: bunker.generate_players_bulk(names, ctx.data, seed=seed),
+            setup=lambda: size,
+            players=size,
+        )
+        full = measure(
+            "bulk[масиви+рядки]", ctx,
+            lambda seed: bunker.generate_players_bulk(names, ctx.data, seed=seed)[0].players(),
+            setup=lambda: size,
+            players=size,
+        )
+        print(f"  {size} гравців: прискорення x{loop['best_ms'] / draw['best_ms']:.1f} (масиви), "
+              f"x{loop['best_ms'] / full['best_ms']:.1f} (з рядками)")
+        results += [loop, draw, full]
+    return results
+
+def bench_regen_all(ctx: BenchContext) -> List[dict]:
+    """regen_all_players (професії, зі збереженням змінених карток) для кожного розміру лобі."""
+    results = []
+    for size in ctx.sizes:
+        results.append(measure(
+            "regen_all_players", ctx,
+            lambda state: bunker.regen_all_players(state, ctx.data, "job"),
+            setup=lambda: ctx.lobby(size),
+            players=size,
+        ))
+    return results
+
+def bench_regen_player(ctx: BenchContext) -> List[dict]:
+    """regen_player_completely одного гравця — вартість залежить від розміру пулів."""
+    results = []
+    for size in ctx.sizes:
+        results.append(measure(
+            "regen_player_completely", ctx,
+            lambda state: bunker.regen_player_completely(state, ctx.data, "Гравець 1"),
+            setup=lambda: ctx.lobby(size),
+            players=size,
+        ))
+    return results
+
+# ================ ЗБЕРЕЖЕННЯ ТА СТАРТ ================
+
+def bench_persistence(ctx: BenchContext) -> List[dict]:
+    """save_state та load_state у поточному форматі (BUNKER_STATE_FORMAT) для кожного розміру лобі."""
+    results = []
+    for size in ctx.sizes:
+        state = ctx.lobby(size)
+        directory = bunker.state_dir(state)
+        results.append(measure("save_state", ctx, lambda _: bunker.save_state(state), players=size))
+        bunker.flush_writes(state)
+        results.append(measure("load_state", ctx, lambda _: bunker.load_state(ctx.data, directory), players=size))
+    return results
+
+def bench_cards(ctx: BenchContext) -> List[dict]:
+    """Запис карток і бункера нового лобі та читання 100 випадкових карток у поточній розкладці (BUNKER_OUTPUT_LAYOUT)."""
+    results = []
+    for size in ctx.sizes:
+        state = ctx.lobby(size)
+        players, lobby_bunker = state["players"], state["bunker"]
+        results.append(measure(
+            "cards[запис]", ctx,
+            lambda directory: bunker.save_lobby_cards(players, lobby_bunker, directory),
+            setup=lambda: tempfile.mkdtemp(dir=ctx.workdir),
+            players=size,
+        ))
+        directory = tempfile.mkdtemp(dir=ctx.workdir)
+        bunker.save_lobby_cards(players, lobby_bunker, directory)
+        names = [bunker.player_card_name(player) for player in random.Random(size).choices(list(players.values()), k=100)]
+        results.append(measure(
+            "cards[читання x100]", ctx,
+            lambda _: [bunker.read_card_text(directory, name) for name in names],
+            players=size,
+        ))
+    return results
+
+def legacy_player(player: bunker.Player) -> dict:
+    """Гравець у старому форматі: словник, де стаж і відсоток — частина рядків карток."""
+    legacy = player.to_dict()
+    legacy["job"] = bunker.job_text(player)
+    legacy["hobies"] = bunker.hobby_text(player)
+    legacy["fobias"] = bunker.fobia_text(player)
+    for field in ("job_level", "hobby_level", "fobia_percent"):
+        del legacy[field]
+    return legacy
+
+def legacy_card(player: dict) -> str:
+    """Стара реалізація: f-рядки для кожного рядка картки (гравця у старому форматі) та format_list."""
+    lines = [
+        f"Гравець: {player['name']}",
+        f"Стать: {player['gender']}, {player['age']} років",
+        f"Статура: {player['body']}, {player['height']} см",
+        f"Риса характеру: {player['trait']}",
+        f"Професія: {player['job']}",
+        f"Здоров'я: {player['health']}",
+        f"Хобі: {player['hobies']}",
+        f"Фобія: {player['fobias']}",
+        f"Додаткові відомості: {player['extra_info']}",
+        f"Великий інвентар: {player['large_inventory']}",
+        f"Рюкзак: {bunker.format_list(player.get('backpack', []))}",
+    ]
+    if player.get("special_cards"):
+        lines.append(f"Спеціальні картки: {bunker.format_list(player['special_cards'])}")
+    return "\n".join(lines)
+
+def bench_render(ctx: BenchContext) -> List[dict]:
+    """Рендеринг карток лобі: старі f-рядки, текст, кожен формат окремо та всі формати за один прохід."""
+    formats = tuple(bunker.CARD_FORMATS)
+    results = []
+    for size in ctx.sizes:
+        players = list(ctx.lobby(size)["players"].values())
+        legacy = [legacy_player(player) for player in players]
+        cases = {
+            "render[f-рядки]": lambda: [legacy_card(player) for player in legacy],
+            "render[txt]": lambda: [bunker.render_player_card(player) for player in players],
+            "render[формати окремо]": lambda: [bunker.render_card(player, (name,))
+                                               for name in formats for player in players],
+            "render[формати разом]": lambda: [bunker.render_card(player, formats) for player in players],
+        }
+        results += [measure(name, ctx, lambda _, case=case: case(), players=size) for name, case in cases.items()]
+    return results
+
+def legacy_fobia_percentage(player: dict, rng: random.Random) -> None:
+    """Стара перегенерація відсотка фобії: рядок розбирається і складається заново."""
+    fobia_name = " ".join(player["fobias"].split()[:-1]) if "%" in player["fobias"] else player["fobias"]
+    player["fobias"] = f"{fobia_name} {rng.randint(33, 100)}%"
+
+def fobia_percentage(player: bunker.Player, rng: random.Random) -> None:
+    player["fobia_percent"] = rng.randint(33, 100)
+
+def bench_players(ctx: BenchContext) -> List[dict]:
+    """Пам'ять гравців лобі (словники зі складеними рядками проти записів Player)
+    та перегенерація відсотка фобії (розбір рядка проти поля-числа)."""
+    results = []
+    for size in ctx.sizes:
+        players = list(ctx.lobby(size)["players"].values())
+        results.append(measure("players[словники]", ctx, lambda _: [legacy_player(player) for player in players],
+                               players=size))
+        results.append(measure("players[Player]", ctx, lambda _: [player.copy() for player in players],
+                               players=size))
+
+    player = ctx.lobby(1)["players"]["Гравець 1"]
+    legacy = legacy_player(player)
+    rng = random.Random(0)
+    cases = {
+        "розбір рядка": lambda: legacy_fobia_percentage(legacy, rng),
+        "поле-число": lambda: fobia_percentage(player, rng),
+    }
+    print(f"Відсоток фобії: {ctx.number} перегенерацій")
+    return results + compare_calls(ctx, "fobia_percent", cases)
+
+def bench_startup(ctx: BenchContext) -> List[dict]:
+    """load_data: компіляція data.json (без кешу), читання заголовка кешу та всіх його секцій."""
+    cache_path = os.path.join(ctx.workdir, "bench.cache")
+
+    def cold(_) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(cache_path)
+        bunker.load_data(ctx.data_path, cache_path)
+
+    results = [measure("load_data[компіляція]", ctx, cold)]
+    bunker.load_data(ctx.data_path, cache_path)
+    results.append(measure("load_data[кеш]", ctx, lambda _: bunker.load_data(ctx.data_path, cache_path)))
+    results.append(measure("load_data[кеш, усі секції]", ctx,
+                           lambda _: bunker.load_data(ctx.data_path, cache_path).materialize()))
+    return results
+
+BENCHMARKS: Dict[str, Callable[[BenchContext], List[dict]]] = {
+    "health": bench_health,
+    "weighted": bench_weighted,
+    "generate": bench_generate,
+    "bulk": bench_bulk,
+    "regen_all": bench_regen_all,
+    "regen_player": bench_regen_player,
+    "persistence": bench_persistence,
+    "cards": bench_cards,
+    "render": bench_render,
+    "players": bench_players,
+    "startup": bench_startup,
+}
+
+# ================ РЕЗУЛЬТАТИ ================
+
+def _result_key(result: dict) -> tuple:
+    return result["benchmark"], result["scale"], result["players"]
+
+def save_results(path: str, results: List[dict]) -> None:
+    """Записує результати у JSON разом з описом середовища."""
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "persistence": bunker.PERSISTENCE_MODE,
+        "state_format": bunker.STATE_FORMAT,
+        "output_layout": bunker.OUTPUT_LAYOUT,
+        "results": results,
+    }
+    bunker.save_json_file(path, report)
+
+def compare_results(baseline_path: str, results: List[dict], tolerance: float) -> bool:
+    """Порівнює результати з базовими; повертає False, якщо щось сповільнилось більше ніж на tolerance."""
+    baseline = {_result_key(result): result for result in bunker.load_json_file(baseline_path)["results"]}
+    regressions = 0
+    print(f"\nПорівняння з {baseline_path} (допуск {tolerance:.0%}):")
+    for result in results:
+        before = baseline.get(_result_key(result))
+        if before is None or not before["best_ms"]:
+            continue
+        ratio = result["best_ms"] / before["best_ms"]
+        marker = ""
+        if ratio > 1 + tolerance:
+            marker = "  ⚠️ повільніше"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            marker = "  ✅ швидше"
+        players = result["players"] if result["players"] is not None else "-"
+        print(f"  {result['benchmark']:<26} x{result['scale']:<4} {players!s:>5}  x{ratio:5.2f}{marker}")
+    if regressions:
+        print(f"❌ Регресій: {regressions}")
+    return regressions == 0
+
+# ================ ЗАПУСК ================
+
+def prepare_catalog(source: str, workdir: str, scale: int) -> Tuple[dict, str]:
+    """Копіює (або розмножує) data.json у workdir і компілює його власним кешем."""
+    data_path = os.path.join(workdir, "data.json")
+    if scale == 1:
+        shutil.copyfile(source, data_path)
+    else:
+        write_scaled_data(source, data_path, scale)
+    return bunker.load_data(data_path, os.path.join(workdir, "data.cache")), data_path
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки Bunker Game")
+    parser.add_argument("names", nargs="*", help=f"які бенчмарки запускати: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--data", default=bunker.DATA_FILE, help="шлях до data.json")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="розміри лобі (гравців)")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="у скільки разів розмножити каталог")
+    parser.add_argument("--repeat", type=int, default=5, help="повторів кожного вимірювання (береться найкращий)")
+    parser.add_argument("--number", type=int, default=20000, help="кількість викликів у серії мікробенчмарків")
+    parser.add_argument("--output", help="записати результати у JSON")
+    parser.add_argument("--baseline", help="порівняти з результатами з цього JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="допустиме сповільнення відносно бази")
+    parser.add_argument("--write-data", metavar="DIR",
+                        help="лише записати розмножені data_xN.json для --scales у DIR")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"невідомі бенчмарки: {', '.join(unknown)}")
+
+    if args.write_data:
+        os.makedirs(args.write_data, exist_ok=True)
+        for scale in args.scales:
+            target = os.path.join(args.write_data, f"data_x{scale}.json")
+            write_scaled_data(args.data, target, scale)
+            print(f"✅ {target}")
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bunker-bench-") as root:
+        for scale in args.scales:
+            workdir = os.path.join(root, f"x{scale}")
+            os.makedirs(workdir)
+            data, data_path = prepare_catalog(args.data, workdir, scale)
+            cards = sum(len(data[section]) for section in bunker.CARD_SECTIONS)
+            print(f"\nКаталог x{scale}: {cards} унікальних карток")
+            ctx = BenchContext(data, data_path, workdir, scale, args)
+            for name in args.names or BENCHMARKS:
+                results.extend(BENCHMARKS[name](ctx))
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"\n✅ Результати записано у {args.output}")
+    if args.baseline and not compare_results(args.baseline, results, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
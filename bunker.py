@@ -1,241 +1,2123 @@
+import argparse
+import bisect
+import contextlib
+import functools
+import hashlib
+import html
+import io
 import json
 import random
 import os
+import struct
 import sys
-from typing import Dict, List, Tuple, Optional, Set
+import threading
+import time
+import zlib
+from array import array
+from collections import deque
+from itertools import accumulate, chain
+from typing import Callable, Dict, List, Tuple, Optional, Set
+
+# Важкі модулі, потрібні окремим режимам (asyncio — серверу, zipfile — архівній
+# розкладці, lzma, cProfile, пули процесів), імпортуються в місці використання,
+# щоб не сповільнювати старт адмін панелі.
+
+# NumPy потрібен лише для векторної генерації великих лобі (generate --bulk);
+# імпортується при першому зверненні через load_numpy()
+np = None
+
+def load_numpy():
+    """Модуль numpy (імпортується при першому виклику) або None, якщо його не встановлено."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
 
 PLAYERS_DIR = "players"
-STATE_FILE = os.path.join(PLAYERS_DIR, "state.json")
+# Імена файлів усередині директорії сесії (за замовчуванням PLAYERS_DIR)
+STATE_FILE = "state.json"
+STATE_BINARY_FILE = "state.bin"
+JOURNAL_FILE = "state.journal"
+BUNKER_FILE = "bunker.txt"
+ARCHIVE_FILE = "cards.zip"
 DATA_FILE = "data.json"
+DATA_CACHE_FILE = "data.cache"
+
+# Режим збереження стану: "snapshot" — повний state.json після кожної команди,
+# "journal" — лише зміни дописуються у state.journal, знімок оновлюється рідко.
+PERSISTENCE_MODE = os.environ.get("BUNKER_PERSISTENCE", "snapshot")
+JOURNAL_COMPACT_EVERY = 200
+
+# Скільки останніх змін можна скасувати командою undo (0 — вимкнути історію)
+UNDO_DEPTH = int(os.environ.get("BUNKER_UNDO_DEPTH", "50"))
+
+# Формат знімка стану: "json" (state.json) або "binary" (state.bin) зі стисненням
+# "none", "zlib" чи "lzma". load_state визначає формат автоматично. Без стиснення
+# бінарний знімок лише на кілька відсотків менший за JSON, тож типово — zlib.
+STATE_FORMAT = os.environ.get("BUNKER_STATE_FORMAT", "json")
+STATE_COMPRESSION = os.environ.get("BUNKER_STATE_COMPRESSION", "zlib")
+
+# Фонові записи: файли пише окремий потік, повторні записи одного файлу
+# об'єднуються. Адмін панель не чекає на диск; exit/EOF дочікується запису.
+BACKGROUND_WRITES = os.environ.get("BUNKER_BACKGROUND_WRITES", "0") == "1"
+
+# Надійність запису: "none" — без fsync (найшвидше), "batch" — fsync не частіше
+# ніж раз на DURABILITY_BATCH_MS, "strict" — fsync кожного запису. Файли в будь-якому
+# разі замінюються атомарно: запис у тимчасовий файл, потім rename.
+DURABILITY_LEVELS = ("none", "batch", "strict")
+DURABILITY = os.environ.get("BUNKER_DURABILITY", "none")
+DURABILITY_BATCH_MS = int(os.environ.get("BUNKER_DURABILITY_BATCH_MS", "200"))
+
+# Розкладка карток згенерованих лобі (generate): "files" — файл на гравця та bunker.txt,
+# "archive" — усі картки й бункер лобі в одному cards.zip з доступом до окремої картки.
+# Інтерактивні сесії (адмін панель, run, сервер) завжди пишуть окремі файли: zip довелося б
+# перезаписувати цілком після кожної команди; архів лобі розпаковується при завантаженні стану
+OUTPUT_LAYOUTS = ("files", "archive")
+OUTPUT_LAYOUT = os.environ.get("BUNKER_OUTPUT_LAYOUT", "files")
+
+# Скільки останніх вимірів кожної мітки тримати для p95 у команді stats
+TIMING_SAMPLES = 1000
+# Куди profile on записує .pstats кожної команди
+PROFILE_DIR = "profiles"
+
+# ================ УТИЛІТИ ================
+
+def ensure_players_dir(directory: str = PLAYERS_DIR) -> None:
+    """Створює директорію для гравців якщо не існує."""
+    os.makedirs(directory, exist_ok=True)
+
+def state_dir(state: dict) -> str:
+    """Директорія файлів сесії."""
+    return state.get("_dir", PLAYERS_DIR)
+
+def new_seed() -> int:
+    """Випадкове зерно для нової сесії."""
+    return random.SystemRandom().randrange(2 ** 63)
+
+def derive_seed(seed: int, label) -> int:
+    """Стабільне похідне зерно (наприклад, для окремого лобі)."""
+    digest = hashlib.sha256(f"{seed}:{label}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+def session_rng(state: dict) -> random.Random:
+    """Генератор випадкових чисел сесії.
+    
+    Кожна команда отримує власний потік, засіяний (seed, tick), де tick —
+    кількість зафіксованих змін. Тож результат залежить лише від зерна та
+    послідовності команд — і після перезапуску теж.
+    """
+    rng = state.get("_rng")
+    if rng is None:
+        rng = state["_rng"] = random.Random(derive_seed(state.get("seed", 0), state.get("tick", 0)))
+    return rng
+
+def say(state: dict, *args) -> None:
+    """Виводить повідомлення команди у потік виводу сесії state["_output"], а без нього — у stdout.
+    
+    Сервер задає окремий потік кожній команді лобі, тож її відповідь не змішується
+    з виводом інших лобі чи потоків запису (на відміну від підміни sys.stdout).
+    """
+    print(*args, file=state.get("_output"))
+
+def sanitize_filename(name: str) -> str:
+    """Очищає рядок для використання як ім'я файлу."""
+    return "".join(c for c in name if c.isalnum() or c in (" ", "_", "-")).rstrip()
+
+# ================ ВИМІРЮВАННЯ ЧАСУ ================
+
+class Timings:
+    """Тривалості команд адмін панелі та фаз запису.
+    
+    Для кожної мітки зберігаються кількість, сума та останні TIMING_SAMPLES
+    вимірів (для p95). Запис — два perf_counter та append, тож таймери
+    можна тримати увімкненими завжди.
+    """
+    
+    __slots__ = ("counts", "totals", "samples")
+    
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        self.samples: Dict[str, deque] = {}
+    
+    def add(self, label: str, seconds: float) -> None:
+        samples = self.samples.get(label)
+        if samples is None:
+            samples = self.samples[label] = deque(maxlen=TIMING_SAMPLES)
+            self.counts[label] = 0
+            self.totals[label] = 0.0
+        samples.append(seconds)
+        self.counts[label] += 1
+        self.totals[label] += seconds
+    
+    def reset(self) -> None:
+        self.counts.clear()
+        self.totals.clear()
+        self.samples.clear()
+    
+    def report(self) -> List[Tuple[str, int, float, float]]:
+        """Рядки (мітка, кількість, середнє, p95) у секундах, за спаданням сумарного часу."""
+        rows = [
+            (label, self.counts[label], self.totals[label] / self.counts[label],
+             _percentile(sorted(self.samples[label]), 95))
+            for label in self.samples
+        ]
+        rows.sort(key=lambda row: row[1] * row[2], reverse=True)
+        return rows
+
+TIMINGS = Timings()
+
+def timed(label: str):
+    """Декоратор: додає тривалість кожного виклику функції до TIMINGS під міткою label."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMINGS.add(label, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+# ================ ЗАПИС ФАЙЛІВ ================
+
+def _fsync_dir(directory: str) -> None:
+    """Фіксує на диску зміни директорії (нові імена після rename)."""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        # Windows не дозволяє відкривати директорії — там rename і так надійний
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _fsync_paths(paths: Set[str]) -> None:
+    """fsync файлів (що ще існують) та їхніх директорій."""
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    for directory in {os.path.dirname(path) for path in paths}:
+        _fsync_dir(directory)
+
+class SyncBatch:
+    """Відкладені fsync для режиму "batch".
+    
+    Записані файли накопичуються і синхронізуються разом, коли від
+    попередньої синхронізації минуло щонайменше interval_ms. Якщо нових
+    записів не буде, накопичене синхронізує таймер, тож незафіксованими
+    записи лишаються не довше за інтервал.
+    """
+    
+    def __init__(self, interval_ms: int):
+        self.interval = interval_ms / 1000
+        self._paths: Set[str] = set()
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+    
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._paths.add(path)
+            wait = self.interval - (time.monotonic() - self._last)
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._expire)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            paths, self._paths = self._paths, set()
+            self._last = time.monotonic()
+        _fsync_paths(paths)
+    
+    def _expire(self) -> None:
+        with self._lock:
+            self._timer = None
+        self.sync()
+    
+    def sync(self) -> None:
+        """Синхронізує все накопичене, не чекаючи інтервалу."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            paths, self._paths = self._paths, set()
+            self._last = time.monotonic()
+        _fsync_paths(paths)
+
+_sync_batch = SyncBatch(DURABILITY_BATCH_MS)
+
+def sync_writes() -> None:
+    """Дочікується fsync усіх записів, відкладених режимом "batch"."""
+    if DURABILITY == "batch":
+        _sync_batch.sync()
+
+def _written(path: str, f=None) -> None:
+    """Застосовує рівень надійності до щойно записаного (ще відкритого) файлу f."""
+    if DURABILITY == "strict":
+        if f is not None:
+            f.flush()
+            os.fsync(f.fileno())
+    elif DURABILITY == "batch":
+        _sync_batch.add(path)
+
+@timed("write")
+def _apply_write(path: str, op: str, content=None) -> None:
+    """Виконує операцію запису: "replace" (str або bytes), "append" (str) чи "remove".
+    
+    Це єдиний шлях, яким файли сесії потрапляють на диск. replace пише
+    у тимчасовий файл поруч і атомарно підміняє ним цільовий.
+    """
+    if op == "remove":
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        if DURABILITY == "strict":
+            _fsync_dir(os.path.dirname(path))
+        else:
+            _written(path)
+        return
+    
+    if op == "append":
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(content)
+            _written(path, f)
+        return
+    
+    temp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        if isinstance(content, bytes):
+            f = open(temp, "wb")
+        else:
+            f = open(temp, "w", encoding="utf-8")
+        with f:
+            f.write(content)
+            if DURABILITY == "strict":
+                _written(temp, f)
+        os.replace(temp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp)
+        raise
+    
+    if DURABILITY == "strict":
+        _fsync_dir(os.path.dirname(path))
+    else:
+        _written(path)
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _queue_write(queue: Dict[str, list], path: str, op: str, content=None) -> None:
+    """Додає операцію до черги записів, де на кожен файл — не більше однієї операції.
+    
+    Новий вміст замінює незаписаний (і переносить файл у кінець черги),
+    дописування склеюються з попередньою операцією.
+    """
+    current = queue.get(path)
+    if op == "append" and current is not None:
+        if current[0] == "remove":
+            # Видалений і дописаний файл — це файл із новим вмістом
+            queue[path] = ["replace", content]
+        else:
+            current[1] += content
+    else:
+        queue.pop(path, None)
+        queue[path] = [op, content]
+
+class BackgroundWriter:
+    """Потік, що записує файли у фоні.
+    
+    Черга тримає не більше однієї операції на файл: новий вміст замінює
+    ще не записаний, дописування склеюються. Операції виконуються в порядку
+    останньої зміни, тож знімок стану потрапляє на диск раніше за очищення
+    журналу. flush() — бар'єр: повертається, коли все з черги записано.
+    """
+    
+    def __init__(self):
+        self._pending: Dict[str, list] = {}
+        self._writing: Set[str] = set()
+        self._condition = threading.Condition()
+        self.errors: List[Tuple[str, Exception]] = []
+        self._thread = threading.Thread(target=self._run, name="bunker-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, path: str, op: str, content=None) -> None:
+        """Ставить операцію у чергу, об'єднуючи її з ще не записаною для того ж файлу."""
+        with self._condition:
+            _queue_write(self._pending, path, op, content)
+            self._condition.notify_all()
+    
+    def pending(self, path: str) -> bool:
+        """Чи є незаписані зміни файлу."""
+        with self._condition:
+            return path in self._pending or path in self._writing
+    
+    def read_text(self, path: str) -> Optional[str]:
+        """Читає файл з урахуванням ще не записаних змін."""
+        self.flush()
+        return _read_text(path)
+    
+    def flush(self) -> None:
+        """Чекає, доки всі поставлені в чергу записи потраплять на диск."""
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+            errors, self.errors = self.errors, []
+        for path, error in errors:
+            print(f"❌ Не вдалося записати {path}: {error}")
+    
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                batch, self._pending = self._pending, {}
+                self._writing = set(batch)
+            
+            try:
+                for path, (op, content) in batch.items():
+                    try:
+                        _apply_write(path, op, content)
+                    except Exception as error:
+                        # Будь-яка помилка лише повідомляється у flush — потік має жити далі
+                        with self._condition:
+                            self.errors.append((path, error))
+            finally:
+                # Інакше flush() чекав би на ці файли вічно
+                with self._condition:
+                    self._writing = set()
+                    self._condition.notify_all()
+
+def write_file(path: str, content, writer: Optional[BackgroundWriter] = None) -> None:
+    """Записує файл цілком — одразу або через фоновий потік."""
+    if writer is not None:
+        writer.submit(path, "replace", content)
+    else:
+        _apply_write(path, "replace", content)
+
+def append_file(path: str, text: str, writer: Optional[BackgroundWriter] = None) -> None:
+    """Дописує текст у кінець файлу."""
+    if writer is not None:
+        writer.submit(path, "append", text)
+    else:
+        _apply_write(path, "append", text)
+
+def remove_file(path: str, writer: Optional[BackgroundWriter] = None) -> None:
+    """Видаляє файл, якщо він є."""
+    if writer is not None:
+        writer.submit(path, "remove")
+    else:
+        _apply_write(path, "remove")
+
+def flush_writes(state: dict) -> None:
+    """Дочікується фонових записів сесії (якщо вони увімкнені) та їх fsync."""
+    writer = state.get("_writer")
+    if writer is not None:
+        writer.flush()
+    sync_writes()
+
+def load_json_file(filepath: str) -> dict:
+    """Завантажує JSON файл."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_json_file(filepath: str, data: dict, writer: Optional[BackgroundWriter] = None) -> None:
+    """Зберігає дані у JSON файл."""
+    started = time.perf_counter()
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    TIMINGS.add("serialize", time.perf_counter() - started)
+    write_file(filepath, text, writer)
+
+def load_data(path: str = DATA_FILE, cache_path: str = DATA_CACHE_FILE) -> dict:
+    """Завантажує скомпільований каталог (з кешу, якщо data.json не змінювався).
+    
+    З кешу повертається LazyCatalog: читається лише заголовок, а секції —
+    при першому зверненні.
+    """
+    stat = os.stat(path)
+    header, catalog = _read_catalog_cache(cache_path)
+    
+    if header and header["version"] == CATALOG_VERSION:
+        if header["size"] == stat.st_size and header["mtime_ns"] == stat.st_mtime_ns:
+            return catalog
+        # mtime змінився (наприклад, після git checkout) — перевіряємо вміст
+        if header["sha256"] == _file_sha256(path):
+            _write_catalog_cache(cache_path, path, catalog.materialize())
+            return catalog
+    if catalog is not None:
+        catalog.close()
+    
+    return compile_data_file(path, cache_path)
+
+# ================ КАТАЛОГ ================
+
+# Файл кешу: CATALOG_MAGIC, версія та довжина заголовка (uint32), заголовок JSON
+# (ключ за data.json і зміщення секцій), далі секції — кожна окремим компактним JSON.
+# Лише дані, без pickle: підкладений кеш не може виконати код.
+CATALOG_MAGIC = b"BNKC"
+CATALOG_VERSION = 4
+CATALOG_PREFIX = struct.Struct(">4sII")
+
+# Секції з картками (списки рядків); пули гравців будуються з перших десяти
+POOL_NAMES = [
+    "backpack", "body", "traits", "extra_info",
+    "large_inventory", "health", "jobs", "fobias",
+    "hobies", "special_cards"
+]
+CARD_SECTIONS = POOL_NAMES + ["cataclysms", "descriptions", "bunker_items"]
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _card_entry(entry) -> Tuple[Optional[str], Optional[float]]:
+    """Картка секції: рядок або {"card": рядок, "weight": рідкісність > 0}."""
+    if isinstance(entry, str):
+        return (entry, 1) if entry else (None, None)
+    if isinstance(entry, dict) and isinstance(entry.get("card"), str) and entry["card"]:
+        weight = entry.get("weight", 1)
+        if isinstance(weight, (int, float)) and not isinstance(weight, bool) and weight > 0:
+            return entry["card"], weight
+    return None, None
+
+def compile_data(raw: dict) -> dict:
+    """Перевіряє та компілює сирі дані data.json у каталог.
+    
+    Дублікати карток прибираються, а кількість копій зберігається у
+    catalog["weights"][секція][картка], щоб пули мали ту ж імовірність.
+    Картка може бути й об'єктом {"card": ..., "weight": ...}: вага (рідкісність)
+    потрапляє у catalog["rarity"][секція][картка], за замовчуванням вона 1.
+    health_with_stages розгортається у health_staged — список хвороб зі стадіями.
+    """
+    errors = []
+    catalog = dict(raw)
+    weights = {}
+    rarities = {}
+    
+    for section in CARD_SECTIONS:
+        entries = raw.get(section, [])
+        parsed = [_card_entry(entry) for entry in entries] if isinstance(entries, list) else [(None, None)]
+        if any(card is None for card, _ in parsed):
+            errors.append(f"{section}: очікується список непорожніх рядків або {{\"card\": рядок, \"weight\": число > 0}}")
+            continue
+        counts = {}
+        rarity = {}
+        for card, weight in parsed:
+            counts[card] = counts.get(card, 0) + 1
+            if weight != 1:
+                rarity[card] = weight
+        catalog[section] = list(counts)
+        duplicates = {card: count for card, count in counts.items() if count > 1}
+        if duplicates:
+            weights[section] = duplicates
+        if rarity:
+            rarities[section] = rarity
+    catalog["weights"] = weights
+    catalog["rarity"] = rarities
+    
+    ages = raw.get("ages", [25])
+    if not isinstance(ages, list) or not ages or not all(isinstance(a, int) for a in ages):
+        errors.append("ages: очікується непорожній список цілих чисел")
+    
+    stages = raw.get("health_with_stages", {})
+    if not isinstance(stages, dict) or not all(
+        isinstance(v, list) and v and all(isinstance(s, str) for s in v) for v in stages.values()
+    ):
+        errors.append("health_with_stages: очікується словник 'хвороба' -> непорожній список стадій")
+    else:
+        catalog["health_staged"] = list(stages)
+    
+    if errors:
+        raise ValueError("Некоректний data.json:\n  " + "\n  ".join(errors))
+    return catalog
+
+def section_indices(catalog: dict, section: str) -> List[int]:
+    """Повертає індекси карток секції з урахуванням кількості копій."""
+    weights = catalog.get("weights", {}).get(section, {})
+    indices = []
+    for index, card in enumerate(catalog.get(section, [])):
+        indices.extend([index] * weights.get(card, 1))
+    return indices
+
+def compile_data_file(path: str = DATA_FILE, cache_path: str = DATA_CACHE_FILE) -> dict:
+    """Компілює data.json та записує кеш каталогу."""
+    catalog = compile_data(load_json_file(path))
+    _write_catalog_cache(cache_path, path, catalog)
+    return catalog
+
+class LazyCatalog:
+    """Каталог з кешу, секції якого розпаковуються лише при першому зверненні.
+    
+    Поводиться як словник (get, [], in, присвоєння). Зміщення секцій у файлі
+    кешу читаються один раз із заголовка; файл лишається відкритим, тож
+    перезапис кешу іншим процесом (через rename) не зачіпає вже відкритий каталог.
+    """
+    
+    __slots__ = ("_file", "_base", "_offsets", "_sections", "_lock")
+    
+    def __init__(self, f, base: int, offsets: Dict[str, Tuple[int, int]]):
+        self._file = f
+        self._base = base
+        self._offsets = offsets
+        self._sections: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _load(self, key: str):
+        offset, length = self._offsets[key]
+        with self._lock:
+            value = self._sections.get(key, self)
+            if value is self:
+                self._file.seek(self._base + offset)
+                value = self._sections[key] = json.loads(self._file.read(length))
+        return value
+    
+    def __getitem__(self, key: str):
+        value = self._sections.get(key, self)
+        if value is not self:
+            return value
+        if key in self._offsets:
+            return self._load(key)
+        raise KeyError(key)
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __setitem__(self, key: str, value) -> None:
+        self._sections[key] = value
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._sections or key in self._offsets
+    
+    def __iter__(self):
+        return iter({**dict.fromkeys(self._offsets), **dict.fromkeys(self._sections)})
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def keys(self):
+        return list(self)
+    
+    def loaded(self) -> List[str]:
+        """Секції, які вже розпаковано."""
+        return [key for key in self._offsets if key in self._sections]
+    
+    def materialize(self) -> dict:
+        """Розпаковує всі секції і повертає каталог звичайним словником."""
+        return {key: self[key] for key in self._offsets}
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __repr__(self) -> str:
+        return f"LazyCatalog({len(self.loaded())}/{len(self._offsets)} секцій)"
+
+def _read_catalog_cache(cache_path: str) -> Tuple[Optional[dict], Optional[LazyCatalog]]:
+    """Читає заголовок кешу; секції каталогу лишаються на диску до першого звернення."""
+    try:
+        f = open(cache_path, "rb")
+    except OSError:
+        return None, None
+    try:
+        magic, version, length = CATALOG_PREFIX.unpack(f.read(CATALOG_PREFIX.size))
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            f.close()
+            return None, None
+        header = json.loads(f.read(length))
+        sections = {key: (offset, size) for key, (offset, size) in header["sections"].items()}
+        header["version"] = version
+        return header, LazyCatalog(f, f.tell(), sections)
+    except (OSError, struct.error, ValueError, KeyError, TypeError, AttributeError):
+        f.close()
+        return None, None
+
+def _write_catalog_cache(cache_path: str, path: str, catalog: dict) -> None:
+    """Записує кеш каталогу з ключем за хешем та mtime data.json.
+    
+    Кожна секція серіалізується окремо, заголовок зберігає їхні зміщення.
+    """
+    stat = os.stat(path)
+    sections = {}
+    body = bytearray()
+    for key, value in catalog.items():
+        if key.startswith("_"):
+            continue
+        blob = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        sections[key] = (len(body), len(blob))
+        body += blob
+    header = json.dumps({
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_sha256(path),
+        "sections": sections,
+    }, separators=(",", ":")).encode("utf-8")
+    try:
+        write_file(cache_path, CATALOG_PREFIX.pack(CATALOG_MAGIC, CATALOG_VERSION, len(header)) + header + bytes(body))
+    except OSError:
+        # Кеш — лише оптимізація; без прав на запис просто працюємо без нього
+        pass
+
+def persistable_state(state: dict) -> dict:
+    """Повертає стан без службових ключів (з префіксом "_").
+    
+    Гравці стають словниками (Player.to_dict), пули — списками рядків стосу,
+    а їхні скинуті картки — окремим ключем "discards": {пул: [картки]}. Гравці
+    й пули копіюються, тож результат можна записувати в іншому потоці.
+    """
+    persistable = {}
+    discards = {}
+    for key, value in state.items():
+        if key.startswith("_"):
+            continue
+        if key == "players":
+            value = {name: player.to_dict() for name, player in value.items()}
+        elif isinstance(value, CardPool):
+            if value.discards:
+                discards[key] = value.discard_list()
+            value = value.to_list()
+        persistable[key] = value
+    if discards:
+        persistable["discards"] = discards
+    return persistable
+
+def write_state_snapshot(directory: str, snapshot: dict, writer: Optional[BackgroundWriter] = None) -> None:
+    """Записує знімок стану у вибраному форматі."""
+    ensure_players_dir(directory)
+    if STATE_FORMAT == "binary":
+        save_binary_file(os.path.join(directory, STATE_BINARY_FILE), snapshot, STATE_COMPRESSION, writer)
+    else:
+        save_json_file(os.path.join(directory, STATE_FILE), snapshot, writer)
+
+@timed("save_state")
+def save_state(state: dict) -> None:
+    """Зберігає повний знімок стану гри та ущільнює журнал."""
+    directory = state_dir(state)
+    writer = state.get("_writer")
+    write_state_snapshot(directory, persistable_state(state), writer)
+    
+    journal_path = os.path.join(directory, JOURNAL_FILE)
+    if PERSISTENCE_MODE == "journal":
+        journal = state.get("_journal")
+        if journal is None:
+            journal = state["_journal"] = StateJournal(journal_path)
+        journal.reset(writer)
+        state_tracker(state)
+    else:
+        remove_file(journal_path, writer)
+
+def commit_state(state: dict, players: Optional[List[dict]] = None) -> None:
+    """Фіксує зміни після команди та оновлює файли змінених гравців.
+    
+    У режимі журналу дописує лише змінені поля, інакше зберігає повний знімок.
+    players=None означає, що змінитися могли всі гравці.
+    """
+    if players is None:
+        players = list(state["players"].values())
+    
+    # Наступна команда отримає новий потік випадкових чисел
+    state["tick"] = state.get("tick", 0) + 1
+    
+    pending = state.get("_pending")
+    if pending is not None:
+        # Сесія сервера або транзакція: запис буде пізніше, одним кроком
+        pending.update(player["name"] for player in players)
+        state["_dirty"] = True
+        return
+    
+    persist_state(state, players)
+
+@timed("persist_state")
+def persist_state(state: dict, players: List[dict]) -> None:
+    """Записує стан (знімок або запис журналу) та картки переданих гравців."""
+    journal = state.get("_journal")
+    history = state.get("_history")
+    writer = state.get("_writer")
+    
+    record = None
+    if journal is not None or history is not None:
+        record = state_tracker(state).diff(state, players)
+        if history is not None:
+            history.record(record)
+    
+    if journal is None:
+        save_state(state)
+    else:
+        journal.append(record, writer)
+        if journal.records >= JOURNAL_COMPACT_EVERY:
+            save_state(state)
+    
+    directory = state_dir(state)
+    cache = card_cache(state)
+    for player in players:
+        save_single_player_file(player, directory, cache, writer)
+    if state.get("bunker"):
+        cache.save_bunker(state["bunker"], directory, writer)
+
+# ================ ТРАНЗАКЦІЇ ================
+
+class WriteBuffer:
+    """Записи файлів, відкладені до фіксації транзакції.
+    
+    Має той самий інтерфейс, що й BackgroundWriter, тож підставляється
+    у state["_writer"]; читання бачать ще не записаний вміст.
+    """
+    
+    def __init__(self):
+        self.ops: Dict[str, list] = {}
+    
+    def submit(self, path: str, op: str, content=None) -> None:
+        _queue_write(self.ops, path, op, content)
+    
+    def pending(self, path: str) -> bool:
+        return path in self.ops
+    
+    def read_text(self, path: str) -> Optional[str]:
+        op = self.ops.get(path)
+        if op is None:
+            return _read_text(path)
+        if op[0] == "remove":
+            return None
+        if op[0] == "append":
+            return (_read_text(path) or "") + op[1]
+        return op[1] if isinstance(op[1], str) else op[1].decode("utf-8")
+    
+    def flush(self) -> None:
+        """Нічого не робить: буфер записується лише при фіксації."""
+    
+    def apply(self, writer: Optional[BackgroundWriter] = None) -> None:
+        """Передає накопичені записи справжньому записувачу (або одразу на диск)."""
+        for path, (op, content) in self.ops.items():
+            if writer is not None:
+                writer.submit(path, op, content)
+            else:
+                _apply_write(path, op, content)
+        self.ops = {}
+
+def _copy_state(state: dict) -> dict:
+    """Копія стану для відкату: гравці та пули копіюються, службові ключі — ні."""
+    backup = {}
+    for key, value in state.items():
+        if key.startswith("_"):
+            continue
+        if key == "players":
+            backup[key] = {name: player.copy() for name, player in value.items()}
+        else:
+            backup[key] = value.copy() if isinstance(value, (list, CardPool)) else value
+    return backup
+
+def begin_transaction(state: dict) -> None:
+    """Починає транзакцію: команди змінюють лише пам'ять, записи буферизуються."""
+    state["_transaction"] = {"backup": _copy_state(state), "writer": state.get("_writer")}
+    state["_pending"] = set()
+    state["_writer"] = WriteBuffer()
+
+def _end_transaction(state: dict) -> Tuple[dict, WriteBuffer, Set[str]]:
+    transaction = state.pop("_transaction")
+    buffer = state.pop("_writer")
+    if transaction["writer"] is not None:
+        state["_writer"] = transaction["writer"]
+    names = state.pop("_pending")
+    state.pop("_dirty", None)
+    return transaction, buffer, names
+
+def commit_transaction(state: dict) -> None:
+    """Фіксує транзакцію одним записом стану та картками змінених гравців."""
+    _, buffer, names = _end_transaction(state)
+    buffer.apply(state.get("_writer"))
+    players = [player for player in state["players"].values() if player["name"] in names]
+    persist_state(state, players)
+
+def rollback_transaction(state: dict) -> None:
+    """Відкочує стан у пам'яті до початку транзакції; буферизовані записи відкидаються."""
+    transaction, _, _ = _end_transaction(state)
+    backup = transaction["backup"]
+    for key in [key for key in state if not key.startswith("_") and key not in backup]:
+        del state[key]
+    state.update(backup)
+    state.pop("_rng", None)
+
+# ================ ІСТОРІЯ ЗМІН ================
+
+# Ключі, які undo не повертає: tick лише зростає, щоб повторена після
+# скасування команда отримала новий потік випадкових чисел
+UNDO_SKIP_KEYS = {"tick"}
+
+def apply_record(state: dict, record: dict, undo: bool = False) -> List[dict]:
+    """Застосовує запис StateTracker уперед або (undo=True) назад; повертає змінених гравців."""
+    players = []
+    for key, fields in record.get("players", {}).items():
+        player = state["players"].get(key)
+        if player is None:
+            continue
+        for field, (old, new) in fields.items():
+            value = old if undo else new
+            if value is None:
+                player.pop(field, None)
+            else:
+                player[field] = _copy_value(value)
+        players.append(player)
+    
+    for key, change in record.get("pools", {}).items():
+        pool = state.get(key)
+        if "items" in change:
+            items = change["before"] if undo else change["items"]
+            discards = change.get("discards_before" if undo else "discards", [])
+            state[key] = pool.restored(items, discards) if isinstance(pool, CardPool) else list(items)
+        elif undo:
+            pool.extend(change["taken"])
+            if change.get("discarded"):
+                del pool.discards[len(pool.discards) - len(change["discarded"]):]
+        else:
+            del pool[change["size"]:]
+            for card in change.get("discarded", []):
+                pool.discard(card)
+    
+    for key, (old, new) in record.get("state", {}).items():
+        if key not in UNDO_SKIP_KEYS:
+            state[key] = old if undo else new
+    return players
+
+class UndoHistory:
+    """Історія змін для undo/redo.
+    
+    Зберігаються не копії стану, а записи змін StateTracker, тож кожен крок
+    коштує O(змінених полів). Найстаріші записи витісняються після depth кроків.
+    """
+    
+    def __init__(self, depth: int = UNDO_DEPTH):
+        self.done = deque(maxlen=depth)
+        self.undone: List[dict] = []
+        self._replaying = False
+    
+    def record(self, record: dict) -> None:
+        """Додає зафіксовану зміну; нова зміна скасовує можливість redo."""
+        if self._replaying:
+            return
+        if not any(key != "state" for key in record) and not set(record.get("state", {})) - UNDO_SKIP_KEYS:
+            return
+        self.done.append(record)
+        self.undone.clear()
+    
+    def undo(self, state: dict) -> bool:
+        if not self.done:
+            say(state, "⚠️ Немає змін для скасування")
+            return False
+        record = self.done.pop()
+        self._replay(state, record, undo=True)
+        self.undone.append(record)
+        say(state, "✅ Останню зміну скасовано")
+        return True
+    
+    def redo(self, state: dict) -> bool:
+        if not self.undone:
+            say(state, "⚠️ Немає скасованих змін")
+            return False
+        record = self.undone.pop()
+        self._replay(state, record, undo=False)
+        self.done.append(record)
+        say(state, "✅ Скасовану зміну повернено")
+        return True
+    
+    def _replay(self, state: dict, record: dict, undo: bool) -> None:
+        players = apply_record(state, record, undo)
+        self._replaying = True
+        try:
+            commit_state(state, players)
+        finally:
+            self._replaying = False
+
+def load_state(data: dict, directory: str = PLAYERS_DIR) -> Optional[dict]:
+    """Завантажує збережений стан гри (знімок + журнал змін).
+    
+    Пули зберігаються рядками і після завантаження знову стають індексами у каталог data.
+    """
+    snapshots = [
+        path for path in (os.path.join(directory, name) for name in (STATE_FILE, STATE_BINARY_FILE))
+        if os.path.exists(path)
+    ]
+    if not snapshots:
+        return None
+    
+    # Якщо є обидва формати — беремо свіжіший
+    state = load_snapshot(max(snapshots, key=os.path.getmtime))
+    if directory != PLAYERS_DIR:
+        state["_dir"] = directory
+    journal = StateJournal(os.path.join(directory, JOURNAL_FILE))
+    if os.path.exists(journal.path):
+        journal.replay(state)
+    # Старі знімки зберігали стаж і відсоток у рядках карток — вони розбираються тут, один раз
+    legacy = any(is_legacy_player(fields) for fields in state["players"].values())
+    state["players"] = {key: Player.from_dict(fields) for key, fields in state["players"].items()}
+    if "bunker" not in state:
+        bunker = read_bunker(directory)
+        if bunker is not None:
+            state["bunker"] = bunker
+    # Лобі з generate в архівній розкладці: сесія далі пише окремі файли карток
+    unpack_lobby_archive(directory)
+    attach_card_pools(state, data)
+    state["_index"] = PlayerIndex(state["players"])
+    
+    if PERSISTENCE_MODE == "journal":
+        state["_journal"] = journal
+        if journal.torn or legacy:
+            # Обірваний останній запис — одразу ущільнюємо, щоб не дописувати після нього;
+            # так само стан старого формату, щоб журнал не змішував обидва формати
+            save_state(state)
+        else:
+            state_tracker(state)
+    return state
+
+# ================ БІНАРНИЙ ФОРМАТ ================
+
+# Файл: BINARY_MAGIC, версія, кодек стиснення, далі (стиснене) тіло.
+# Тіло: таблиця унікальних рядків, потім дерево значень, де рядки
+# записані номерами у таблиці, а списки рядків (пули) — масивом uint32.
+BINARY_MAGIC = b"BNKS"
+BINARY_VERSION = 1
+BINARY_CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+
+_T_NONE, _T_TRUE, _T_FALSE, _T_INT, _T_FLOAT, _T_STR, _T_LIST, _T_DICT, _T_STRLIST = range(9)
+
+def _write_varint(out: bytearray, number: int) -> None:
+    """Записує невід'ємне ціле у форматі varint."""
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """Читає varint, повертає значення та нову позицію."""
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _uint32_array(values=()) -> array:
+    """Масив uint32 у little-endian порядку незалежно від платформи."""
+    return array("I", values)
+
+def _array_to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _array_from_bytes(raw: bytes) -> array:
+    values = _uint32_array()
+    values.frombytes(raw)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+class _BinaryEncoder:
+    """Кодує дерево JSON-сумісних значень з таблицею рядків."""
+    
+    def __init__(self):
+        self.strings: List[str] = []
+        self.refs: Dict[str, int] = {}
+        self.body = bytearray()
+    
+    def ref(self, text: str) -> int:
+        index = self.refs.get(text)
+        if index is None:
+            index = self.refs[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+    
+    def encode(self, value) -> None:
+        out = self.body
+        if value is None:
+            out.append(_T_NONE)
+        elif value is True:
+            out.append(_T_TRUE)
+        elif value is False:
+            out.append(_T_FALSE)
+        elif isinstance(value, int):
+            out.append(_T_INT)
+            _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            out.append(_T_FLOAT)
+            out += struct.pack("<d", value)
+        elif isinstance(value, str):
+            out.append(_T_STR)
+            _write_varint(out, self.ref(value))
+        elif isinstance(value, (list, tuple)):
+            if value and all(isinstance(item, str) for item in value):
+                out.append(_T_STRLIST)
+                _write_varint(out, len(value))
+                out += _array_to_bytes(_uint32_array(map(self.ref, value)))
+            else:
+                out.append(_T_LIST)
+                _write_varint(out, len(value))
+                for item in value:
+                    self.encode(item)
+        elif isinstance(value, dict):
+            out.append(_T_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                _write_varint(out, self.ref(str(key)))
+                self.encode(item)
+        else:
+            raise TypeError(f"Непідтримуваний тип для бінарного формату: {type(value).__name__}")
+    
+    def payload(self) -> bytes:
+        out = bytearray()
+        _write_varint(out, len(self.strings))
+        out += _array_to_bytes(_uint32_array(len(text) for text in self.strings))
+        blob = "".join(self.strings).encode("utf-8")
+        _write_varint(out, len(blob))
+        out += blob
+        out += self.body
+        return bytes(out)
+
+def _decode_value(buf: bytes, pos: int, strings: List[str]):
+    """Декодує одне значення, повертає його та нову позицію."""
+    tag = buf[pos]
+    pos += 1
+    if tag == _T_NONE:
+        return None, pos
+    if tag == _T_TRUE:
+        return True, pos
+    if tag == _T_FALSE:
+        return False, pos
+    if tag == _T_INT:
+        number, pos = _read_varint(buf, pos)
+        return (number >> 1) if not number & 1 else -((number + 1) >> 1), pos
+    if tag == _T_FLOAT:
+        return struct.unpack_from("<d", buf, pos)[0], pos + 8
+    if tag == _T_STR:
+        index, pos = _read_varint(buf, pos)
+        return strings[index], pos
+    if tag == _T_STRLIST:
+        count, pos = _read_varint(buf, pos)
+        end = pos + 4 * count
+        return [strings[index] for index in _array_from_bytes(buf[pos:end])], end
+    if tag == _T_LIST:
+        count, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _decode_value(buf, pos, strings)
+            items.append(item)
+        return items, pos
+    if tag == _T_DICT:
+        count, pos = _read_varint(buf, pos)
+        result = {}
+        for _ in range(count):
+            key, pos = _read_varint(buf, pos)
+            result[strings[key]], pos = _decode_value(buf, pos, strings)
+        return result, pos
+    raise ValueError(f"Пошкоджений бінарний знімок: невідомий тег {tag}")
+
+@timed("serialize")
+def encode_binary_state(data: dict, compression: str = "none") -> bytes:
+    """Кодує стан у компактний бінарний знімок."""
+    if compression not in BINARY_CODECS:
+        raise ValueError(f"Невідоме стиснення: {compression}")
+    
+    encoder = _BinaryEncoder()
+    encoder.encode(data)
+    payload = encoder.payload()
+    if compression == "zlib":
+        # Рівень 1: знімок пишеться після кожної команди, а вищі рівні дають лише
+        # кілька КБ при в кілька разів довшому стисненні
+        payload = zlib.compress(payload, 1)
+    elif compression == "lzma":
+        import lzma
+        payload = lzma.compress(payload)
+    return BINARY_MAGIC + bytes([BINARY_VERSION, BINARY_CODECS[compression]]) + payload
+
+def decode_binary_state(blob: bytes) -> dict:
+    """Декодує бінарний знімок стану."""
+    if blob[:4] != BINARY_MAGIC:
+        raise ValueError("Це не бінарний знімок стану")
+    if blob[4] != BINARY_VERSION:
+        raise ValueError(f"Непідтримувана версія бінарного знімка: {blob[4]}")
+    
+    payload = blob[6:]
+    if blob[5] == BINARY_CODECS["zlib"]:
+        payload = zlib.decompress(payload)
+    elif blob[5] == BINARY_CODECS["lzma"]:
+        import lzma
+        payload = lzma.decompress(payload)
+    
+    count, pos = _read_varint(payload, 0)
+    lengths = _array_from_bytes(payload[pos:pos + 4 * count])
+    pos += 4 * count
+    size, pos = _read_varint(payload, pos)
+    text = payload[pos:pos + size].decode("utf-8")
+    pos += size
+    
+    offsets = [0, *accumulate(lengths)]
+    strings = [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+    
+    value, _ = _decode_value(payload, pos, strings)
+    return value
+
+def save_binary_file(filepath: str, data: dict, compression: str = "none",
+                     writer: Optional[BackgroundWriter] = None) -> None:
+    """Зберігає дані у бінарний файл."""
+    write_file(filepath, encode_binary_state(data, compression), writer)
+
+def load_binary_file(filepath: str) -> dict:
+    """Завантажує бінарний файл."""
+    with open(filepath, "rb") as f:
+        return decode_binary_state(f.read())
+
+def load_snapshot(filepath: str) -> dict:
+    """Завантажує знімок стану, визначаючи формат за вмістом файлу."""
+    with open(filepath, "rb") as f:
+        head = f.read(len(BINARY_MAGIC))
+    if head == BINARY_MAGIC:
+        return load_binary_file(filepath)
+    return load_json_file(filepath)
+
+def convert_state_file(source: str, target: str, compression: str = "none") -> None:
+    """Конвертує знімок стану між JSON та бінарним форматом.
+    
+    Формат результату визначається розширенням: .json — JSON, інше — бінарний.
+    """
+    data = load_snapshot(source)
+    if target.lower().endswith(".json"):
+        save_json_file(target, data)
+    else:
+        save_binary_file(target, data, compression)
+
+# ================ ЖУРНАЛ СТАНУ ================
+
+# Запис змін (StateTracker.diff) — спільний для журналу state.journal та історії undo/redo:
+#
+#     {"players": {ім'я: {поле: [старе, нове]}},
+#      "state": {ключ: [старе, нове]},
+#      "pools": {пул: {"size": n, "taken": [...],                          # роздача / скидання
+#                     "discarded": [...], "discards_size": m}
+#               або {"items": [...], "before": [...],
+#                    "discards": [...], "discards_before": [...]}}}       # будь-яка інша зміна
+#
+# Undo/redo застосовує записи в обидва боки, тож в історії потрібні і старі значення.
+# У рядку журналу (один JSON на команду) гравці лишаються парами [старе, нове],
+# ключі стану — лише новими значеннями, а повні зміни пулів — без "before" і
+# "discards_before"; replay бере з кожного запису тільки нові значення, а скинуті
+# обрізає до discards_size (довжина після запису) мінус discarded перед дописуванням.
+
+def _copy_value(value):
+    """Копіює значення поля (списки копіюються, решта незмінна)."""
+    return list(value) if isinstance(value, list) else value
+
+def _is_pool(key: str, value) -> bool:
+    """Чи є ключ стану пулом карток."""
+    return key.endswith("_pool") and isinstance(value, (list, CardPool))
+
+def _scalar_items(state: dict):
+    """Решта ключів стану: не гравці, не пули і не службові."""
+    return (
+        (key, value) for key, value in state.items()
+        if key != "players" and not key.startswith("_") and not _is_pool(key, value)
+    )
+
+class StateTracker:
+    """Копія останнього зафіксованого стану гравців, пулів і скалярних ключів.
+    
+    diff() порівнює з нею поточний стан і повертає запис змін (формат — у
+    заголовку розділу), тож фіксація коштує O(змін), а не O(стану).
+    """
+    
+    def __init__(self, state: Optional[dict] = None):
+        self._players: Dict[str, dict] = {}
+        self._pools: Dict[str, CardPool] = {}
+        self._scalars: Dict[str, object] = {}
+        if state is not None:
+            self.track(state)
+    
+    def track(self, state: dict) -> None:
+        """Запам'ятовує поточний стан як базу для наступних записів."""
+        self._players = {
+            key: {field: _copy_value(value) for field, value in player.items()}
+            for key, player in state["players"].items()
+        }
+        self._pools = {key: value.copy() for key, value in state.items() if _is_pool(key, value)}
+        self._scalars = {key: _copy_value(value) for key, value in _scalar_items(state)}
+    
+    def diff(self, state: dict, players: List[dict]) -> dict:
+        """Зміни переданих гравців, пулів і скалярних ключів відносно бази; база оновлюється."""
+        record = {}
+        
+        changes = {}
+        for player in players:
+            before = self._players.setdefault(player["name"], {})
+            fields = {}
+            for field, value in player.items():
+                if before.get(field) != value:
+                    fields[field] = [before.get(field), _copy_value(value)]
+                    before[field] = _copy_value(value)
+            if fields:
+                changes[player["name"]] = fields
+        if changes:
+            record["players"] = changes
+        
+        pools = {}
+        for key, pool in state.items():
+            if not _is_pool(key, pool):
+                continue
+            before = self._pools.get(key)
+            if (isinstance(pool, CardPool) and isinstance(before, CardPool) and pool.epoch == before.epoch
+                    and len(pool) <= len(before) and len(pool.discards) >= len(before.discards)):
+                # Без перемішувань колода лише роздає з кінця стосу та скидає в кінець
+                # скинутих — достатньо записати взяті та скинуті картки
+                if len(pool) == len(before) and len(pool.discards) == len(before.discards):
+                    continue
+                change = {"size": len(pool), "taken": before[len(pool):]}
+                if len(pool.discards) > len(before.discards):
+                    change["discarded"] = pool.discard_list(len(before.discards))
+                    change["discards_size"] = len(pool.discards)
+                    before.discards.extend(pool.discards[len(before.discards):])
+                del before[len(pool):]
+                pools[key] = change
+            elif before is None or pool != before:
+                before = before if before is not None else []
+                pools[key] = {
+                    "items": list(pool), "before": list(before),
+                    "discards": pool.discard_list() if isinstance(pool, CardPool) else [],
+                    "discards_before": before.discard_list() if isinstance(before, CardPool) else [],
+                }
+                self._pools[key] = pool.copy()
+        if pools:
+            record["pools"] = pools
+        
+        scalars = {}
+        for key, value in _scalar_items(state):
+            if self._scalars.get(key) != value:
+                scalars[key] = [self._scalars.get(key), _copy_value(value)]
+                self._scalars[key] = _copy_value(value)
+        if scalars:
+            record["state"] = scalars
+        
+        return record
+
+def state_tracker(state: dict) -> StateTracker:
+    """Трекер змін сесії; якщо його ще немає, базою стає поточний стан."""
+    tracker = state.get("_tracker")
+    if tracker is None:
+        tracker = state["_tracker"] = StateTracker(state)
+    return tracker
+
+class StateJournal:
+    """Журнал змін стану: кожна команда дописує один рядок JSON.
+    
+    Рядок — запис StateTracker (формат — у заголовку розділу), з якого
+    прибрано старі значення ключів стану й пулів; зміни полів гравців
+    лишаються парами [старе, нове]. Відновлення бере лише нові значення, тож
+    записи ідемпотентні: повторне застосування журналу до новішого знімка
+    нічого не ламає.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self.torn = False
+    
+    def reset(self, writer: Optional[BackgroundWriter] = None) -> None:
+        """Очищає журнал після збереження повного знімка."""
+        write_file(self.path, "", writer)
+        self.records = 0
+        self.torn = False
+    
+    def append(self, record: dict, writer: Optional[BackgroundWriter] = None) -> None:
+        """Дописує у журнал запис змін."""
+        if not record:
+            return
+        entry = dict(record)
+        if "pools" in entry:
+            entry["pools"] = {
+                key: {"items": change["items"], "discards": change["discards"]} if "items" in change else change
+                for key, change in entry["pools"].items()
+            }
+        if "state" in entry:
+            entry["state"] = {key: new for key, (_, new) in entry["state"].items()}
+        append_file(self.path, json.dumps(entry, ensure_ascii=False) + "\n", writer)
+        self.records += 1
+    
+    def replay(self, state: dict) -> int:
+        """Застосовує записи журналу до стану, повертає їх кількість."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    self.torn = True
+                    break
+                
+                for key, fields in record.get("players", {}).items():
+                    player = state["players"].setdefault(key, {})
+                    for field, (_, new_value) in fields.items():
+                        player[field] = new_value
+                
+                discards = state.setdefault("discards", {})
+                for key, change in record.get("pools", {}).items():
+                    if "items" in change:
+                        state[key] = change["items"]
+                        discards[key] = change.get("discards", [])
+                    else:
+                        del state.setdefault(key, [])[change["size"]:]
+                        if "discarded" in change:
+                            # Скинуті обрізаються до довжини перед записом, тож повторне
+                            # застосування (журнал поверх новішого знімка) їх не дублює
+                            pile = discards.setdefault(key, [])
+                            size = change.get("discards_size", len(pile) + len(change["discarded"]))
+                            del pile[size - len(change["discarded"]):]
+                            pile.extend(change["discarded"])
+                
+                state.update(record.get("state", {}))
+                
+                self.records += 1
+        return self.records
+
+# ================ ФОРМАТУВАННЯ ================
+
+EXPERIENCE_MAPPING = {
+    0: "новачок",
+    1: "дилетант",
+    2: "практикуючий",
+    3: "досвідчений",
+    4: "професіонал",
+    5: "експерт"
+}
+
+HOBBY_EXPERIENCE_MAPPING = {
+    0: "початківець",
+    1: "любитель",
+    2: "обізнаний",
+    3: "досвідчений",
+    4: "майстер",
+    5: "гуру"
+}
+
+# Текст стажу разом з None — для рендерера карток, що підставляє стаж без виклику функцій
+EXPERIENCE_TEXT = {None: "безробітній", **EXPERIENCE_MAPPING}
+HOBBY_EXPERIENCE_TEXT = {None: "без досвіду", **HOBBY_EXPERIENCE_MAPPING}
+
+def parse_experience_text(years: Optional[int]) -> str:
+    """Перетворює роки досвіду в текст (None — безробітній)."""
+    return EXPERIENCE_TEXT.get(years) or f"{years} років досвіду"
+
+def parse_hobby_experience_text(years: Optional[int]) -> str:
+    """Перетворює роки досвіду хобі в текст (None — без досвіду)."""
+    return HOBBY_EXPERIENCE_TEXT.get(years) or f"{years} років досвіду"
+
+def job_text(player: "Player") -> str:
+    """Професія зі стажем для картки: "досвідчений лікар"."""
+    return f"{parse_experience_text(player.job_level)} {player.job}"
+
+def hobby_text(player: "Player") -> str:
+    """Хобі зі стажем для картки: "шахи (майстер)"."""
+    return f"{player.hobies} ({parse_hobby_experience_text(player.hobby_level)})"
+
+def fobia_text(player: "Player") -> str:
+    """Фобія з відсотком для картки; фобія без відсотка показується з типовими 50%."""
+    percent = player.fobia_percent
+    return f"{player.fobias} {percent if percent is not None else 50}%"
+
+def _legacy_years(text: str, levels: Dict[str, int]) -> Optional[int]:
+    """Роки досвіду зі старого тексту стажу (None — текст не впізнано)."""
+    if text in levels:
+        return levels[text]
+    years, _, rest = text.partition(" ")
+    if rest == "років досвіду" and years.isdigit():
+        return int(years)
+    return None
+
+def _legacy_job_parts(job_string: str) -> Tuple[Optional[int], str]:
+    """Розбиває рядок професії старого формату ("досвідчений лікар") на стаж і картку."""
+    if job_string.startswith("безробітній "):
+        return None, job_string[len("безробітній "):]
+    levels = {text: years for years, text in EXPERIENCE_MAPPING.items()}
+    # Стаж може бути з кількох слів ("7 років досвіду") — шукаємо найдовший впізнаний префікс
+    words = job_string.split(" ")
+    for split in range(len(words) - 1, 0, -1):
+        years = _legacy_years(" ".join(words[:split]), levels)
+        if years is not None:
+            return years, " ".join(words[split:])
+    return 0, job_string
+
+def _legacy_hobby_parts(hobby_string: str) -> Tuple[str, Optional[int]]:
+    """Розбиває рядок хобі старого формату ("шахи (майстер)") на картку і стаж."""
+    name, _, experience = hobby_string.rpartition(" (")
+    if name and experience.endswith(")"):
+        levels = {text: years for years, text in HOBBY_EXPERIENCE_MAPPING.items()}
+        years = _legacy_years(experience[:-1], levels)
+        if years is not None or experience == "без досвіду)":
+            return name, years
+    return hobby_string, None
+
+def _legacy_fobia_parts(fobia_string: str) -> Tuple[str, Optional[int]]:
+    """Розбиває рядок фобії старого формату ("клаустрофобія 74%") на картку і відсоток."""
+    name, _, percent = fobia_string.rpartition(" ")
+    if name and percent.endswith("%") and percent[:-1].isdigit():
+        return name, int(percent[:-1])
+    return fobia_string, None
+
+# ================ ЗАПИС ГРАВЦЯ ================
+
+# Поля гравця у порядку збереження. Професія, хобі та фобія — картки каталогу,
+# а стаж і відсоток лежать поруч окремими числами: рядки на кшталт
+# "досвідчений лікар" складаються лише для картки (job_text, hobby_text, fobia_text)
+PLAYER_FIELDS = (
+    "name", "health", "job", "job_level", "age", "gender", "body", "height",
+    "fobias", "fobia_percent", "hobies", "hobby_level", "backpack",
+    "extra_info", "large_inventory", "trait", "special_cards",
+)
+_PLAYER_FIELD_SET = frozenset(PLAYER_FIELDS)
+
+class Player:
+    """Запис гравця: __slots__ замість словника на кожного гравця.
+    
+    Поводиться як словник із фіксованим набором ключів (player["job"], get,
+    items, pop), тож журнал, undo, транзакції та рендеринг працюють з ним без
+    змін. Незадане поле — None. Зберігається через to_dict/from_dict без втрат.
+    """
+    
+    __slots__ = PLAYER_FIELDS
+    
+    def __init__(self, name=None, health=None, job=None, job_level=None, age=None, gender=None,
+                 body=None, height=None, fobias=None, fobia_percent=None, hobies=None, hobby_level=None,
+                 backpack=None, extra_info=None, large_inventory=None, trait=None, special_cards=None):
+        self.name = name
+        self.health = health
+        self.job = job
+        self.job_level = job_level
+        self.age = age
+        self.gender = gender
+        self.body = body
+        self.height = height
+        self.fobias = fobias
+        self.fobia_percent = fobia_percent
+        self.hobies = hobies
+        self.hobby_level = hobby_level
+        self.backpack = backpack
+        self.extra_info = extra_info
+        self.large_inventory = large_inventory
+        self.trait = trait
+        self.special_cards = special_cards
+    
+    def __getitem__(self, field: str):
+        if field not in _PLAYER_FIELD_SET:
+            raise KeyError(field)
+        return getattr(self, field)
+    
+    def __setitem__(self, field: str, value) -> None:
+        if field not in _PLAYER_FIELD_SET:
+            raise KeyError(field)
+        setattr(self, field, value)
+    
+    def __contains__(self, field: str) -> bool:
+        return field in _PLAYER_FIELD_SET and getattr(self, field) is not None
+    
+    def __iter__(self):
+        return iter(PLAYER_FIELDS)
+    
+    def __len__(self) -> int:
+        return len(PLAYER_FIELDS)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Player):
+            return all(getattr(self, field) == getattr(other, field) for field in PLAYER_FIELDS)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"Player({', '.join(f'{field}={value!r}' for field, value in self.items())})"
+    
+    def get(self, field: str, default=None):
+        value = getattr(self, field, None) if field in _PLAYER_FIELD_SET else None
+        return default if value is None else value
+    
+    def pop(self, field: str, default=None):
+        value = self.get(field, default)
+        if field in _PLAYER_FIELD_SET:
+            setattr(self, field, None)
+        return value
+    
+    def keys(self):
+        return PLAYER_FIELDS
+    
+    def items(self):
+        return ((field, getattr(self, field)) for field in PLAYER_FIELDS)
+    
+    def copy(self) -> "Player":
+        """Копія, незалежна від змін списків (рюкзака, спеціальних карток)."""
+        return Player(*(_copy_value(getattr(self, field)) for field in PLAYER_FIELDS))
+    
+    def to_dict(self) -> dict:
+        """Словник для збереження (списки копіюються)."""
+        return {field: _copy_value(getattr(self, field)) for field in PLAYER_FIELDS}
+    
+    @classmethod
+    def from_dict(cls, fields: dict) -> "Player":
+        """Запис зі збереженого словника.
+        
+        Стан старого формату, де стаж і відсоток були частиною рядка картки,
+        розбирається тут — один раз при завантаженні.
+        """
+        player = cls(**{field: value for field, value in fields.items() if field in _PLAYER_FIELD_SET})
+        if "job_level" not in fields and isinstance(player.job, str):
+            player.job_level, player.job = _legacy_job_parts(player.job)
+        if "hobby_level" not in fields and isinstance(player.hobies, str):
+            player.hobies, player.hobby_level = _legacy_hobby_parts(player.hobies)
+        if "fobia_percent" not in fields and isinstance(player.fobias, str):
+            player.fobias, player.fobia_percent = _legacy_fobia_parts(player.fobias)
+        return player
 
-# ================ УТИЛІТИ ================
+def is_legacy_player(fields: dict) -> bool:
+    """Чи збережено гравця у старому форматі (стаж і відсоток — частина рядків карток)."""
+    return "job_level" not in fields
 
-def ensure_players_dir() -> None:
-    """Створює директорію для гравців якщо не існує."""
-    os.makedirs(PLAYERS_DIR, exist_ok=True)
+# ================ ГЕНЕРАЦІЯ ================
 
-def sanitize_filename(name: str) -> str:
-    """Очищає рядок для використання як ім'я файлу."""
-    return "".join(c for c in name if c.isalnum() or c in (" ", "_", "-")).rstrip()
+def _index_typecode(size: int) -> str:
+    """Найкомпактніший тип масиву для індексів у секцію заданого розміру."""
+    return "H" if size <= 0x10000 else "I"
 
-def load_json_file(filepath: str) -> dict:
-    """Завантажує JSON файл."""
-    with open(filepath, "r", encoding="utf-8") as f:
-        return json.load(f)
+class AliasTable:
+    """Таблиця псевдонімів (метод Вокера–Воуза): зважений вибір за O(1).
+    
+    Побудова — O(n). Вибір коштує одне rng.random(): ціла частина u * n
+    дає стовпчик, дробова — монетку між ним і його псевдонімом.
+    """
+    
+    __slots__ = ("prob", "alias")
+    
+    def __init__(self, weights: List[float]):
+        size = len(weights)
+        total = sum(weights)
+        self.prob = array("d", [1.0]) * size
+        self.alias = array("I", range(size))
+        
+        scaled = [weight * size / total for weight in weights] if total > 0 else [1.0] * size
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Залишки — наслідок похибок округлення, їхні стовпчики повні
+    
+    def __len__(self) -> int:
+        return len(self.prob)
+    
+    def sample(self, rng) -> int:
+        """Індекс, вибраний з імовірністю, пропорційною його вазі."""
+        u = rng.random() * len(self.prob)
+        column = int(u)
+        return column if u - column < self.prob[column] else self.alias[column]
 
-def save_json_file(filepath: str, data: dict) -> None:
-    """Зберігає дані у JSON файл."""
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def weighted_order(items: array, weights: List[float], rng, table: Optional[AliasTable] = None,
+                   limit: Optional[int] = None) -> array:
+    """Зважена перестановка items без повторень (або лише перші limit елементів).
+    
+    Елементи витягуються з таблиці псевдонімів, а вже взяті відкидаються;
+    коли взяті займають понад половину ваги таблиці, вона перебудовується
+    на решті. Тож кожне витягання коштує в середньому O(1), а перестановка — O(n).
+    Першим витягнутий елемент стоїть у кінці, бо колоди роздають з кінця.
+    """
+    count = len(items) if limit is None else min(limit, len(items))
+    live = list(range(len(items)))
+    if table is None:
+        table = AliasTable(weights)
+    table_weight = remaining = sum(weights)
+    taken = bytearray(len(items))
+    order = array(items.typecode)
+    
+    while len(order) < count:
+        if remaining <= table_weight / 2:
+            live = [position for position in live if not taken[position]]
+            table = AliasTable([weights[position] for position in live])
+            table_weight = remaining = sum(weights[position] for position in live)
+        position = live[table.sample(rng)]
+        if taken[position]:
+            continue
+        taken[position] = 1
+        order.append(items[position])
+        remaining -= weights[position]
+    
+    order.reverse()
+    return order
 
-def load_data() -> dict:
-    """Завантажує основні дані з data.json."""
-    return load_json_file(DATA_FILE)
+class SectionSampler:
+    """Зважений вибір карток однієї секції каталогу за O(1).
+    
+    slots — індекси карток з урахуванням кількості копій (як повна колода),
+    rarity — рідкісність кожної картки каталогу; таблиця псевдонімів будується
+    над slots один раз на каталог (див. section_sampler). Там само живе індекс
+    картки за текстом, спільний для колод усіх сесій (lookup).
+    """
+    
+    __slots__ = ("cards", "slots", "rarity", "table", "weighted", "_distinct", "_lookup")
+    
+    def __init__(self, catalog: dict, section: str):
+        cards = self.cards = catalog.get(section, [])
+        rarity = catalog.get("rarity", {}).get(section, {})
+        self.slots = array(_index_typecode(len(cards)), section_indices(catalog, section))
+        self.rarity = array("d", (rarity.get(card, 1) for card in cards))
+        # Без рідкісностей колоди перемішуються звичайним rng.shuffle
+        self.weighted = bool(rarity)
+        self.table = AliasTable([self.rarity[index] for index in self.slots]) if self.slots else None
+        self._distinct = None
+        self._lookup: Optional[Dict[str, int]] = None
+    
+    def lookup(self) -> Dict[str, int]:
+        """Індекс картки секції за текстом (будується при першому зверненні)."""
+        if self._lookup is None:
+            self._lookup = {card: index for index, card in enumerate(self.cards)}
+        return self._lookup
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def sample(self, rng) -> int:
+        """Індекс картки каталогу (з поверненням)."""
+        return self.slots[self.table.sample(rng)]
+    
+    def sample_distinct(self, rng, count: int) -> List[int]:
+        """До count різних карток каталогу; вага картки — її рідкісність, помножена на кількість копій."""
+        if self._distinct is None:
+            weights = [0.0] * len(self.rarity)
+            for index in self.slots:
+                weights[index] += self.rarity[index]
+            cards = array(_index_typecode(len(weights)), range(len(weights)))
+            self._distinct = (cards, weights, AliasTable(weights))
+        cards, weights, table = self._distinct
+        return list(reversed(weighted_order(cards, weights, rng, table, count)))
+    
+    def shuffle(self, indices: array, rng, full: bool = False) -> array:
+        """Зважена перестановка колоди; full — indices є повною секцією, тож таблиця вже готова."""
+        weights = [self.rarity[index] for index in indices]
+        return weighted_order(indices, weights, rng, self.table if full else None)
 
-def save_state(state: dict) -> None:
-    """Зберігає стан гри."""
-    ensure_players_dir()
-    save_json_file(STATE_FILE, state)
-
-def load_state() -> Optional[dict]:
-    """Завантажує збережений стан гри."""
-    if os.path.exists(STATE_FILE):
-        return load_json_file(STATE_FILE)
-    return None
+def section_sampler(catalog: dict, section: str) -> SectionSampler:
+    """Семплер секції; будується при першому зверненні та кешується у каталозі."""
+    samplers = catalog.get("_samplers")
+    if samplers is None:
+        samplers = catalog["_samplers"] = {}
+    sampler = samplers.get(section)
+    if sampler is None:
+        sampler = samplers[section] = SectionSampler(catalog, section)
+    return sampler
 
-# ================ ФОРМАТУВАННЯ ================
+def sample_card(catalog: dict, section: str, rng, default: str) -> str:
+    """Одна картка секції з урахуванням копій і рідкісності (з поверненням)."""
+    sampler = section_sampler(catalog, section)
+    if not sampler:
+        return default
+    return catalog[section][sampler.sample(rng)]
 
-EXPERIENCE_MAPPING = {
-    0: "новачок",
-    1: "дилетант",
-    2: "практикуючий",
-    3: "досвідчений",
-    4: "професіонал",
-    5: "експерт"
-}
+class CardPool:
+    """Колода карток: масиви індексів у спільний незмінний список каталогу.
+    
+    indices — стос для роздачі (береться з кінця), discards — скинуті картки.
+    pop() і discard() працюють за O(1); коли стос закінчується, у нього
+    ліниво перемішуються скинуті картки, а якщо й їх немає — свіжа копія
+    секції (base), тож колода не вичерпується навіть у великих лобі.
+    Поводиться як список рядків стосу (len, індексація, ітерація), але сесія
+    тримає лише 2–4 байти на картку замість посилань на рядки.
+    """
+    
+    __slots__ = ("cards", "indices", "discards", "base", "sampler", "section", "epoch", "_lookup")
+    
+    def __init__(self, cards: List[str], indices=(), base=(), discards=(),
+                 sampler: Optional[SectionSampler] = None, section: Optional[SectionSampler] = None):
+        typecode = _index_typecode(len(cards))
+        self.cards = cards
+        self.indices = array(typecode, indices)
+        self.discards = array(typecode, discards)
+        # Повна секція з урахуванням кількості копій; спільна для всіх копій колоди
+        self.base = base if isinstance(base, array) else array(typecode, base)
+        # Лише для секцій з рідкісностями: тоді перемішування зважене
+        self.sampler = sampler
+        # Семплер секції каталогу, що тримає спільний індекс карток (див. section_pool)
+        self.section = section
+        # Змінюється при кожній зміні, що не зводиться до pop/discard (перемішування,
+        # повернення карток), — за ним StateTracker визначає, чи достатньо дельти
+        self.epoch = 0
+        self._lookup: Optional[Dict[str, int]] = None
+    
+    def load(self, strings: List[str], discards: List[str] = ()) -> int:
+        """Дописує у стос і скинуті збережені рядки; повертає кількість невідомих карток."""
+        return self._extend(self.indices, strings) + self._extend(self.discards, discards)
+    
+    def lookup(self) -> Dict[str, int]:
+        """Індекс картки каталогу за текстом: спільний для секції, якщо колода з каталогу."""
+        if self.section is not None:
+            return self.section.lookup()
+        if self._lookup is None:
+            self._lookup = {card: index for index, card in enumerate(self.cards)}
+        return self._lookup
+    
+    def _extend(self, target: array, strings: List[str]) -> int:
+        lookup = self.lookup()
+        indices = [lookup[text] for text in strings if text in lookup]
+        target.extend(indices)
+        return len(strings) - len(indices)
+    
+    def pop(self, rng: Optional[random.Random] = None) -> str:
+        """Бере картку зі стосу; порожній стос спершу поповнюється (див. refill)."""
+        if not self.indices:
+            self.refill(rng)
+        return self.cards[self.indices.pop()]
+    
+    def refill(self, rng: Optional[random.Random] = None) -> None:
+        """Перемішує у стос скинуті картки, а якщо їх немає — свіжу копію секції.
+        
+        У секціях з рідкісностями порядок зважений: рідкісні картки частіше
+        опиняються на дні колоди.
+        """
+        rng = rng or random
+        full = not self.discards
+        if full:
+            self.indices = array(self.base.typecode, self.base)
+        else:
+            self.indices, self.discards = self.discards, array(self.discards.typecode)
+        if self.sampler is not None:
+            self.indices = self.sampler.shuffle(self.indices, rng, full)
+        else:
+            rng.shuffle(self.indices)
+        self.epoch += 1
+    
+    def discard(self, card: str) -> None:
+        """Скидає картку каталогу; невідомі значення (наприклад, "Немає") ігноруються."""
+        index = self.lookup().get(card)
+        if index is not None:
+            self.discards.append(index)
+    
+    def copy(self) -> "CardPool":
+        pool = type(self)(self.cards, self.indices, self.base, self.discards, self.sampler, self.section)
+        pool.epoch = self.epoch
+        pool._lookup = self._lookup
+        return pool
+    
+    def restored(self, strings: List[str], discards: List[str] = ()) -> "CardPool":
+        """Колода тієї ж секції з іншим вмістом стосу та скинутих карток."""
+        pool = type(self)(self.cards, base=self.base, sampler=self.sampler, section=self.section)
+        pool._lookup = self._lookup
+        pool.load(strings, discards)
+        pool.epoch = self.epoch + 1
+        return pool
+    
+    def extend(self, strings: List[str]) -> None:
+        """Повертає картки каталогу в кінець стосу."""
+        self._extend(self.indices, strings)
+        self.epoch += 1
+    
+    def to_list(self) -> List[str]:
+        cards = self.cards
+        return [cards[index] for index in self.indices]
+    
+    def discard_list(self, start: int = 0) -> List[str]:
+        """Скинуті картки (починаючи з позиції start) як рядки."""
+        cards = self.cards
+        return [cards[index] for index in self.discards[start:]]
+    
+    def __len__(self) -> int:
+        return len(self.indices)
+    
+    def __bool__(self) -> bool:
+        """Чи можна взяти картку (зі стосу, скинутих або свіжої копії секції)."""
+        return bool(self.indices or self.discards or self.base)
+    
+    def __iter__(self):
+        cards = self.cards
+        return (cards[index] for index in self.indices)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            cards = self.cards
+            return [cards[index] for index in self.indices[item]]
+        return self.cards[self.indices[item]]
+    
+    def __delitem__(self, item) -> None:
+        del self.indices[item]
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CardPool):
+            return (self.cards is other.cards and self.indices == other.indices
+                    and self.discards == other.discards)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"CardPool({len(self)} у стосі, {len(self.discards)} скинуто)"
 
-HOBBY_EXPERIENCE_MAPPING = {
-    0: "початківець",
-    1: "любитель",
-    2: "обізнаний",
-    3: "досвідчений",
-    4: "майстер",
-    5: "гуру"
-}
+class DealtPool(CardPool):
+    """Колода для одноразової роздачі (симуляція), що перемішується по ходу витягання.
+    
+    pop — крок тасування Фішера–Єйтса з кінця: картка вибирається серед
+    ще не перемішаних, тож k карток коштують O(k), а не перемішування всієї
+    секції. Стос лишається невпорядкованим лише частково, тому в стан сесії
+    така колода не потрапляє. Колоди з рідкісностями перемішуються повністю.
+    """
+    
+    __slots__ = ("unshuffled",)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unshuffled = 0
+    
+    def copy(self) -> "DealtPool":
+        pool = super().copy()
+        pool.unshuffled = self.unshuffled
+        return pool
+    
+    def pop(self, rng: Optional[random.Random] = None) -> str:
+        if not self.indices:
+            self.refill(rng)
+        indices = self.indices
+        if self.unshuffled:
+            position = (rng or random).randrange(len(indices))
+            indices[position], indices[-1] = indices[-1], indices[position]
+            self.unshuffled -= 1
+        return self.cards[indices.pop()]
+    
+    def refill(self, rng: Optional[random.Random] = None) -> None:
+        if self.sampler is not None or self.discards:
+            super().refill(rng)
+            self.unshuffled = 0
+            return
+        self.indices = array(self.base.typecode, self.base)
+        self.unshuffled = len(self.indices)
+        self.epoch += 1
 
-def parse_experience_text(years: int) -> str:
-    """Перетворює роки досвіду в текст."""
-    return EXPERIENCE_MAPPING.get(years, f"{years} років досвіду")
+def section_pool(catalog: dict, section: str, pool_class: type = CardPool) -> CardPool:
+    """Порожня колода секції: повна колода, індекс карток і семплер — спільні з каталогом."""
+    sampler = section_sampler(catalog, section)
+    return pool_class(sampler.cards, base=sampler.slots, sampler=sampler if sampler.weighted else None,
+                      section=sampler)
 
-def parse_hobby_experience_text(years: int) -> str:
-    """Перетворює роки досвіду хобі в текст."""
-    return HOBBY_EXPERIENCE_MAPPING.get(years, f"{years} років досвіду")
+def attach_card_pools(state: dict, data: dict) -> None:
+    """Перетворює збережені списки рядків у пулах стану на CardPool.
+    
+    Скинуті картки зберігаються окремо, у state["discards"][пул].
+    """
+    discards = state.pop("discards", None) or {}
+    for key, value in list(state.items()):
+        if not (key.endswith("_pool") and isinstance(value, list)):
+            continue
+        pool = section_pool(data, key[:-len("_pool")])
+        missing = pool.load(value, discards.get(key, []))
+        if missing:
+            print(f"⚠️ {key}: {missing} карток більше немає у data.json — пропущено")
+        state[key] = pool
 
-def extract_job_parts(job_string: str) -> Tuple[str, str]:
-    """Розбиває рядок професії на досвід та назву."""
-    if not isinstance(job_string, str):
-        return "безробітній", "Безробітній"
+# Скільки разів перевибирати хворобу з виключених, перш ніж відфільтрувати список
+HEALTH_SAMPLER_RETRIES = 8
+
+class HealthSampler:
+    """Вибір хвороби з каталогу за O(1), без перебудови списків на кожен виклик.
     
-    parts = job_string.split()
-    if len(parts) >= 2:
-        exp = parts[0]
-        name = " ".join(parts[1:])
-        return exp, name
-    return "новачок", job_string
-
-def extract_hobby_parts(hobby_string: str) -> Tuple[str, str]:
-    """Розбиває рядок хобі на назву та досвід."""
-    if not isinstance(hobby_string, str):
-        return "Ледащо", "без досвіду"
-    
-    if "(" in hobby_string and ")" in hobby_string:
-        name = hobby_string.split("(")[0].strip()
-        exp = hobby_string.split("(")[1].replace(")", "").strip()
-        return name, exp
-    return hobby_string, "без досвіду"
-
-def extract_fobia_parts(fobia_string: str) -> Tuple[str, str]:
-    """Розбиває рядок фобії на назву та відсоток."""
-    if not isinstance(fobia_string, str):
-        return "Немає", "50%"
-    
-    if "%" in fobia_string:
-        parts = fobia_string.rsplit(" ", 1)
-        if len(parts) == 2:
-            return parts[0], parts[1]
-    return fobia_string, "50%"
+    Прості хвороби (з урахуванням кількості копій) та хвороби зі стадіями
+    зберігаються одним масивом індексів у names; стадії — у stages за тим самим
+    індексом. Пул здоров'я сесії ніколи не витрачається, тож достатньо одного
+    семплера на каталог. Якщо хвороби мають рідкісність, вибір іде через
+    таблицю псевдонімів (table), інакше — рівноймовірно.
+    """
+    
+    __slots__ = ("names", "stages", "slots", "weights", "table")
+    
+    def __init__(self, data: dict):
+        health_with_stages = data.get("health_with_stages", {})
+        self.names: List[str] = []
+        lookup: Dict[str, int] = {}
+        slots = []
+        for name in [*(data.get("health", [])[i] for i in section_indices(data, "health")),
+                     *data.get("health_staged", [])]:
+            index = lookup.get(name)
+            if index is None:
+                index = lookup[name] = len(self.names)
+                self.names.append(name)
+            slots.append(index)
+        self.stages = [health_with_stages.get(name) for name in self.names]
+        self.slots = array(_index_typecode(len(self.names)), slots)
+        
+        rarity = data.get("rarity", {}).get("health", {})
+        self.weights = [rarity.get(self.names[index], 1) for index in slots] if rarity else None
+        self.table = AliasTable(self.weights) if rarity and slots else None
+    
+    def __len__(self) -> int:
+        return len(self.slots)
+    
+    def draw(self, rng: random.Random, exclude: Optional[Set[str]] = None) -> str:
+        """Повертає хворобу (зі стадією, якщо вона є) або "-", якщо вибирати нічого."""
+        if not self.slots:
+            return "-"
+        
+        names = self.names
+        index = self._sample(rng)
+        if exclude:
+            # Виключень зазвичай кілька, тож перевибір майже завжди вдається одразу
+            for _ in range(HEALTH_SAMPLER_RETRIES):
+                if names[index] not in exclude:
+                    break
+                index = self._sample(rng)
+            else:
+                allowed = [(i, position) for position, i in enumerate(self.slots) if names[i] not in exclude]
+                if not allowed:
+                    return "-"
+                if self.weights is None:
+                    index = rng.choice(allowed)[0]
+                else:
+                    index = rng.choices(allowed, [self.weights[position] for _, position in allowed])[0][0]
+            exclude.add(names[index])
+        
+        stages = self.stages[index]
+        if stages:
+            return f"{names[index]} ({rng.choice(stages)})"
+        return names[index]
 
-# ================ ГЕНЕРАЦІЯ ================
+    def _sample(self, rng: random.Random) -> int:
+        if self.table is not None:
+            return self.slots[self.table.sample(rng)]
+        return self.slots[rng.randrange(len(self.slots))]
+
+def health_sampler(data: dict) -> HealthSampler:
+    """Семплер здоров'я каталогу; будується при першому зверненні та кешується у data."""
+    sampler = data.get("_health_sampler")
+    if sampler is None:
+        sampler = data["_health_sampler"] = HealthSampler(data)
+    return sampler
 
 class PoolManager:
-    """Менеджер для роботи з пулами даних."""
+    """Менеджер для роботи з пулами даних.
     
-    def __init__(self, data: dict):
+    dealt_only — колоди DealtPool для роздач, після яких пули не зберігаються (симуляція).
+    """
+    
+    def __init__(self, data: dict, rng: Optional[random.Random] = None, dealt_only: bool = False):
+        self.data = data
+        self.rng = rng or random.Random()
         self.pools = {}
-        self._initialize_pools(data)
+        self._initialize_pools(data, DealtPool if dealt_only else CardPool)
     
-    def _initialize_pools(self, data: dict) -> None:
+    def _initialize_pools(self, data: dict, pool_class: type = CardPool) -> None:
         """Ініціалізує пули даних."""
-        pool_names = [
-            "backpack", "body", "traits", "extra_info",
-            "large_inventory", "health", "jobs", "fobias",
-            "hobies", "special_cards"
-        ]
+        for name in POOL_NAMES:
+            pool = self.pools[name] = section_pool(data, name, pool_class)
+            pool.refill(self.rng)
         
-        for name in pool_names:
-            pool_data = data.get(name, [])
-            if isinstance(pool_data, list):
-                self.pools[name] = pool_data.copy()
-                random.shuffle(self.pools[name])
-            elif isinstance(pool_data, dict):
-                self.pools[name] = list(pool_data.keys())
-                random.shuffle(self.pools[name])
-            else:
-                self.pools[name] = []
-        
-        # Спеціальний пул для здоров'я зі стадіями
-        self.health_with_stages = data.get("health_with_stages", {})
+        # Здоров'я не витрачається з пулу — хвороби вибирає семплер каталогу
+        self.health_sampler = health_sampler(data)
     
-    def get_pool(self, name: str) -> List:
-        """Повертає копію пулу."""
-        return self.pools.get(name, []).copy()
+    def get_pool(self, name: str) -> CardPool:
+        """Повертає копію пулу (порожню колоду, якщо пулу немає)."""
+        pool = self.pools.get(name)
+        return pool.copy() if pool is not None else CardPool([])
     
     def pop_from_pool(self, pool_name: str, default=None):
         """Бере елемент з пулу."""
         pool = self.pools.get(pool_name, [])
         if pool:
-            return pool.pop()
+            return pool.pop(self.rng)
         return default
     
-    def add_to_pool(self, pool_name: str, item) -> None:
-        """Додає елемент до пулу."""
+    def add_to_pool(self, pool_name: str, item: str) -> None:
+        """Додає картку каталогу до пулу."""
         if pool_name not in self.pools:
-            self.pools[pool_name] = []
-        self.pools[pool_name].append(item)
+            self.pools[pool_name] = section_pool(self.data, pool_name)
+        pool = self.pools[pool_name]
+        pool.indices.append(pool.lookup()[item])
     
     def shuffle_pool(self, pool_name: str) -> None:
         """Перемішує пул."""
         if pool_name in self.pools:
-            random.shuffle(self.pools[pool_name])
+            pool = self.pools[pool_name]
+            if pool.sampler is not None:
+                pool.indices = pool.sampler.shuffle(pool.indices, self.rng)
+            else:
+                self.rng.shuffle(pool.indices)
+
+def _gender_outcomes() -> Tuple[List[str], List[float]]:
+    """Усі варіанти статі з їхніми ймовірностями (для таблиці псевдонімів)."""
+    outcomes, weights = ["андроїд"], [0.001]
+    for gender, infertile, orientation in (("чоловіча", "безплідний", "гей"),
+                                           ("жіноча", "безплідна", "лесбіянка")):
+        for mask in range(8):
+            details = [detail for bit, detail in enumerate((infertile, orientation, "транс")) if mask >> bit & 1]
+            weight = 0.999 * 0.5
+            for bit, chance in enumerate((0.10, 0.05, 0.01)):
+                weight *= chance if mask >> bit & 1 else 1 - chance
+            outcomes.append(f"{gender} ({', '.join(details)})" if details else gender)
+            weights.append(weight)
+    return outcomes, weights
 
-def generate_gender() -> str:
+# Стать з характеристиками вибирається одним зверненням до rng замість п'яти
+GENDER_OUTCOMES, GENDER_WEIGHTS = _gender_outcomes()
+GENDER_TABLE = AliasTable(GENDER_WEIGHTS)
+
+def generate_gender(rng: Optional[random.Random] = None) -> str:
     """Генерує стать з додатковими характеристиками."""
-    roll = random.random()
-    
-    if roll < 0.001:
-        return "андроїд"
-    
-    gender = random.choice(["чоловіча", "жіноча"])
-    details = []
-    
-    if random.random() < 0.10:
-        details.append("безплідний" if gender == "чоловіча" else "безплідна")
-    
-    if random.random() < 0.05:
-        details.append("гей" if gender == "чоловіча" else "лесбіянка")
-    
-    if random.random() < 0.01:
-        details.append("транс")
-    
-    if details:
-        return f"{gender} ({', '.join(details)})"
-    return gender
+    return GENDER_OUTCOMES[GENDER_TABLE.sample(rng or random)]
 
-def assign_job_with_experience(jobs_pool: List[str], experience_years: Optional[int] = None) -> Tuple[str, str]:
-    """Генерує професію зі стажем."""
+def assign_job_with_experience(jobs_pool: CardPool, experience_years: Optional[int] = None,
+                               rng: Optional[random.Random] = None) -> Tuple[Optional[int], str]:
+    """Генерує професію зі стажем: (роки досвіду, картка)."""
     if not jobs_pool:
-        return "безробітній", "Безробітній"
+        return None, "Безробітній"
     
-    job = jobs_pool.pop()
+    job = jobs_pool.pop(rng)
     if experience_years is None:
-        experience_years = random.randint(0, 5)
-    
-    exp_text = parse_experience_text(experience_years)
-    return exp_text, job
+        experience_years = (rng or random).randint(0, 5)
+    return experience_years, job
 
-def assign_hobby_with_experience(hobbies_pool: List[str], experience_years: Optional[int] = None) -> Tuple[str, str]:
-    """Генерує хобі зі стажем."""
+def assign_hobby_with_experience(hobbies_pool: CardPool, experience_years: Optional[int] = None,
+                                 rng: Optional[random.Random] = None) -> Tuple[str, Optional[int]]:
+    """Генерує хобі зі стажем: (картка, роки досвіду)."""
     if not hobbies_pool:
-        return "Ледащо", "без досвіду"
+        return "Ледащо", None
     
-    hobby = hobbies_pool.pop()
+    hobby = hobbies_pool.pop(rng)
     if experience_years is None:
-        experience_years = random.randint(0, 5)
-    
-    exp_text = parse_hobby_experience_text(experience_years)
-    return hobby, exp_text
+        experience_years = (rng or random).randint(0, 5)
+    return hobby, experience_years
 
 def assign_disease_with_stage(pool_manager: PoolManager, used_health: Set[str]) -> str:
     """Призначає захворювання зі стадією."""
-    # Отримуємо всі доступні захворювання
-    health_pool = pool_manager.get_pool("health")
-    health_with_stages = pool_manager.health_with_stages
-    
-    all_health = (
-        [h for h in health_pool if h not in used_health] +
-        [d for d in health_with_stages.keys() if d not in used_health]
-    )
-    
-    if not all_health:
-        return "-"
-    
-    health = random.choice(all_health)
-    used_health.add(health)
-    
-    if health in health_with_stages:
-        stage = random.choice(health_with_stages[health])
-        return f"{health} ({stage})"
-    
-    return health
+    return pool_manager.health_sampler.draw(pool_manager.rng, used_health)
 
-def generate_player(name: str, pool_manager: PoolManager, items_per_player: int = 2, cards_per_player: int = 2) -> dict:
+def generate_player(name: str, pool_manager: PoolManager, items_per_player: int = 2, cards_per_player: int = 2) -> Player:
     """Генерує дані одного гравця."""
+    rng = pool_manager.rng
     used_health = set()
     
     # Основні характеристики
-    height = random.randint(140, 200)
-    age = random.choice(pool_manager.pools.get("ages", [25]))
-    gender = generate_gender()
+    height = rng.randint(140, 200)
+    age = rng.choice(pool_manager.data.get("ages", [25]))
+    gender = generate_gender(rng)
     
     # Генерація спискових даних
     items = [pool_manager.pop_from_pool("backpack") for _ in range(items_per_player)]
@@ -245,36 +2127,38 @@ def generate_player(name: str, pool_manager: PoolManager, items_per_player: int
     cards = [card for card in cards if card is not None]
     
     # Професія та хобі
-    exp_text, job = assign_job_with_experience(pool_manager.pools.get("jobs", []))
-    hobby, hobby_exp = assign_hobby_with_experience(pool_manager.pools.get("hobies", []))
+    job_years, job = assign_job_with_experience(pool_manager.pools["jobs"], rng=rng)
+    hobby, hobby_years = assign_hobby_with_experience(pool_manager.pools["hobies"], rng=rng)
     
     # Фобія з відсотком
     fobia_name = pool_manager.pop_from_pool("fobias", "Немає")
-    fobia_percentage = random.randint(33, 100)
-    
-    player = {
-        "name": name,
-        "health": assign_disease_with_stage(pool_manager, used_health),
-        "job": f"{exp_text} {job}",
-        "age": age,
-        "gender": gender,
-        "body": pool_manager.pop_from_pool("body", "Невідомо"),
-        "height": height,
-        "fobias": f"{fobia_name} {fobia_percentage}%",
-        "hobies": f"{hobby} ({hobby_exp})",
-        "backpack": items,
-        "extra_info": pool_manager.pop_from_pool("extra_info", "Немає"),
-        "large_inventory": pool_manager.pop_from_pool("large_inventory", "Відсутній"),
-        "trait": pool_manager.pop_from_pool("traits", "Немає"),
-        "special_cards": cards
-    }
+    fobia_percentage = rng.randint(33, 100)
     
-    return player
+    return Player(
+        name=name,
+        health=assign_disease_with_stage(pool_manager, used_health),
+        job=job,
+        job_level=job_years,
+        age=age,
+        gender=gender,
+        body=pool_manager.pop_from_pool("body", "Невідомо"),
+        height=height,
+        fobias=fobia_name,
+        fobia_percent=fobia_percentage,
+        hobies=hobby,
+        hobby_level=hobby_years,
+        backpack=items,
+        extra_info=pool_manager.pop_from_pool("extra_info", "Немає"),
+        large_inventory=pool_manager.pop_from_pool("large_inventory", "Відсутній"),
+        trait=pool_manager.pop_from_pool("traits", "Немає"),
+        special_cards=cards,
+    )
 
-def generate_players(player_names: List[str], data: dict, items_per_player: int = 2, cards_per_player: int = 2) -> Tuple[dict, PoolManager]:
-    """Генерує дані всіх гравців."""
-    pool_manager = PoolManager(data)
-    pool_manager.pools["ages"] = data.get("ages", [25]).copy()
+@timed("generate_players")
+def generate_players(player_names: List[str], data: dict, items_per_player: int = 2, cards_per_player: int = 2,
+                     rng: Optional[random.Random] = None, dealt_only: bool = False) -> Tuple[dict, PoolManager]:
+    """Генерує дані всіх гравців (dealt_only — див. PoolManager)."""
+    pool_manager = PoolManager(data, rng, dealt_only)
     
     players = {}
     for name in player_names:
@@ -284,47 +2168,444 @@ def generate_players(player_names: List[str], data: dict, items_per_player: int
     
     return players, pool_manager
 
+# ================ ВЕКТОРИЗОВАНА ГЕНЕРАЦІЯ ================
+
+def _np_alias_sample(table: AliasTable, gen, size: int):
+    """size індексів таблиці псевдонімів одним викликом генератора NumPy."""
+    u = gen.random(size) * len(table)
+    column = np.minimum(u.astype(np.intp), len(table) - 1)
+    prob = np.asarray(table.prob, dtype=np.float64)
+    alias = np.asarray(table.alias, dtype=np.intp)
+    return np.where(u - column < prob[column], column, alias[column])
+
+def _np_deck_order(pool: CardPool, gen):
+    """Свіжа перестановка секції у порядку роздачі (зважена, якщо є рідкісності)."""
+    base = np.asarray(pool.base, dtype=np.intp)
+    if pool.sampler is None:
+        return gen.permutation(base)
+    # Ключі Ефраїмідіса–Спіракіса: сортування за log(u) / вага дає зважену
+    # перестановку з тим самим розподілом, що й weighted_order, одним argsort
+    rarity = np.asarray(pool.sampler.rarity, dtype=np.float64)[base]
+    keys = np.log(gen.random(len(base))) / rarity
+    return base[np.argsort(-keys, kind="stable")]
+
+def _np_deal(pool: CardPool, gen, count: int):
+    """Роздає count карток з колоди масивом індексів (у порядку роздачі).
+    
+    Колода поповнюється свіжими перестановками секції стільки разів,
+    скільки потрібно; залишок останньої стає стосом колоди. Для порожньої
+    секції повертається порожній масив.
+    """
+    if not pool or count <= 0:
+        return np.empty(0, dtype=np.intp)
+    parts = [np.asarray(pool.indices, dtype=np.intp)[::-1]]
+    total = len(parts[0])
+    while total < count:
+        order = _np_deck_order(pool, gen)
+        parts.append(order)
+        total += len(order)
+        pool.epoch += 1
+    sequence = np.concatenate(parts)
+    pool.indices = array(pool.indices.typecode, sequence[count:][::-1].tolist())
+    return sequence[:count]
+
+class PlayerBatch:
+    """Гравці, згенеровані векторно: числові поля та індекси карток — масиви NumPy.
+    
+    Записи Player (картки та хвороби зі стадіями) складаються лише
+    у player()/players() — по стовпчиках, а не по гравцях. Стовпчика секції
+    без карток немає — тоді береться значення за замовчуванням.
+    """
+    
+    __slots__ = ("names", "data", "columns")
+    
+    def __init__(self, names: List[str], data: dict, columns: dict):
+        self.names = names
+        self.data = data
+        self.columns = columns
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def player(self, number: int) -> Player:
+        """Запис одного гравця."""
+        return Player(*(values[0] for values in self._fields(slice(number, number + 1))))
+    
+    def players(self) -> Dict[str, Player]:
+        """Усі гравці: ім'я -> запис."""
+        return {row[0]: Player(*row) for row in zip(*self._fields(slice(None)))}
+    
+    def _fields(self, rows: slice) -> List[list]:
+        """Стовпчики значень для гравців rows, у порядку PLAYER_FIELDS."""
+        data = self.data
+        columns = {key: column[rows] for key, column in self.columns.items()}
+        names = self.names[rows]
+        size = len(names)
+        
+        def lookup(values: List[str], column):
+            return np.asarray(values, dtype=object)[column].tolist()
+        
+        def cards(section: str, default):
+            if section in columns:
+                return lookup(data[section], columns[section])
+            return [[] for _ in range(size)] if default is None else [default] * size
+        
+        health = ["-"] * size
+        if "health" in columns:
+            sampler = health_sampler(data)
+            diseases, stages = sampler.names, sampler.stages
+            health = [
+                f"{diseases[index]} ({stages[index][stage]})" if stages[index] else diseases[index]
+                for index, stage in zip(columns["health"].tolist(), columns["stage"].tolist())
+            ]
+        
+        job_levels = columns["job_years"].tolist() if "jobs" in columns else [None] * size
+        hobby_levels = columns["hobby_years"].tolist() if "hobies" in columns else [None] * size
+        
+        return [
+            names,
+            health,
+            cards("jobs", "Безробітній"),
+            job_levels,
+            columns["age"].tolist(),
+            lookup(GENDER_OUTCOMES, columns["gender"]),
+            cards("body", "Невідомо"),
+            columns["height"].tolist(),
+            cards("fobias", "Немає"),
+            columns["fobia_percent"].tolist(),
+            cards("hobies", "Ледащо"),
+            hobby_levels,
+            cards("backpack", None),
+            cards("extra_info", "Немає"),
+            cards("large_inventory", "Відсутній"),
+            cards("traits", "Немає"),
+            cards("special_cards", None),
+        ]
+
+@timed("generate_players")
+def generate_players_bulk(player_names: List[str], data: dict, items_per_player: int = 2,
+                          cards_per_player: int = 2, seed: Optional[int] = None) -> Tuple[PlayerBatch, Dict[str, CardPool]]:
+    """Векторна генерація великих лобі (потрібен NumPy).
+    
+    Кожен числовий атрибут (зріст, вік, стать, стаж, відсоток фобії, хвороба)
+    та кожна колода витягуються масивом за один виклик генератора NumPy
+    замість окремих викликів random на гравця. Повертає гравців і колоди,
+    з яких вони роздані (як пули PoolManager).
+    """
+    if load_numpy() is None:
+        raise RuntimeError("Векторна генерація потребує NumPy: pip install numpy")
+    
+    gen = np.random.default_rng(seed)
+    names = [name.strip() for name in player_names]
+    count = len(names)
+    
+    pools = {}
+    for name in POOL_NAMES:
+        pools[name] = section_pool(data, name)
+    
+    ages = np.asarray(data.get("ages", [25]))
+    columns = {
+        "height": gen.integers(140, 201, count),
+        "age": ages[gen.integers(0, len(ages), count)],
+        "gender": _np_alias_sample(GENDER_TABLE, gen, count),
+        "job_years": gen.integers(0, 6, count),
+        "hobby_years": gen.integers(0, 6, count),
+        "fobia_percent": gen.integers(33, 101, count),
+    }
+    
+    # Здоров'я не витрачається з колоди — хвороби вибирає семплер каталогу
+    sampler = health_sampler(data)
+    if sampler.slots:
+        slots = np.asarray(sampler.slots, dtype=np.intp)
+        positions = (_np_alias_sample(sampler.table, gen, count) if sampler.table is not None
+                     else gen.integers(0, len(slots), count))
+        health = slots[positions]
+        stage_counts = np.asarray([len(stages or ()) for stages in sampler.stages], dtype=np.intp)
+        columns["health"] = health
+        columns["stage"] = (gen.random(count) * stage_counts[health]).astype(np.intp)
+    
+    for section, per_player in (("backpack", items_per_player), ("special_cards", cards_per_player)):
+        dealt = _np_deal(pools[section], gen, count * per_player)
+        if len(dealt):
+            columns[section] = dealt.reshape(count, per_player)
+    for section in ("jobs", "hobies", "fobias", "body", "extra_info", "large_inventory", "traits"):
+        dealt = _np_deal(pools[section], gen, count)
+        if len(dealt):
+            columns[section] = dealt
+    
+    return PlayerBatch(names, data, columns), pools
+
 # ================ ЗБЕРЕЖЕННЯ ФАЙЛІВ ================
 
-def save_player_files(players: Dict[str, dict]) -> None:
+def save_player_files(players: Dict[str, dict], directory: str = PLAYERS_DIR,
+                      cache: Optional["CardCache"] = None,
+                      writer: Optional[BackgroundWriter] = None) -> None:
     """Зберігає файли для всіх гравців."""
-    ensure_players_dir()
+    ensure_players_dir(directory)
     for player in players.values():
-        save_single_player_file(player)
-
-def save_single_player_file(player: dict) -> None:
-    """Зберігає файл для одного гравця."""
-    ensure_players_dir()
-    fname = os.path.join(PLAYERS_DIR, f"{sanitize_filename(player['name'])}.txt")
-    
-    # Форматування фобії
-    fobia_display = player["fobias"]
-    if "%" not in player["fobias"]:
-        fobia_display = f"{player['fobias']} {random.randint(33, 100)}%"
-    
-    # Форматування списків
-    backpack_str = format_list(player.get('backpack', []))
-    special_cards_str = format_list(player.get('special_cards', []))
-    
-    with open(fname, "w", encoding="utf-8") as f:
-        lines = [
-            f"Гравець: {player['name']}",
-            f"Стать: {player['gender']}, {player['age']} років",
-            f"Статура: {player['body']}, {player['height']} см",
-            f"Риса характеру: {player['trait']}",
-            f"Професія: {player['job']}",
-            f"Здоров'я: {player['health']}",
-            f"Хобі: {player['hobies']}",
-            f"Фобія: {fobia_display}",
-            f"Додаткові відомості: {player['extra_info']}",
-            f"Великий інвентар: {player['large_inventory']}",
-            f"Рюкзак: {backpack_str}",
-        ]
+        save_single_player_file(player, directory, cache, writer)
+
+def player_card_name(player: dict) -> str:
+    """Ім'я файлу картки гравця (і члена архіву лобі)."""
+    return f"{sanitize_filename(player['name'])}.txt"
+
+def player_card_path(player: dict, directory: str = PLAYERS_DIR) -> str:
+    """Шлях до файлу картки гравця."""
+    return os.path.join(directory, player_card_name(player))
+
+# Поля картки гравця: ключ (для JSON), підпис, поля гравця, від яких залежить рядок,
+# та значення для гравця p — рядок або список карток (для ключів з CARD_LIST_FIELDS).
+# Рядки полів з CARD_OPTIONAL_FIELDS пропускаються, коли значення None
+CARD_FIELDS = [
+    ("name", "Гравець", ("name",), lambda p: p.name),
+    ("gender", "Стать", ("gender", "age"), lambda p: f"{p.gender}, {p.age} років"),
+    ("body", "Статура", ("body", "height"), lambda p: f"{p.body}, {p.height} см"),
+    ("trait", "Риса характеру", ("trait",), lambda p: p.trait),
+    ("job", "Професія", ("job", "job_level"), job_text),
+    ("health", "Здоров'я", ("health",), lambda p: p.health),
+    ("hobies", "Хобі", ("hobies", "hobby_level"), hobby_text),
+    ("fobias", "Фобія", ("fobias", "fobia_percent"), fobia_text),
+    ("extra_info", "Додаткові відомості", ("extra_info",), lambda p: p.extra_info),
+    ("large_inventory", "Великий інвентар", ("large_inventory",), lambda p: p.large_inventory),
+    ("backpack", "Рюкзак", ("backpack",), lambda p: p.backpack or []),
+    ("special_cards", "Спеціальні картки", ("special_cards",), lambda p: p.special_cards or None),
+]
+CARD_LIST_FIELDS = {"backpack", "special_cards"}
+CARD_OPTIONAL_FIELDS = {"special_cards"}
+# Поля гравця, від яких залежить картка (CardCache перерендерює картку лише при їх зміні)
+CARD_DEPENDENCIES = tuple(dict.fromkeys(field for _, _, fields, _ in CARD_FIELDS for field in fields))
+
+def card_fields(player: dict) -> List[Tuple[str, str, object]]:
+    """Поля картки гравця: (ключ, підпис, значення) — один прохід CARD_FIELDS для всіх форматів."""
+    fields = []
+    for key, label, _, value_of in CARD_FIELDS:
+        value = value_of(player)
+        if value is not None or key not in CARD_OPTIONAL_FIELDS:
+            fields.append((key, label, value))
+    return fields
+
+def format_text_card(fields: list) -> str:
+    """Текстова картка: рядок "підпис: значення" на поле, списки — через format_list."""
+    return "\n".join(
+        f"{label}: {format_list(value) if key in CARD_LIST_FIELDS else value}" for key, label, value in fields
+    )
+
+def format_json_card(fields: list) -> str:
+    """JSON-картка: список об'єктів з ключем, підписом і значенням поля."""
+    return json.dumps([{"key": key, "label": label, "value": value} for key, label, value in fields],
+                      ensure_ascii=False)
+
+# Сталі початки полів HTML-картки: підписи екрануються один раз, а не на кожен рендер
+_HTML_HEADS = {key: f"<dt>{html.escape(label)}</dt><dd>" for key, label, _, _ in CARD_FIELDS}
+
+def format_html_card(fields: list) -> str:
+    """HTML-картка: список визначень <dl class="bunker-card">."""
+    parts = ['<dl class="bunker-card">']
+    for key, _, value in fields:
+        if key not in CARD_LIST_FIELDS:
+            parts.append(f"{_HTML_HEADS[key]}{html.escape(str(value))}</dd>")
+        elif value:
+            parts.append(f"{_HTML_HEADS[key]}<ul><li>{'</li><li>'.join(map(html.escape, value))}</li></ul></dd>")
+        else:
+            parts.append(f"{_HTML_HEADS[key]}—</dd>")
+    parts.append("</dl>")
+    return "".join(parts)
+
+# Формати картки: назва -> функція, що складає картку з полів card_fields
+CARD_FORMATS: Dict[str, Callable[[list], str]] = {
+    "txt": format_text_card,
+    "json": format_json_card,
+    "html": format_html_card,
+}
+
+def text_card(p) -> str:
+    """Текст картки гравця — те саме, що format_text_card(card_fields(p)).
+    
+    Картки .txt перерендерюються на кожну зміну гравця, тому текст складається
+    одним f-рядком без проходу таблицею полів; тест звіряє його з CARD_FIELDS.
+    """
+    special = p.special_cards
+    return (
+        f"Гравець: {p.name}\n"
+        f"Стать: {p.gender}, {p.age} років\n"
+        f"Статура: {p.body}, {p.height} см\n"
+        f"Риса характеру: {p.trait}\n"
+        f"Професія: {EXPERIENCE_TEXT.get(p.job_level) or parse_experience_text(p.job_level)} {p.job}\n"
+        f"Здоров'я: {p.health}\n"
+        f"Хобі: {p.hobies} ({HOBBY_EXPERIENCE_TEXT.get(p.hobby_level) or parse_hobby_experience_text(p.hobby_level)})\n"
+        f"Фобія: {p.fobias} {50 if p.fobia_percent is None else p.fobia_percent}%\n"
+        f"Додаткові відомості: {p.extra_info}\n"
+        f"Великий інвентар: {p.large_inventory}\n"
+        f"Рюкзак: {format_list(p.backpack or [])}"
+        + (f"\nСпеціальні картки: {format_list(special)}" if special else "")
+    )
+
+def render_card(player: dict, formats=("txt",)) -> Dict[str, str]:
+    """Рендерить картку гравця в кілька форматів за один прохід полями."""
+    unknown = [name for name in formats if name not in CARD_FORMATS]
+    if unknown:
+        raise ValueError(f"Невідомий формат картки: {', '.join(unknown)}")
+    fields = card_fields(player) if any(name != "txt" for name in formats) else None
+    return {name: text_card(player) if name == "txt" else CARD_FORMATS[name](fields) for name in formats}
+
+def render_player_card(player: dict) -> str:
+    """Текст картки гравця."""
+    return text_card(player)
+
+class CardCache:
+    """Кеш відрендерених карток гравців.
+    
+    Для кожного файлу пам'ятає значення полів, з яких зібрано картку
+    (CARD_DEPENDENCIES), і перерендерює картку лише тоді, коли якесь з них
+    змінилося. Незмінна картка не перезаписується; при промаху кешу
+    (наприклад, після завантаження стану) картка порівнюється з файлом на
+    диску. Кеш обслуговує інтерактивні сесії, тож пише лише окремі файли.
+    """
+    
+    __slots__ = ("entries", "bunkers")
+    
+    def __init__(self):
+        # шлях -> значення полів картки
+        self.entries: Dict[str, list] = {}
+        # шлях -> останній записаний бункер
+        self.bunkers: Dict[str, dict] = {}
+    
+    def save(self, player: dict, directory: str = PLAYERS_DIR,
+             writer: Optional[BackgroundWriter] = None) -> bool:
+        """Записує картку, якщо вона змінилася; повертає, чи був запис."""
+        path = player_card_path(player, directory)
+        values = [player.get(field) for field in CARD_DEPENDENCIES]
+        known = self.entries.get(path)
+        if known == values:
+            return False
+        
+        self.entries[path] = [_copy_value(value) for value in values]
+        text = render_player_card(player)
+        # Файл, запис якого ще в черзі, на диску застарілий — порівнювати нема з чим
+        if known is None and (writer is None or not writer.pending(path)):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    if f.read() == text:
+                        return False
+            except OSError:
+                pass
         
-        if player.get('special_cards'):
-            lines.append(f"Спеціальні картки: {special_cards_str}")
+        ensure_players_dir(directory)
+        write_file(path, text, writer)
+        return True
+    
+    def save_bunker(self, bunker: dict, directory: str = PLAYERS_DIR,
+                    writer: Optional[BackgroundWriter] = None) -> bool:
+        """Записує bunker.txt, якщо бункер змінився; повертає, чи був запис."""
+        path = os.path.join(directory, BUNKER_FILE)
+        known = self.bunkers.get(path)
+        if known == bunker:
+            return False
+        
+        self.bunkers[path] = bunker
+        text = render_bunker(bunker)
+        if known is None and (writer is None or not writer.pending(path)):
+            if _read_text(path) == text:
+                return False
         
-        f.write("\n".join(lines))
+        ensure_players_dir(directory)
+        write_file(path, text, writer)
+        return True
+
+def archive_path(directory: str = PLAYERS_DIR) -> str:
+    return os.path.join(directory, ARCHIVE_FILE)
+
+def _zip_bytes(members) -> bytes:
+    """Zip-архів з пар (ім'я члена, текст), що додаються в міру рендерингу."""
+    import zipfile
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, text in members:
+            archive.writestr(name, text)
+    return buffer.getvalue()
+
+def unpack_lobby_archive(directory: str) -> bool:
+    """Розпаковує cards.zip лобі в окремі файли і видаляє архів; повертає, чи був архів.
+    
+    Архівна розкладка — лише для згенерованих лобі: сесія, що продовжує таке
+    лобі, далі переписує картки змінених гравців окремими файлами.
+    """
+    path = archive_path(directory)
+    if not os.path.exists(path):
+        return False
+    import zipfile
+    with zipfile.ZipFile(path) as archive:
+        members = [(name, archive.read(name).decode("utf-8")) for name in archive.namelist()]
+    for name, text in members:
+        write_file(os.path.join(directory, name), text)
+    remove_file(path)
+    return True
+
+def save_lobby_archive(players: Dict[str, dict], bunker: dict, directory: str = PLAYERS_DIR,
+                       writer: Optional[BackgroundWriter] = None) -> None:
+    """Записує картки всіх гравців і бункер одним архівом, рендерячи їх просто в zip."""
+    members = ((player_card_name(player), render_player_card(player)) for player in players.values())
+    ensure_players_dir(directory)
+    write_file(archive_path(directory), _zip_bytes(chain(members, [(BUNKER_FILE, render_bunker(bunker))])), writer)
+
+def save_lobby_cards(players: Dict[str, dict], bunker: dict, directory: str = PLAYERS_DIR,
+                     writer: Optional[BackgroundWriter] = None) -> None:
+    """Записує картки та бункер нового лобі у розкладці BUNKER_OUTPUT_LAYOUT (без кешу карток)."""
+    if OUTPUT_LAYOUT == "archive":
+        save_lobby_archive(players, bunker, directory, writer)
+    else:
+        save_player_files(players, directory, writer=writer)
+        save_bunker_file(bunker, directory, writer=writer)
+
+# Відкриті архіви для read_card_text: шлях -> ((inode, mtime, розмір), ZipFile)
+_archive_readers: Dict[str, tuple] = {}
+ARCHIVE_READERS = 16
+
+def read_card_text(directory: str, name: str) -> Optional[str]:
+    """Текст картки (<ім'я>.txt) чи bunker.txt лобі: з архіву, якщо він є, інакше з окремого файлу.
+    
+    Центральний каталог архіву розбирається один раз і тримається відкритим,
+    доки файл не зміниться, тож наступні картки читаються без розбору каталогу.
+    """
+    path = archive_path(directory)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return _read_text(os.path.join(directory, name))
+    
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _archive_readers.pop(path, None)
+    if cached is None or cached[0] != key:
+        if cached is not None:
+            cached[1].close()
+        if len(_archive_readers) >= ARCHIVE_READERS:
+            _archive_readers.pop(next(iter(_archive_readers)))[1].close()
+        import zipfile
+        cached = (key, zipfile.ZipFile(path))
+    _archive_readers[path] = cached
+    try:
+        return cached[1].read(name).decode("utf-8")
+    except KeyError:
+        return None
+
+def card_cache(state: dict) -> CardCache:
+    """Кеш карток сесії (створюється при першому зверненні)."""
+    cache = state.get("_cards")
+    if cache is None:
+        cache = state["_cards"] = CardCache()
+    return cache
+
+@timed("player_file")
+def save_single_player_file(player: dict, directory: str = PLAYERS_DIR,
+                            cache: Optional[CardCache] = None,
+                            writer: Optional[BackgroundWriter] = None) -> None:
+    """Зберігає файл для одного гравця (через кеш — лише якщо картка змінилася)."""
+    if cache is not None:
+        cache.save(player, directory, writer)
+        return
+    
+    ensure_players_dir(directory)
+    write_file(player_card_path(player, directory), render_player_card(player), writer)
 
 def format_list(items: List[str]) -> str:
     """Форматує список для виводу."""
@@ -334,103 +2615,205 @@ def format_list(items: List[str]) -> str:
 
 # ================ БУНКЕР ================
 
-def generate_bunker(data: dict) -> None:
-    """Генерує файл бункера."""
-    ensure_players_dir()
-    
-    cataclysm = random.choice(data.get("cataclysms", ["Невідомий катаклізм"]))
-    description = random.choice(data.get("descriptions", ["Опис відсутній"]))
-    bunker_items = random.sample(data.get("bunker_items", []), min(3, len(data.get("bunker_items", []))))
-    
-    size = random.randint(20, 200)
-    time = random.randint(6, 36)
-    food = random.randint(3, 24)
-    water = random.randint(3, 24)
-    
-    bunker_file = os.path.join(PLAYERS_DIR, "bunker.txt")
-    
-    with open(bunker_file, "w", encoding="utf-8") as f:
-        f.write(f"Катаклізм: {cataclysm}\n")
-        f.write(f"Опис бункера: {description}\n")
-        f.write(f"Інвентар бункера: {', '.join(bunker_items)}\n")
-        f.write(f"Розмір: {size} м²\n")
-        f.write(f"Час перебування: {time} місяців\n")
-        f.write(f"Їжа: вистачить на {food} місяців\n")
-        f.write(f"Вода: вистачить на {water} місяців\n")
-
-def read_bunker() -> Optional[Dict[str, str]]:
-    """Читає дані бункера."""
-    path = os.path.join(PLAYERS_DIR, "bunker.txt")
-    if not os.path.exists(path):
+# Рядки bunker.txt: підпис та форматування поля структурованого бункера
+BUNKER_LINES = [
+    ("Катаклізм", lambda b: b["cataclysm"]),
+    ("Опис бункера", lambda b: b["description"]),
+    ("Інвентар бункера", lambda b: ", ".join(b["items"])),
+    ("Розмір", lambda b: f"{b['size']} м²"),
+    ("Час перебування", lambda b: f"{b['months']} місяців"),
+    ("Їжа", lambda b: f"вистачить на {b['food']} місяців"),
+    ("Вода", lambda b: f"вистачить на {b['water']} місяців"),
+]
+
+def _bunker_items(data: dict, rng) -> List[str]:
+    items = data.get("bunker_items", [])
+    return [items[index] for index in section_sampler(data, "bunker_items").sample_distinct(rng, 3)]
+
+@timed("roll_bunker")
+def roll_bunker(data: dict, rng: Optional[random.Random] = None) -> dict:
+    """Генерує бункер: катаклізм, опис, інвентар і числові розмір (м²), час, їжу та воду (місяців)."""
+    rng = rng or random
+    return {
+        "cataclysm": sample_card(data, "cataclysms", rng, "Невідомий катаклізм"),
+        "description": sample_card(data, "descriptions", rng, "Опис відсутній"),
+        "items": _bunker_items(data, rng),
+        "size": rng.randint(20, 200),
+        "months": rng.randint(6, 36),
+        "food": rng.randint(3, 24),
+        "water": rng.randint(3, 24),
+    }
+
+def render_bunker(bunker: dict) -> str:
+    """Текст bunker.txt."""
+    return "".join(f"{label}: {render(bunker)}\n" for label, render in BUNKER_LINES)
+
+def save_bunker_file(bunker: dict, directory: str = PLAYERS_DIR, cache: Optional["CardCache"] = None,
+                     writer: Optional[BackgroundWriter] = None) -> None:
+    """Записує bunker.txt (через кеш — лише якщо бункер змінився)."""
+    if cache is not None:
+        cache.save_bunker(bunker, directory, writer)
+        return
+    
+    ensure_players_dir(directory)
+    write_file(os.path.join(directory, BUNKER_FILE), render_bunker(bunker), writer)
+
+def _leading_int(text: str, default: int = 0) -> int:
+    digits = ""
+    for char in text.lstrip():
+        if not char.isdigit():
+            break
+        digits += char
+    return int(digits) if digits else default
+
+def read_bunker(directory: str = PLAYERS_DIR) -> Optional[dict]:
+    """Відновлює структурований бункер із bunker.txt (для сесій, збережених до появи state["bunker"])."""
+    text = read_card_text(directory, BUNKER_FILE)
+    if text is None:
         return None
     
-    data = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if ":" in line:
-                key, value = line.split(":", 1)
-                data[key.strip()] = value.strip()
-    return data
-
-def write_bunker(bunker_data: Dict[str, str]) -> None:
-    """Записує дані бункера."""
-    path = os.path.join(PLAYERS_DIR, "bunker.txt")
-    with open(path, "w", encoding="utf-8") as f:
-        for key, value in bunker_data.items():
-            f.write(f"{key}: {value}\n")
-
-def regen_bunker(data: dict) -> None:
-    """Перегенерує бункер."""
-    bunker = read_bunker()
-    if not bunker:
-        print("❌ Бункер не знайдено")
-        return
+    fields = {}
+    for line in text.splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            fields[key.strip()] = value.strip()
     
-    bunker["Опис бункера"] = random.choice(data.get("descriptions", ["Опис відсутній"]))
-    bunker["Інвентар бункера"] = ", ".join(
-        random.sample(
-            data.get("bunker_items", []),
-            min(3, len(data.get("bunker_items", [])))
-        )
-    )
-    bunker["Розмір"] = f"{random.randint(50, 500)} м²"
-    bunker["Час перебування"] = f"{random.randint(6, 36)} місяців"
-    bunker["Їжа"] = f"вистачить на {random.randint(3, 24)} місяців"
-    bunker["Вода"] = f"вистачить на {random.randint(3, 24)} місяців"
+    items = fields.get("Інвентар бункера", "")
+    return {
+        "cataclysm": fields.get("Катаклізм", "Невідомий катаклізм"),
+        "description": fields.get("Опис бункера", "Опис відсутній"),
+        "items": items.split(", ") if items else [],
+        "size": _leading_int(fields.get("Розмір", "")),
+        "months": _leading_int(fields.get("Час перебування", "")),
+        "food": _leading_int(fields.get("Їжа", "").replace("вистачить на", "")),
+        "water": _leading_int(fields.get("Вода", "").replace("вистачить на", "")),
+    }
+
+def regen_bunker(state: dict, data: dict) -> bool:
+    """Перегенерує бункер (катаклізм лишається)."""
+    bunker = state.get("bunker")
+    if not bunker:
+        say(state, "❌ Бункер не знайдено")
+        return False
     
-    write_bunker(bunker)
-    print("✅ Бункер перегенеровано")
+    rng = session_rng(state)
+    # Новий словник, а не зміна на місці: StateTracker порівнює зі старим значенням
+    state["bunker"] = {
+        **bunker,
+        "description": sample_card(data, "descriptions", rng, "Опис відсутній"),
+        "items": _bunker_items(data, rng),
+        "size": rng.randint(50, 500),
+        "months": rng.randint(6, 36),
+        "food": rng.randint(3, 24),
+        "water": rng.randint(3, 24),
+    }
+    say(state, "✅ Бункер перегенеровано")
+    return True
 
-def regen_cataclysm(data: dict) -> None:
+def regen_cataclysm(state: dict, data: dict) -> bool:
     """Перегенерує катаклізм."""
-    bunker = read_bunker()
+    bunker = state.get("bunker")
     if not bunker:
-        print("❌ Бункер не знайдено")
-        return
+        say(state, "❌ Бункер не знайдено")
+        return False
     
-    bunker["Катаклізм"] = random.choice(data.get("cataclysms", ["Невідомий катаклізм"]))
-    write_bunker(bunker)
-    print("✅ Катаклізм перегенеровано")
+    cataclysm = sample_card(data, "cataclysms", session_rng(state), "Невідомий катаклізм")
+    state["bunker"] = {**bunker, "cataclysm": cataclysm}
+    say(state, "✅ Катаклізм перегенеровано")
+    return True
 
 # ================ ОПЕРАЦІЇ З ГРАВЦЯМИ ================
 
+class PlayerIndex:
+    """Індекс гравців за ім'ям без урахування регістру.
+    
+    Точний збіг — через словник, частковий — бінарним пошуком у відсортованому
+    списку імен: "ан" знайде "Анна", якщо інших імен на "ан" немає.
+    """
+    
+    __slots__ = ("keys", "names", "members")
+    
+    def __init__(self, players: Dict[str, dict] = None):
+        self.keys: Dict[str, str] = {}
+        # Ключі, з яких побудовано індекс: за ними player_index помічає
+        # додавання, видалення і перейменування гравців
+        self.members = frozenset(players or ())
+        for key in players or ():
+            # Імена, що відрізняються лише регістром, займають один запис —
+            # як і раніше, виграє перший
+            self.keys.setdefault(key.casefold(), key)
+        self.names: List[str] = sorted(self.keys)
+    
+    def matches(self, prefix: str, limit: int = 5) -> List[str]:
+        """Ключі гравців, чиї імена починаються з prefix (не більше limit)."""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.names, prefix)
+        found = []
+        for folded in self.names[start:start + limit]:
+            if not folded.startswith(prefix):
+                break
+            found.append(self.keys[folded])
+        return found
+    
+    def lookup(self, name: str) -> Optional[str]:
+        """Ключ гравця за повним ім'ям або однозначним початком імені."""
+        key = self.keys.get(name.casefold())
+        if key is not None or not name:
+            return key
+        found = self.matches(name, limit=2)
+        return found[0] if len(found) == 1 else None
+
+def player_index(state: dict) -> PlayerIndex:
+    """Індекс гравців стану; перебудовується, якщо склад гравців змінився.
+    
+    Порівняння множин ключів не потребує casefold і сортування, тож коштує
+    значно менше за перебудову, а стан не може залишитися застарілим
+    після відкату транзакції, відтворення журналу чи перейменування.
+    """
+    index = state.get("_index")
+    if index is None or index.members != state["players"].keys():
+        index = state["_index"] = PlayerIndex(state["players"])
+    return index
+
+# Числові частини карток: поле картки -> (поле числа, межі); повна перегенерація
+# картки (команди job, hobby, fobia) кидає число заново
+CARD_LEVELS = {
+    "job": ("job_level", 0, 5),
+    "hobies": ("hobby_level", 0, 5),
+    "fobias": ("fobia_percent", 33, 100),
+}
+
+def discard_value(pool, value) -> None:
+    """Скидає в колоду картку (або список карток), що лежала в полі гравця."""
+    if value is None or not isinstance(pool, CardPool):
+        return
+    if isinstance(value, list):
+        for card in value:
+            pool.discard(card)
+    else:
+        pool.discard(value)
+
 class PlayerOperations:
     """Клас для операцій з гравцями."""
     
     @staticmethod
     def find_player(state: dict, name: str) -> Tuple[Optional[str], Optional[dict]]:
-        """Знаходить гравця за ім'ям (регістронезалежно)."""
-        player_key = next((k for k in state["players"] if k.lower() == name.lower()), None)
+        """Знаходить гравця за ім'ям або однозначним початком імені (регістронезалежно)."""
+        index = player_index(state)
+        player_key = index.lookup(name)
         if player_key:
             return player_key, state["players"][player_key]
+        
+        candidates = index.matches(name)
+        if len(candidates) > 1:
+            say(state, f"⚠️ Ім'я «{name}» неоднозначне: {', '.join(candidates)}")
         return None, None
     
     @staticmethod
     def update_and_save(state: dict, player: dict, name: str) -> None:
         """Зберігає стан та файл гравця."""
-        save_state(state)
-        save_single_player_file(player)
-        print(f"✅ {name} оновлено")
+        commit_state(state, [player])
+        say(state, f"✅ {name} оновлено")
     
     @staticmethod
     def reroll_field(state: dict, name: str, field: str, pool_name: str, is_list: bool = False, 
@@ -438,30 +2821,29 @@ class PlayerOperations:
         """Універсальна функція для перегенерації поля."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
+        rng = session_rng(state)
         pool = state.get(pool_name, [])
         if not pool:
-            print(f"❌ Пул {pool_name} порожній")
+            say(state, f"❌ Пул {pool_name} порожній")
             return False
         
         if is_list:
             if field not in player or not isinstance(player[field], list):
                 player[field] = []
-            player[field].append(pool.pop())
+            player[field].append(pool.pop(rng))
         else:
-            player[field] = pool.pop()
+            old_value = player.get(field)
+            player[field] = pool.pop(rng)
+            # Нову картку беремо до скидання старої, щоб та не повернулась одразу ж
+            discard_value(pool, old_value)
             
-            # Спеціальне форматування для деяких полів
-            if field == "fobias" and "%" not in player[field]:
-                player[field] = f"{player[field]} {random.randint(33, 100)}%"
-            elif field == "job" and " " not in player[field]:
-                exp_text = parse_experience_text(random.randint(0, 5))
-                player[field] = f"{exp_text} {player[field]}"
-            elif field == "hobies" and "(" not in player[field]:
-                hobby_exp = parse_hobby_experience_text(random.randint(0, 5))
-                player[field] = f"{player[field]} ({hobby_exp})"
+            # Стаж професії й хобі та відсоток фобії кидаються заново разом з карткою
+            if field in CARD_LEVELS:
+                level_field, low, high = CARD_LEVELS[field]
+                player[level_field] = rng.randint(low, high)
         
         if format_func:
             format_func(player, field)
@@ -474,28 +2856,10 @@ class PlayerOperations:
         """Перегенерує здоров'я."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
-        # Імітуємо PoolManager для цієї операції
-        used_health = set()
-        health_pool = state.get("health_pool", []).copy()
-        health_with_stages = data.get("health_with_stages", {})
-        
-        all_health = (
-            [h for h in health_pool if h not in used_health] +
-            [d for d in health_with_stages.keys() if d not in used_health]
-        )
-        
-        if not all_health:
-            player["health"] = "-"
-        else:
-            health = random.choice(all_health)
-            if health in health_with_stages:
-                stage = random.choice(health_with_stages[health])
-                player["health"] = f"{health} ({stage})"
-            else:
-                player["health"] = health
+        player["health"] = health_sampler(data).draw(session_rng(state))
         
         PlayerOperations.update_and_save(state, player, f"Здоров'я для {name}")
         return True
@@ -505,16 +2869,20 @@ class PlayerOperations:
         """Перегенерує статуру та зріст."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
+        rng = session_rng(state)
+        
         body_pool = state.get("body_pool", [])
         if not body_pool:
-            print("❌ Пул статури порожній")
+            say(state, "❌ Пул статури порожній")
             return False
         
-        player["body"] = random.choice(body_pool)
-        player["height"] = random.randint(140, 200)
+        old_body = player.get("body")
+        player["body"] = body_pool.pop(rng)
+        discard_value(body_pool, old_body)
+        player["height"] = rng.randint(140, 200)
         
         PlayerOperations.update_and_save(state, player, f"Статуру та зріст для {name}")
         return True
@@ -524,11 +2892,13 @@ class PlayerOperations:
         """Перегенерує вік та стать."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
-        player["age"] = random.choice(data.get("ages", [18]))
-        player["gender"] = generate_gender()
+        rng = session_rng(state)
+        
+        player["age"] = rng.choice(data.get("ages", [18]))
+        player["gender"] = generate_gender(rng)
         
         PlayerOperations.update_and_save(state, player, f"Вік та стать для {name}")
         return True
@@ -538,10 +2908,12 @@ class PlayerOperations:
         """Перегенерує вік."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
-        player["age"] = random.choice(data.get("ages", [18]))
+        rng = session_rng(state)
+        
+        player["age"] = rng.choice(data.get("ages", [18]))
         
         PlayerOperations.update_and_save(state, player, f"Вік для {name}")
         return True
@@ -551,10 +2923,10 @@ class PlayerOperations:
         """Перегенерує стать."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
-        player["gender"] = generate_gender()
+        player["gender"] = generate_gender(session_rng(state))
         
         PlayerOperations.update_and_save(state, player, f"Стать для {name}")
         return True
@@ -564,16 +2936,17 @@ class PlayerOperations:
         """Додає предмети у рюкзак."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
+        rng = session_rng(state)
         backpack_pool = state.get("backpack_pool", [])
         added = []
         
         for _ in range(count):
             if not backpack_pool:
                 break
-            item = backpack_pool.pop()
+            item = backpack_pool.pop(rng)
             if "backpack" not in player or not player["backpack"]:
                 player["backpack"] = []
             player["backpack"].append(item)
@@ -584,7 +2957,7 @@ class PlayerOperations:
             PlayerOperations.update_and_save(state, player, f"Рюкзак для {name} (додано {len(added)} предметів)")
             return True
         
-        print(f"❌ Нічого не додано — пул порожній")
+        say(state, f"❌ Нічого не додано — пул порожній")
         return False
     
     @staticmethod
@@ -592,29 +2965,32 @@ class PlayerOperations:
         """Очищає та перегенерує рюкзак."""
         player_key, player = PlayerOperations.find_player(state, name)
         if not player_key:
-            print(f"❌ Гравця {name} не знайдено")
+            say(state, f"❌ Гравця {name} не знайдено")
             return False
         
+        rng = session_rng(state)
         backpack_pool = state.get("backpack_pool", [])
         items_per_player = state.get("items_per_player", 2)
         
         # Очищаємо рюкзак
+        old_items = player.get("backpack")
         player["backpack"] = []
         
         # Генеруємо нові предмети
         new_items = []
         for _ in range(items_per_player):
             if backpack_pool:
-                item = backpack_pool.pop()
+                item = backpack_pool.pop(rng)
                 player["backpack"].append(item)
                 new_items.append(item)
         
         if new_items:
+            discard_value(backpack_pool, old_items)
             state["backpack_pool"] = backpack_pool
             PlayerOperations.update_and_save(state, player, f"Рюкзак для {name} (перегенеровано)")
             return True
         
-        print(f"❌ Нічого не додано — пул порожній")
+        say(state, f"❌ Нічого не додано — пул порожній")
         return False
 
 # ================ РЕГЕНЕРАЦІЯ ЧАСТКОВА ================
@@ -623,15 +2999,15 @@ def regen_job_only(state: dict, name: str) -> bool:
     """Регенерує тільки професію, зберігаючи досвід."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    current_exp, _ = extract_job_parts(player["job"])
     jobs_pool = state.get("jobs_pool", [])
     
     if jobs_pool:
-        job = jobs_pool.pop()
-        player["job"] = f"{current_exp} {job}"
+        old_job = player["job"]
+        player["job"] = jobs_pool.pop(session_rng(state))
+        discard_value(jobs_pool, old_job)
         state["jobs_pool"] = jobs_pool
         PlayerOperations.update_and_save(state, player, f"Професію для {name}")
         return True
@@ -642,14 +3018,10 @@ def regen_job_experience(state: dict, name: str) -> bool:
     """Регенерує тільки досвід професії."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    _, current_job = extract_job_parts(player["job"])
-    new_experience_years = random.randint(0, 5)
-    new_exp_text = parse_experience_text(new_experience_years)
-    
-    player["job"] = f"{new_exp_text} {current_job}"
+    player["job_level"] = session_rng(state).randint(0, 5)
     PlayerOperations.update_and_save(state, player, f"Досвід професії для {name}")
     return True
 
@@ -657,13 +3029,14 @@ def regen_job_and_experience(state: dict, name: str) -> bool:
     """Регенерує професію та досвід разом."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
     jobs_pool = state.get("jobs_pool", [])
     if jobs_pool:
-        exp, job = assign_job_with_experience(jobs_pool)
-        player["job"] = f"{exp} {job}"
+        years, job = assign_job_with_experience(jobs_pool, rng=session_rng(state))
+        discard_value(jobs_pool, player.get("job"))
+        player["job"], player["job_level"] = job, years
         state["jobs_pool"] = jobs_pool
         PlayerOperations.update_and_save(state, player, f"Професію та досвід для {name}")
         return True
@@ -674,15 +3047,15 @@ def regen_hobby_only(state: dict, name: str) -> bool:
     """Регенерує тільки хобі, зберігаючи досвід."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    _, current_exp = extract_hobby_parts(player["hobies"])
     hobbies_pool = state.get("hobies_pool", [])
     
     if hobbies_pool:
-        hobby = hobbies_pool.pop()
-        player["hobies"] = f"{hobby} ({current_exp})"
+        old_hobby = player["hobies"]
+        player["hobies"] = hobbies_pool.pop(session_rng(state))
+        discard_value(hobbies_pool, old_hobby)
         state["hobies_pool"] = hobbies_pool
         PlayerOperations.update_and_save(state, player, f"Хобі для {name}")
         return True
@@ -693,14 +3066,10 @@ def regen_hobby_experience(state: dict, name: str) -> bool:
     """Регенерує тільки досвід хобі."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    current_hobby, _ = extract_hobby_parts(player["hobies"])
-    new_experience_years = random.randint(0, 5)
-    new_exp_text = parse_hobby_experience_text(new_experience_years)
-    
-    player["hobies"] = f"{current_hobby} ({new_exp_text})"
+    player["hobby_level"] = session_rng(state).randint(0, 5)
     PlayerOperations.update_and_save(state, player, f"Досвід хобі для {name}")
     return True
 
@@ -708,13 +3077,14 @@ def regen_hobby_and_experience(state: dict, name: str) -> bool:
     """Регенерує хобі та досвід разом."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
     hobbies_pool = state.get("hobies_pool", [])
     if hobbies_pool:
-        hobby, exp = assign_hobby_with_experience(hobbies_pool)
-        player["hobies"] = f"{hobby} ({exp})"
+        hobby, years = assign_hobby_with_experience(hobbies_pool, rng=session_rng(state))
+        discard_value(hobbies_pool, player.get("hobies"))
+        player["hobies"], player["hobby_level"] = hobby, years
         state["hobies_pool"] = hobbies_pool
         PlayerOperations.update_and_save(state, player, f"Хобі та досвід для {name}")
         return True
@@ -725,15 +3095,15 @@ def regen_fobia_only(state: dict, name: str) -> bool:
     """Регенерує тільки фобію, зберігаючи відсоток."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    current_percentage = player["fobias"].split()[-1] if "%" in player["fobias"] else "50%"
     fobias_pool = state.get("fobias_pool", [])
     
     if fobias_pool:
-        fobia = fobias_pool.pop()
-        player["fobias"] = f"{fobia} {current_percentage}"
+        fobia = fobias_pool.pop(session_rng(state))
+        discard_value(fobias_pool, player["fobias"])
+        player["fobias"] = fobia
         state["fobias_pool"] = fobias_pool
         PlayerOperations.update_and_save(state, player, f"Фобію для {name}")
         return True
@@ -744,13 +3114,10 @@ def regen_fobia_percentage(state: dict, name: str) -> bool:
     """Регенерує тільки відсоток фобії."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
-    fobia_name = " ".join(player["fobias"].split()[:-1]) if "%" in player["fobias"] else player["fobias"]
-    new_percentage = random.randint(33, 100)
-    
-    player["fobias"] = f"{fobia_name} {new_percentage}%"
+    player["fobia_percent"] = session_rng(state).randint(33, 100)
     PlayerOperations.update_and_save(state, player, f"Відсоток фобії для {name}")
     return True
 
@@ -758,14 +3125,16 @@ def regen_fobia_and_percentage(state: dict, name: str) -> bool:
     """Регенерує фобію та відсоток разом."""
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return False
     
+    rng = session_rng(state)
+    
     fobias_pool = state.get("fobias_pool", [])
     if fobias_pool:
-        fobia = fobias_pool.pop()
-        percentage = random.randint(33, 100)
-        player["fobias"] = f"{fobia} {percentage}%"
+        fobia = fobias_pool.pop(rng)
+        discard_value(fobias_pool, player["fobias"])
+        player["fobias"], player["fobia_percent"] = fobia, rng.randint(33, 100)
         state["fobias_pool"] = fobias_pool
         PlayerOperations.update_and_save(state, player, f"Фобію та відсоток для {name}")
         return True
@@ -774,252 +3143,224 @@ def regen_fobia_and_percentage(state: dict, name: str) -> bool:
 
 # ================ МАСОВА РЕГЕНЕРАЦІЯ ================
 
+# Поля гравця, що беруться з колод сесії, і відповідні пули
+REGEN_FIELD_POOLS = {
+    "body": "body_pool",
+    "trait": "traits_pool",
+    "job": "jobs_pool",
+    "hobies": "hobies_pool",
+    "fobias": "fobias_pool",
+    "extra_info": "extra_info_pool",
+    "large_inventory": "large_inventory_pool",
+    "backpack": "backpack_pool",
+}
+
+@timed("regen_all_players")
 def regen_all_players(state: dict, data: dict, field: str) -> int:
     """Перегенеровує обрану характеристику всім гравцям."""
-    updated_count = 0
+    rng = session_rng(state)
     field_handlers = {
-        "fobia": lambda p: _regen_fobia_all(p, state),
-        "hobby": lambda p: _regen_hobby_all(p, state),
-        "health": lambda p: _regen_health_all(p, state, data),
-        "age": lambda p: _regen_age_all(p, data),
-        "gender": lambda p: _regen_gender_all(p),
-        "body": lambda p: _regen_body_all(p, state),
-        "height": lambda p: _regen_height_all(p),
-        "backpack": lambda p: _regen_backpack_all(p, state),
-        "extra_info": lambda p: _regen_extra_info_all(p, state),
-        "large_inventory": lambda p: _regen_large_inventory_all(p, state),
-        "trait": lambda p: _regen_trait_all(p, state),
-        "job": lambda p: _regen_job_all(p, state),
+        "fobia": lambda p: _regen_fobia_all(p, state, rng),
+        "hobby": lambda p: _regen_hobby_all(p, state, rng),
+        "health": lambda p: _regen_health_all(p, state, data, rng),
+        "age": lambda p: _regen_age_all(p, data, rng),
+        "gender": lambda p: _regen_gender_all(p, rng),
+        "body": lambda p: _regen_body_all(p, state, rng),
+        "height": lambda p: _regen_height_all(p, rng),
+        "backpack": lambda p: _regen_backpack_all(p, state, rng),
+        "extra_info": lambda p: _regen_card_all(p, state, rng, "extra_info", "extra_info_pool"),
+        "large_inventory": lambda p: _regen_card_all(p, state, rng, "large_inventory", "large_inventory_pool"),
+        "trait": lambda p: _regen_card_all(p, state, rng, "trait", "traits_pool"),
+        "job": lambda p: _regen_job_all(p, state, rng),
     }
     
     handler = field_handlers.get(field)
     if not handler:
-        print(f"❌ Невірне поле: {field}")
+        say(state, f"❌ Невірне поле: {field}")
         return 0
     
-    for player in state["players"].values():
-        if handler(player):
-            updated_count += 1
+    updated = [player for player in state["players"].values() if handler(player)]
+    updated_count = len(updated)
     
-    # Зберігаємо стан та файли
-    save_state(state)
-    for player in state["players"].values():
-        save_single_player_file(player)
+    # Зберігаємо стан та файли лише тих, кого змінено
+    commit_state(state, updated)
     
-    print(f"✅ {field} перегенеровано для {updated_count} гравців")
+    say(state, f"✅ {field} перегенеровано для {updated_count} гравців")
     return updated_count
 
-def _regen_fobia_all(player: dict, state: dict) -> bool:
+def _regen_fobia_all(player: dict, state: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації фобій."""
-    if state.get("fobias_pool"):
-        fobia = state["fobias_pool"].pop()
-        percentage = random.randint(33, 100)
-        player["fobias"] = f"{fobia} {percentage}%"
+    pool = state.get("fobias_pool")
+    if pool:
+        fobia = pool.pop(rng)
+        discard_value(pool, player.get("fobias"))
+        player["fobias"], player["fobia_percent"] = fobia, rng.randint(33, 100)
         return True
     return False
 
-def _regen_hobby_all(player: dict, state: dict) -> bool:
+def _regen_hobby_all(player: dict, state: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації хобі."""
-    if state.get("hobies_pool"):
-        hobby, exp = assign_hobby_with_experience(state["hobies_pool"])
-        player["hobies"] = f"{hobby} ({exp})"
+    pool = state.get("hobies_pool")
+    if pool:
+        hobby, years = assign_hobby_with_experience(pool, rng=rng)
+        discard_value(pool, player.get("hobies"))
+        player["hobies"], player["hobby_level"] = hobby, years
         return True
     return False
 
-def _regen_health_all(player: dict, state: dict, data: dict) -> bool:
+def _regen_health_all(player: dict, state: dict, data: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації здоров'я."""
     if state.get("health_pool"):
-        used_health = set()
-        health_pool = state["health_pool"].copy()
-        health_with_stages = data.get("health_with_stages", {})
-        
-        all_health = (
-            [h for h in health_pool if h not in used_health] +
-            [d for d in health_with_stages.keys() if d not in used_health]
-        )
-        
-        if all_health:
-            health = random.choice(all_health)
-            if health in health_with_stages:
-                stage = random.choice(health_with_stages[health])
-                player["health"] = f"{health} ({stage})"
-            else:
-                player["health"] = health
-            return True
+        player["health"] = health_sampler(data).draw(rng)
+        return True
     return False
 
-def _regen_age_all(player: dict, data: dict) -> bool:
+def _regen_age_all(player: dict, data: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації віку."""
-    player["age"] = random.choice(data.get("ages", [25]))
+    player["age"] = rng.choice(data.get("ages", [25]))
     return True
 
-def _regen_gender_all(player: dict) -> bool:
+def _regen_gender_all(player: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації статі."""
-    player["gender"] = generate_gender()
+    player["gender"] = generate_gender(rng)
     return True
 
-def _regen_body_all(player: dict, state: dict) -> bool:
+def _regen_body_all(player: dict, state: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації статури."""
-    if state.get("body_pool"):
-        player["body"] = random.choice(state["body_pool"])
-        player["height"] = random.randint(140, 200)
+    pool = state.get("body_pool")
+    if pool:
+        old_body = player.get("body")
+        player["body"] = pool.pop(rng)
+        discard_value(pool, old_body)
+        player["height"] = rng.randint(140, 200)
         return True
     return False
 
-def _regen_height_all(player: dict) -> bool:
+def _regen_height_all(player: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації зросту."""
-    player["height"] = random.randint(140, 200)
+    player["height"] = rng.randint(140, 200)
     return True
 
-def _regen_backpack_all(player: dict, state: dict) -> bool:
+def _regen_backpack_all(player: dict, state: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації рюкзака."""
+    pool = state.get("backpack_pool")
+    old_items = player.get("backpack")
     player["backpack"] = []
     items_per_player = state.get("items_per_player", 2)
     items_added = 0
     
     for _ in range(items_per_player):
-        if state.get("backpack_pool"):
-            player["backpack"].append(state["backpack_pool"].pop())
+        if pool:
+            player["backpack"].append(pool.pop(rng))
             items_added += 1
     
+    discard_value(pool, old_items)
     return items_added > 0
 
-def _regen_extra_info_all(player: dict, state: dict) -> bool:
-    """Допоміжна для масової регенерації додаткової інформації."""
-    if state.get("extra_info_pool"):
-        player["extra_info"] = state["extra_info_pool"].pop()
-        return True
-    return False
-
-def _regen_large_inventory_all(player: dict, state: dict) -> bool:
-    """Допоміжна для масової регенерації великого інвентаря."""
-    if state.get("large_inventory_pool"):
-        player["large_inventory"] = state["large_inventory_pool"].pop()
-        return True
-    return False
-
-def _regen_trait_all(player: dict, state: dict) -> bool:
-    """Допоміжна для масової регенерації рис характеру."""
-    if state.get("traits_pool"):
-        player["trait"] = state["traits_pool"].pop()
+def _regen_card_all(player: dict, state: dict, rng: random.Random, field: str, pool_name: str) -> bool:
+    """Допоміжна для масової регенерації поля з однієї картки (риса, додаткові відомості, великий інвентар)."""
+    pool = state.get(pool_name)
+    if pool:
+        old_value = player.get(field)
+        player[field] = pool.pop(rng)
+        discard_value(pool, old_value)
         return True
     return False
 
-def _regen_job_all(player: dict, state: dict) -> bool:
+def _regen_job_all(player: dict, state: dict, rng: random.Random) -> bool:
     """Допоміжна для масової регенерації професій."""
-    if state.get("jobs_pool"):
-        exp, job = assign_job_with_experience(state["jobs_pool"])
-        player["job"] = f"{exp} {job}"
+    pool = state.get("jobs_pool")
+    if pool:
+        years, job = assign_job_with_experience(pool, rng=rng)
+        discard_value(pool, player.get("job"))
+        player["job"], player["job_level"] = job, years
         return True
     return False
 
+@timed("regen_player_completely")
 def regen_player_completely(state: dict, data: dict, name: str) -> Optional[dict]:
-    """Повністю перегенеровує картку гравця."""
+    """Повністю перегенеровує картку гравця.
+    
+    Нові картки беруться прямо з колод сесії, а замінені після цього скидаються у них.
+    """
     player_key, player = PlayerOperations.find_player(state, name)
     if not player_key:
-        print(f"❌ Гравця {name} не знайдено")
+        say(state, f"❌ Гравця {name} не знайдено")
         return None
     
+    rng = session_rng(state)
+    old = player.copy()
+    
     # Зберігаємо спеціальні карти, які не мають змінюватися
     special_cards = player.get("special_cards", []).copy()
     
-    # Використовуємо існуючі пули зі стану для регенерації
-    # Створюємо тимчасові копії пулів
-    temp_pools = {}
-    for key, value in state.items():
-        if key.endswith("_pool") and isinstance(value, list):
-            temp_pools[key] = value.copy()
-    
-    # Додаємо здоров'я зі стадіями
-    health_with_stages = data.get("health_with_stages", {})
-    
-    # Генеруємо нові характеристики з існуючих пулів
-    used_health = set()
-    
     # Зріст та стать
-    player["height"] = random.randint(140, 200)
-    player["gender"] = generate_gender()
+    player["height"] = rng.randint(140, 200)
+    player["gender"] = generate_gender(rng)
     
     # Вік
-    player["age"] = random.choice(data.get("ages", [25]))
+    player["age"] = rng.choice(data.get("ages", [25]))
     
     # Статура (body)
-    if temp_pools.get("body_pool"):
-        player["body"] = temp_pools["body_pool"].pop()
+    if state.get("body_pool"):
+        player["body"] = state["body_pool"].pop(rng)
     
     # Риса характеру (trait)
-    if temp_pools.get("traits_pool"):
-        player["trait"] = temp_pools["traits_pool"].pop()
+    if state.get("traits_pool"):
+        player["trait"] = state["traits_pool"].pop(rng)
     
     # Професія з досвідом
-    if temp_pools.get("jobs_pool"):
-        exp_text, job = assign_job_with_experience(temp_pools["jobs_pool"])
-        player["job"] = f"{exp_text} {job}"
+    if state.get("jobs_pool"):
+        player["job_level"], player["job"] = assign_job_with_experience(state["jobs_pool"], rng=rng)
     
     # Здоров'я зі стадіями
-    health_pool = temp_pools.get("health_pool", [])
-    all_health = (
-        [h for h in health_pool if h not in used_health] +
-        [d for d in health_with_stages.keys() if d not in used_health]
-    )
-    
-    if all_health:
-        health = random.choice(all_health)
-        used_health.add(health)
-        
-        if health in health_with_stages:
-            stage = random.choice(health_with_stages[health])
-            player["health"] = f"{health} ({stage})"
-        else:
-            player["health"] = health
+    sampler = health_sampler(data)
+    if sampler:
+        player["health"] = sampler.draw(rng)
     
     # Хобі з досвідом
-    if temp_pools.get("hobies_pool"):
-        hobby, hobby_exp = assign_hobby_with_experience(temp_pools["hobies_pool"])
-        player["hobies"] = f"{hobby} ({hobby_exp})"
+    if state.get("hobies_pool"):
+        player["hobies"], player["hobby_level"] = assign_hobby_with_experience(state["hobies_pool"], rng=rng)
     
     # Фобія з відсотком
-    if temp_pools.get("fobias_pool"):
-        fobia_name = temp_pools["fobias_pool"].pop()
-        fobia_percentage = random.randint(33, 100)
-        player["fobias"] = f"{fobia_name} {fobia_percentage}%"
+    if state.get("fobias_pool"):
+        player["fobias"] = state["fobias_pool"].pop(rng)
+        player["fobia_percent"] = rng.randint(33, 100)
     
     # Додаткові відомості
-    if temp_pools.get("extra_info_pool"):
-        player["extra_info"] = temp_pools["extra_info_pool"].pop()
+    if state.get("extra_info_pool"):
+        player["extra_info"] = state["extra_info_pool"].pop(rng)
     
     # Великий інвентар
-    if temp_pools.get("large_inventory_pool"):
-        player["large_inventory"] = temp_pools["large_inventory_pool"].pop()
+    if state.get("large_inventory_pool"):
+        player["large_inventory"] = state["large_inventory_pool"].pop(rng)
     
     # Рюкзак (повністю новий)
     player["backpack"] = []
     items_per_player = state.get("items_per_player", 2)
     for _ in range(items_per_player):
-        if temp_pools.get("backpack_pool"):
-            player["backpack"].append(temp_pools["backpack_pool"].pop())
+        if state.get("backpack_pool"):
+            player["backpack"].append(state["backpack_pool"].pop(rng))
     
     # Повертаємо спеціальні карти
     player["special_cards"] = special_cards
     
-    # Оновлюємо пули в стані
-    for pool_name, pool in temp_pools.items():
-        state[pool_name] = pool
+    # Замінені картки скидаємо у їхні колоди
+    for field, pool_name in REGEN_FIELD_POOLS.items():
+        if player.get(field) != old.get(field):
+            discard_value(state.get(pool_name), old.get(field))
     
     # Зберігаємо
-    save_state(state)
-    save_single_player_file(player)
+    commit_state(state, [player])
     
-    print(f"✅ Гравець {name} повністю перегенерований (картки збережено)")
+    say(state, f"✅ Гравець {name} повністю перегенерований (картки збережено)")
     return player
 
 # ================ ІНТЕРАКТИВНИЙ РЕЖИМ ================
 
-def interactive_loop(state: dict, data: dict) -> None:
-    """Головний цикл адмін панелі."""
-    print("\nАдмін панель (help — список команд)\n")
-    
-    command_map = {
+def build_command_map(state: dict, data: dict) -> Dict[str, callable]:
+    """Створює таблицю команд адмін панелі для однієї сесії."""
+    return {
         # Основні команди
         "health": lambda p: PlayerOperations.reroll_health(state, data, p[0]),
         "body": lambda p: PlayerOperations.reroll_body(state, p[0]),
@@ -1049,59 +3390,197 @@ def interactive_loop(state: dict, data: dict) -> None:
         "regen_all": lambda p: _handle_regen_all(state, data, p),
         "regen": lambda p: _handle_regen_command(state, data, p),
     }
+
+def dispatch_command(state: dict, data: dict, command_map: Dict[str, callable], parts: List[str]) -> bool:
+    """Виконує одну команду адмін панелі. Повертає False, якщо команду не виконано."""
+    action = parts[0].lower()
+    # Кожна команда починає потік (seed, tick) заново — як після перезапуску
+    state.pop("_rng", None)
+    
+    if action == "help":
+        print_help(state.get("_output"))
+        return True
+    
+    if action == "regen" and len(parts) >= 2:
+        if parts[1].lower() == "bunker":
+            if not regen_bunker(state, data):
+                return False
+            commit_state(state, [])
+            return True
+        elif parts[1].lower() == "cataclysm":
+            if not regen_cataclysm(state, data):
+                return False
+            commit_state(state, [])
+            return True
+    
+    if action not in command_map:
+        say(state, "❓ Невідома команда")
+        return False
+    
+    if action not in ["regen_all", "regen", "add"] and len(parts) < 2:
+        say(state, f"❌ Потрібно вказати ім'я гравця. Наприклад: {action} <ім'я>")
+        return False
+    
+    try:
+        # Обробники повертають False, якщо команду не виконано (гравця немає, пул порожній...)
+        if command_map[action](parts[1:]) is False:
+            return False
+    except Exception as e:
+        say(state, f"❌ Помилка виконання команди: {e}")
+        return False
+    return True
+
+class CommandProfiler:
+    """Профілює кожну команду окремо і записує її .pstats у directory."""
+    
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self.dumped = 0
+    
+    def run(self, action: str, func, *args):
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            os.makedirs(self.directory, exist_ok=True)
+            self.dumped += 1
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.dumped:04d}-{sanitize_filename(action)}.pstats"
+            profile.dump_stats(os.path.join(self.directory, name))
+
+def print_stats(timings: Timings) -> None:
+    """Виводить кількість, середній час і p95 команд та фаз запису."""
+    rows = timings.report()
+    if not rows:
+        print("Статистики ще немає")
+        return
+    
+    for title, commands in (("Команда", True), ("Фаза", False)):
+        section = [row for row in rows if row[0].startswith("cmd:") == commands]
+        if not section:
+            continue
+        print(f"{title:<26} {'к-сть':>7} {'сер., мс':>10} {'p95, мс':>10}")
+        for label, count, mean, p95 in section:
+            label = label[len("cmd:"):] if commands else label
+            print(f"{label:<26} {count:>7} {mean * 1000:>10.2f} {p95 * 1000:>10.2f}")
+        print()
+
+def _handle_profile_command(profiler: Optional[CommandProfiler], parts: List[str]) -> Optional[CommandProfiler]:
+    """Обробляє profile on|off; повертає профайлер, що діятиме далі."""
+    mode = parts[0].lower() if parts else ""
+    if mode == "on":
+        if profiler is None:
+            profiler = CommandProfiler()
+        print(f"✅ Профілювання увімкнено: .pstats кожної команди — у {profiler.directory}/")
+        return profiler
+    if mode == "off":
+        if profiler is not None:
+            print(f"✅ Профілювання вимкнено, записано файлів: {profiler.dumped}")
+        return None
+    print("❌ Використовуйте: profile on|off")
+    return profiler
+
+def interactive_loop(state: dict, data: dict) -> None:
+    """Головний цикл адмін панелі."""
+    print("\nАдмін панель (help — список команд)\n")
+    
+    command_map = build_command_map(state, data)
+    # База для історії — стан на початку роботи панелі
+    state_tracker(state)
+    history = state.setdefault("_history", UndoHistory(UNDO_DEPTH))
+    profiler: Optional[CommandProfiler] = None
     
     while True:
         try:
             cmd = input("> ").strip()
         except (EOFError, KeyboardInterrupt):
             save_state(state)
+            flush_writes(state)
             break
         
         if not cmd:
             continue
         
         parts = cmd.split()
-        action = parts[0].lower()
-        
-        if action in ("exit", "quit"):
+        if parts[0].lower() in ("exit", "quit"):
             save_state(state)
+            flush_writes(state)
             break
         
-        if action == "help":
-            print_help()
+        action = parts[0].lower()
+        if action == "stats":
+            if parts[1:2] == ["reset"]:
+                TIMINGS.reset()
+                print("✅ Статистику очищено")
+            else:
+                print_stats(TIMINGS)
+            continue
+        if action == "profile":
+            profiler = _handle_profile_command(profiler, parts[1:])
             continue
-
-        if action == "regen" and len(parts) >= 2:
-            if parts[1].lower() == "bunker":
-                regen_bunker(data)
-                continue
-            elif parts[1].lower() == "cataclysm":
-                regen_cataclysm(data)
-                continue
         
-        if action in command_map:
-            try:
-                if action in ["regen_all", "regen", "add"]:
-                    command_map[action](parts[1:])
-                elif len(parts) >= 2:
-                    command_map[action](parts[1:])
-                else:
-                    print(f"❌ Потрібно вказати ім'я гравця. Наприклад: {action} <ім'я>")
-            except Exception as e:
-                print(f"❌ Помилка виконання команди: {e}")
+        if action == "undo":
+            func, args = history.undo, (state,)
+        elif action == "redo":
+            func, args = history.redo, (state,)
         else:
-            print("❓ Невідома команда")
+            func, args = dispatch_command, (state, data, command_map, parts)
+        if action not in command_map and action not in ("undo", "redo", "help"):
+            action = "?"
+        
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.run(action, func, *args)
+        else:
+            func(*args)
+        TIMINGS.add(f"cmd:{action}", time.perf_counter() - started)
+
+def run_script(state: dict, data: dict, lines) -> bool:
+    """Виконує команди зі скрипта однією транзакцією.
+    
+    Порожні рядки та коментарі (#) пропускаються, exit/quit завершує скрипт.
+    Якщо будь-яка команда не виконалась, усі зміни відкочуються.
+    """
+    command_map = build_command_map(state, data)
+    begin_transaction(state)
+    executed = 0
+    
+    for number, line in enumerate(lines, 1):
+        cmd = line.split("#", 1)[0].strip()
+        if not cmd:
+            continue
+        
+        parts = cmd.split()
+        if parts[0].lower() in ("exit", "quit"):
+            break
+        
+        say(state, f"> {cmd}")
+        try:
+            ok = dispatch_command(state, data, command_map, parts)
+        except BaseException:
+            rollback_transaction(state)
+            raise
+        if not ok:
+            rollback_transaction(state)
+            say(state, f"❌ Рядок {number}: «{cmd}» не виконано — зміни скрипта відкочено")
+            return False
+        executed += 1
+    
+    commit_transaction(state)
+    flush_writes(state)
+    say(state, f"✅ Виконано команд: {executed}, зміни збережено")
+    return True
 
-def _handle_add_command(state: dict, parts: list) -> None:
+def _handle_add_command(state: dict, parts: list) -> bool:
     """Обробляє команду add."""
     if len(parts) >= 2 and parts[0] == "backpack":
         name = parts[1]
         count = int(parts[2]) if len(parts) > 2 else 1
-        PlayerOperations.add_backpack_items(state, name, count)
-    else:
-        print("❌ Невірний формат команди add. Використовуйте: add backpack <ім'я> [кількість]")
+        return PlayerOperations.add_backpack_items(state, name, count)
+    say(state, "❌ Невірний формат команди add. Використовуйте: add backpack <ім'я> [кількість]")
+    return False
 
-def _handle_regen_all(state: dict, data: dict, parts: list) -> None:
+def _handle_regen_all(state: dict, data: dict, parts: list) -> bool:
     """Обробляє команду regen_all."""
     if len(parts) >= 1:
         field = parts[0].lower()
@@ -1110,25 +3589,24 @@ def _handle_regen_all(state: dict, data: dict, parts: list) -> None:
         
         if field in valid_fields:
             regen_all_players(state, data, field)
-        else:
-            print(f"❌ Невірне поле. Доступні: {', '.join(valid_fields)}")
+            return True
+        say(state, f"❌ Невірне поле. Доступні: {', '.join(valid_fields)}")
     else:
-        print("❌ Потрібно вказати поле. Наприклад: regen_all job")
+        say(state, "❌ Потрібно вказати поле. Наприклад: regen_all job")
+    return False
 
-def _handle_regen_command(state: dict, data: dict, parts: list) -> None:
+def _handle_regen_command(state: dict, data: dict, parts: list) -> bool:
     """Обробляє команду regen."""
     if len(parts) >= 2:
         if parts[0].lower() == "backpack":
-            PlayerOperations.backpack(state, parts[1])
+            return PlayerOperations.backpack(state, parts[1])
         elif parts[1].lower() == "all":
-            regen_player_completely(state, data, parts[0])
-        else:
-            print("❌ Невірний формат команди regen")
-    else:
-        print("❌ Невірний формат команди regen")
+            return regen_player_completely(state, data, parts[0]) is not None
+    say(state, "❌ Невірний формат команди regen")
+    return False
 
-def print_help() -> None:
-    """Виводить допомогу по командам."""
+def print_help(file=None) -> None:
+    """Виводить допомогу по командам (у file, типово — stdout)."""
     help_text = """
 agegender <name> - перегенерувати вік та стать
 age <name> - перегенерувати вік
@@ -1165,27 +3643,724 @@ regen <name> all - повністю перегенерувати гравця
 regen bunker - перегенерувати бункер
 regen cataclysm - перегенерувати катаклізм
 
+undo - скасувати останню зміну
+redo - повернути скасовану зміну
+
+stats - кількість, середній час і p95 команд та фаз запису (stats reset — очистити)
+profile on|off - профілювати кожну команду у profiles/*.pstats
+
 exit - вийти
 """
-    print(help_text)
+    print(help_text, file=file)
+
+# ================ МАСОВА ГЕНЕРАЦІЯ ================
+
+GENERATE_DIR = "generated"
+
+_worker_data: Optional[dict] = None
+
+def _init_generation_worker(data_path: str) -> None:
+    """Завантажує каталог один раз на процес."""
+    global _worker_data
+    _worker_data = load_data(data_path)
+
+def generate_lobby(data: dict, directory: str, players: int, items_per_player: int = 2,
+                   cards_per_player: int = 2, seed: Optional[int] = None, bulk: bool = False) -> None:
+    """Генерує одне лобі без діалогу та записує його файли у directory."""
+    names = [f"Гравець {i}" for i in range(1, players + 1)]
+    state = create_session_state(names, data, items_per_player, cards_per_player, seed, bulk)
+    save_lobby_cards(state["players"], state["bunker"], directory)
+    write_state_snapshot(directory, persistable_state(state))
+
+def _generate_lobby_range(out_dir: str, first: int, count: int, players: int,
+                          items_per_player: int, cards_per_player: int, seed: int, bulk: bool = False) -> int:
+    """Генерує лобі first..first+count-1 у процесі-працівнику."""
+    for number in range(first, first + count):
+        directory = os.path.join(out_dir, f"lobby_{number:06d}")
+        generate_lobby(_worker_data, directory, players, items_per_player, cards_per_player,
+                       derive_seed(seed, f"lobby{number}"), bulk)
+    sync_writes()
+    return count
+
+def generate_lobbies(lobbies: int, players: int, out_dir: str = GENERATE_DIR, workers: Optional[int] = None,
+                     items_per_player: int = 2, cards_per_player: int = 2,
+                     data_path: str = DATA_FILE, seed: Optional[int] = None, bulk: bool = False) -> dict:
+    """Генерує багато лобі паралельно у пулі процесів, кожне — у власній директорії.
+    
+    Лобі роздаються працівникам шматками, щоб накладні витрати на
+    передачу завдань не з'їдали виграш від паралельності. Зерно кожного
+    лобі виводиться із seed та номера лобі, тому результат не залежить
+    від кількості процесів. bulk — векторна генерація гравців (див. create_session_state).
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = new_seed()
+    chunk = max(1, min(100, lobbies // (workers * 8)))
+    ranges = [(first, min(chunk, lobbies - first)) for first in range(0, lobbies, chunk)]
+    
+    started = time.perf_counter()
+    if workers == 1:
+        _init_generation_worker(data_path)
+        for first, count in ranges:
+            _generate_lobby_range(out_dir, first, count, players, items_per_player, cards_per_player, seed, bulk)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers, initializer=_init_generation_worker, initargs=(data_path,)) as pool:
+            futures = [
+                pool.submit(_generate_lobby_range, out_dir, first, count, players,
+                            items_per_player, cards_per_player, seed, bulk)
+                for first, count in ranges
+            ]
+            for future in futures:
+                future.result()
+    elapsed = time.perf_counter() - started
+    
+    return {
+        "lobbies": lobbies,
+        "players": lobbies * players,
+        "workers": workers,
+        "seed": seed,
+        "seconds": elapsed,
+        "lobbies_per_sec": lobbies / elapsed if elapsed else 0.0,
+    }
+
+# ================ СИМУЛЯЦІЯ ================
+
+# Значення полів гравця, частоти яких рахує симуляція (картки — без стажу та відсотків)
+SIMULATION_FIELDS = {
+    "gender": lambda p: (p.gender,),
+    "age": lambda p: (p.age,),
+    "height": lambda p: (p.height,),
+    "body": lambda p: (p.body,),
+    "trait": lambda p: (p.trait,),
+    "job": lambda p: (p.job,),
+    "job_experience": lambda p: (parse_experience_text(p.job_level),),
+    "health": lambda p: (p.health,),
+    "hobies": lambda p: (p.hobies,),
+    "fobias": lambda p: (p.fobias,),
+    "backpack": lambda p: p.backpack,
+    "extra_info": lambda p: (p.extra_info,),
+    "large_inventory": lambda p: (p.large_inventory,),
+    "special_cards": lambda p: p.special_cards,
+}
+
+SIMULATION_BUNKER_FIELDS = {
+    "cataclysm": lambda b: (b["cataclysm"],),
+    "bunker_items": lambda b: b["items"],
+    "bunker_size": lambda b: (b["size"],),
+}
+
+def _infertile_couple(players: List[dict]) -> bool:
+    genders = [p.gender for p in players]
+    return (any(g.startswith("чоловіча") and "безплідний" in g for g in genders)
+            and any(g.startswith("жіноча") and "безплідна" in g for g in genders))
+
+# Події на рівні лобі: частка роздач, у яких подія сталася
+SIMULATION_EVENTS = {
+    "ніхто не молодший 30": lambda players, bunker: all(p.age >= 30 for p in players),
+    "є андроїд": lambda players, bunker: any(p.gender == "андроїд" for p in players),
+    "є безплідна пара": lambda players, bunker: _infertile_couple(players),
+    "усі здорові": lambda players, bunker: all(p.health == "здоровий" for p in players),
+    "ніхто не здоровий": lambda players, bunker: all(p.health != "здоровий" for p in players),
+}
+
+# Числові показники лобі: гістограма значень по роздачах
+SIMULATION_METRICS = {
+    "наймолодший": lambda players, bunker: min((p.age for p in players), default=0),
+    "найстарший": lambda players, bunker: max((p.age for p in players), default=0),
+    "здорових": lambda players, bunker: sum(p.health == "здоровий" for p in players),
+    "безплідних": lambda players, bunker: sum("безплідн" in p.gender for p in players),
+}
+
+class SimulationStats:
+    """Потокові частоти симуляції: пам'ять залежить від розміру каталогу, а не від кількості роздач.
+    
+    fields — частоти значень кожного поля гравця та бункера, events — скільки
+    роздач мали подію, metrics — гістограми показників лобі. Частини,
+    пораховані різними процесами, зливаються через merge.
+    """
+    
+    __slots__ = ("deals", "players", "fields", "events", "metrics")
+    
+    def __init__(self):
+        self.deals = 0
+        self.players = 0
+        self.fields: Dict[str, Dict] = {field: {} for field in (*SIMULATION_FIELDS, *SIMULATION_BUNKER_FIELDS)}
+        self.events: Dict[str, int] = dict.fromkeys(SIMULATION_EVENTS, 0)
+        self.metrics: Dict[str, Dict[int, int]] = {name: {} for name in SIMULATION_METRICS}
+    
+    def add(self, players: List[dict], bunker: dict) -> None:
+        """Враховує одну роздачу: гравців лобі та бункер."""
+        self.deals += 1
+        self.players += len(players)
+        fields = self.fields
+        for field, values in SIMULATION_FIELDS.items():
+            counts = fields[field]
+            for player in players:
+                for value in values(player):
+                    counts[value] = counts.get(value, 0) + 1
+        for field, values in SIMULATION_BUNKER_FIELDS.items():
+            counts = fields[field]
+            for value in values(bunker):
+                counts[value] = counts.get(value, 0) + 1
+        for name, happened in SIMULATION_EVENTS.items():
+            if happened(players, bunker):
+                self.events[name] += 1
+        for name, metric in SIMULATION_METRICS.items():
+            histogram = self.metrics[name]
+            value = metric(players, bunker)
+            histogram[value] = histogram.get(value, 0) + 1
+    
+    def merge(self, other: "SimulationStats") -> None:
+        self.deals += other.deals
+        self.players += other.players
+        for target, source in ((self.fields, other.fields), (self.metrics, other.metrics)):
+            for name, counts in source.items():
+                merged = target.setdefault(name, {})
+                for value, count in counts.items():
+                    merged[value] = merged.get(value, 0) + count
+        for name, count in other.events.items():
+            self.events[name] = self.events.get(name, 0) + count
+    
+    def to_dict(self) -> dict:
+        """Результати для JSON: частоти відсортовані за спаданням."""
+        def ranked(counts: dict) -> List[list]:
+            return [[value, count] for value, count in sorted(counts.items(), key=lambda item: -item[1])]
+        
+        return {
+            "deals": self.deals,
+            "players": self.players,
+            "events": {name: {"count": count, "fraction": count / self.deals if self.deals else 0.0}
+                       for name, count in self.events.items()},
+            "metrics": {name: dict(sorted(histogram.items())) for name, histogram in self.metrics.items()},
+            "fields": {field: ranked(counts) for field, counts in self.fields.items()},
+        }
+
+def _simulate_range(first: int, count: int, players: int, items_per_player: int,
+                    cards_per_player: int, seed: int) -> SimulationStats:
+    """Роздачі first..first+count-1 у процесі-працівнику."""
+    data = _worker_data
+    names = [f"Гравець {i}" for i in range(1, players + 1)]
+    stats = SimulationStats()
+    for number in range(first, first + count):
+        rng = random.Random(derive_seed(seed, f"deal{number}"))
+        generated, _ = generate_players(names, data, items_per_player, cards_per_player, rng, dealt_only=True)
+        stats.add(list(generated.values()), roll_bunker(data, rng))
+    return stats
+
+def simulate(deals: int, players: int, workers: Optional[int] = None, items_per_player: int = 2,
+             cards_per_player: int = 2, data_path: str = DATA_FILE,
+             seed: Optional[int] = None) -> Tuple[SimulationStats, dict]:
+    """Монте-Карло: deals роздач лобі з players гравців у пулі процесів.
+    
+    Кожна роздача — generate_players та roll_bunker з власним зерном, тож
+    результат не залежить від кількості процесів. Частини зливаються
+    в міру готовності, і в пам'яті лишаються лише частоти.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = new_seed()
+    chunk = max(1, min(2000, deals // (workers * 8)))
+    ranges = [(first, min(chunk, deals - first)) for first in range(0, deals, chunk)]
+    
+    stats = SimulationStats()
+    started = time.perf_counter()
+    if workers == 1:
+        _init_generation_worker(data_path)
+        for first, count in ranges:
+            stats.merge(_simulate_range(first, count, players, items_per_player, cards_per_player, seed))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(workers, initializer=_init_generation_worker, initargs=(data_path,)) as pool:
+            futures = [
+                pool.submit(_simulate_range, first, count, players, items_per_player, cards_per_player, seed)
+                for first, count in ranges
+            ]
+            for future in as_completed(futures):
+                stats.merge(future.result())
+    elapsed = time.perf_counter() - started
+    
+    return stats, {
+        "deals": deals,
+        "players": players,
+        "workers": workers,
+        "seed": seed,
+        "seconds": elapsed,
+        "deals_per_sec": deals / elapsed if elapsed else 0.0,
+    }
+
+def print_simulation(stats: SimulationStats, top: int = 5) -> None:
+    """Виводить події (з 95% довірчим інтервалом), показники лобі та найчастіші значення полів."""
+    deals = stats.deals or 1
+    print("Події (частка роздач):")
+    for name, count in stats.events.items():
+        fraction = count / deals
+        margin = 1.96 * (fraction * (1 - fraction) / deals) ** 0.5
+        print(f"  {name:<24} {fraction * 100:7.3f}% ± {margin * 100:.3f}%")
+    
+    print("Показники лобі (середнє, мін–макс):")
+    for name, histogram in stats.metrics.items():
+        if histogram:
+            mean = sum(value * count for value, count in histogram.items()) / deals
+            print(f"  {name:<24} {mean:8.2f}  ({min(histogram)}–{max(histogram)})")
+    
+    print(f"Найчастіші значення (частка від усіх значень поля, топ {top}):")
+    for field, counts in stats.fields.items():
+        total = sum(counts.values()) or 1
+        ranked = sorted(counts.items(), key=lambda item: -item[1])[:top]
+        print(f"  {field} ({len(counts)} різних):")
+        for value, count in ranked:
+            print(f"    {count / total * 100:6.2f}%  {str(value)[:70]}")
+
+# ================ СЕРВЕР ================
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7777
+LOBBIES_DIR = "lobbies"
+
+def write_session_files(directory: str, snapshot: dict, players: List[dict],
+                        cache: Optional[CardCache] = None) -> None:
+    """Записує знімок стану, картки гравців і бункер сесії (виконується поза циклом подій).
+    
+    Запис одного лобі завжди послідовний, тож кеш карток сесії можна передавати сюди.
+    """
+    write_state_snapshot(directory, snapshot)
+    remove_file(os.path.join(directory, JOURNAL_FILE))
+    for player in players:
+        save_single_player_file(player, directory, cache)
+    if snapshot.get("bunker"):
+        save_bunker_file(snapshot["bunker"], directory, cache)
+
+class GameServer:
+    """Асинхронний сервер, що обслуговує багато ізольованих лобі.
+    
+    Протокол рядковий: клієнт надсилає "<лобі> <команда> [аргументи]",
+    сервер відповідає одним рядком JSON {"ok": bool, "output": str}.
+    Окрім команд адмін панелі є "new <імена через кому> [seed=N]", "players" та "close".
+    Стан лобі живе в пам'яті, а запис на диск виконується у пулі потоків.
+    """
+    
+    def __init__(self, data: dict, directory: str = LOBBIES_DIR, io_workers: int = 2):
+        self.data = data
+        self.directory = directory
+        self.sessions: Dict[str, dict] = {}
+        from concurrent.futures import ThreadPoolExecutor
+        self._persisting: Dict[str, "asyncio.Future"] = {}
+        self._executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="bunker-io")
+    
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+        """Запускає сервер і обслуговує клієнтів до зупинки."""
+        import asyncio
+        server = await asyncio.start_server(self._handle_client, host, port, limit=2 ** 20)
+        print(f"🛰️ Сервер слухає {host}:{port}, лобі у {self.directory}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.flush()
+            self._executor.shutdown(wait=True)
+    
+    async def flush(self) -> None:
+        """Чекає завершення всіх записів на диск."""
+        import asyncio
+        while self._persisting:
+            await asyncio.gather(*list(self._persisting.values()))
+    
+    async def _handle_client(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter") -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.execute(line.decode("utf-8", "replace").strip())
+                except Exception as e:
+                    # Помилка однієї команди не розриває з'єднання: клієнт отримує відповідь
+                    response = {"ok": False, "output": f"❌ Внутрішня помилка сервера: {type(e).__name__}: {e}"}
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def execute(self, line: str) -> dict:
+        """Виконує один рядок протоколу."""
+        parts = line.split()
+        if len(parts) < 2:
+            return {"ok": False, "output": "❌ Формат: <лобі> <команда> [аргументи]"}
+        
+        lobby, action, args = parts[0], parts[1].lower(), parts[2:]
+        # Назва лобі — це й назва його директорії: назви, які довелося б очищати
+        # ("../evil" і "evil"), писали б у ту саму директорію з різних сесій
+        if not lobby or sanitize_filename(lobby) != lobby:
+            return {"ok": False, "output": f"❌ Некоректна назва лобі: {lobby} (дозволені літери, цифри, _ та -)"}
+        
+        if action == "new":
+            seed = None
+            if args and args[-1].startswith("seed="):
+                text = args.pop()[len("seed="):]
+                try:
+                    seed = int(text)
+                except ValueError:
+                    return {"ok": False, "output": f"❌ Зерно має бути цілим числом: {text}"}
+            return await self._create(lobby, " ".join(args), seed)
+        
+        state = await self._session(lobby)
+        if state is None:
+            return {"ok": False, "output": f"❌ Лобі {lobby} не знайдено"}
+        
+        if action == "close":
+            await self._close(lobby)
+            return {"ok": True, "output": f"✅ Лобі {lobby} збережено та закрито"}
+        if action == "players":
+            return {"ok": True, "output": ", ".join(state["players"])}
+        
+        # Вивід команди збирається у власний буфер сесії, а не через підміну
+        # sys.stdout, яку бачили б і потоки запису в пулі
+        output = state["_output"] = io.StringIO()
+        try:
+            ok = dispatch_command(state, self.data, state["_commands"], parts[1:])
+        finally:
+            del state["_output"]
+        self._schedule_persist(lobby)
+        return {"ok": ok, "output": output.getvalue()}
+    
+    def _attach(self, lobby: str, state: dict, directory: str) -> dict:
+        """Підготовлює стан до роботи на сервері."""
+        state.pop("_journal", None)
+        state["_dir"] = directory
+        state["_pending"] = set()
+        state["_commands"] = build_command_map(state, self.data)
+        self.sessions[lobby] = state
+        return state
+    
+    async def _create(self, lobby: str, names: str, seed: Optional[int] = None) -> dict:
+        player_names = [name.strip() for name in names.split(",") if name.strip()]
+        if not player_names:
+            return {"ok": False, "output": "❌ Не введено жодного імені"}
+        if await self._session(lobby) is not None:
+            return {"ok": False, "output": f"❌ Лобі {lobby} вже існує"}
+        
+        directory = os.path.join(self.directory, lobby)
+        state = self._attach(lobby, create_session_state(player_names, self.data, seed=seed), directory)
+        
+        state["_pending"].update(state["players"])
+        state["_dirty"] = True
+        self._schedule_persist(lobby)
+        return {"ok": True, "output": f"✅ Лобі {lobby}: {len(player_names)} гравців"}
+    
+    async def _session(self, lobby: str) -> Optional[dict]:
+        """Повертає сесію з пам'яті або ліниво завантажує її з диска."""
+        state = self.sessions.get(lobby)
+        if state is not None:
+            return state
+        
+        directory = os.path.join(self.directory, lobby)
+        if not os.path.isdir(directory):
+            return None
+        import asyncio
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(self._executor, load_state, self.data, directory)
+        if state is None:
+            return None
+        # Поки завантажували, лобі міг створити інший клієнт
+        return self.sessions.get(lobby) or self._attach(lobby, state, directory)
+    
+    async def _close(self, lobby: str) -> None:
+        pending = self._persisting.get(lobby)
+        if pending is not None:
+            await pending
+        self.sessions.pop(lobby, None)
+    
+    def _schedule_persist(self, lobby: str) -> None:
+        import asyncio
+        if lobby not in self._persisting and self.sessions[lobby].get("_dirty"):
+            self._persisting[lobby] = asyncio.ensure_future(self._persist(lobby))
+    
+    async def _persist(self, lobby: str) -> None:
+        """Записує зміни лобі; зміни, що з'явились під час запису, записує наступним кроком."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                state = self.sessions.get(lobby)
+                if state is None or not state.get("_dirty"):
+                    return
+                names, state["_pending"], state["_dirty"] = state["_pending"], set(), False
+                snapshot = persistable_state(state)
+                players = [state["players"][name].copy() for name in names if name in state["players"]]
+                await loop.run_in_executor(
+                    self._executor, write_session_files, state_dir(state), snapshot, players,
+                    card_cache(state)
+                )
+        finally:
+            self._persisting.pop(lobby, None)
+
+# Команди навантажувального клієнта; {name} — випадковий гравець лобі
+LOADGEN_COMMANDS = [
+    "health {name}", "body {name}", "trait {name}", "hobby {name}", "fobia {name}",
+    "job {name}", "age {name}", "gender {name}", "job_exp {name}", "hobby_exp {name}",
+    "fobia_percent {name}", "extra {name}", "regen {name} all", "regen_all age",
+]
+
+async def run_load_generator(host: str, port: int, lobbies: int, players: int,
+                             commands: int, connections: int) -> dict:
+    """Навантажує сервер командами і вимірює пропускну здатність та затримки."""
+    import asyncio
+    streams = [await asyncio.open_connection(host, port, limit=2 ** 20) for _ in range(connections)]
+    
+    async def request(stream, line: str) -> dict:
+        reader, writer = stream
+        writer.write((line + "\n").encode("utf-8"))
+        await writer.drain()
+        return json.loads(await reader.readline())
+    
+    names = [f"p{i}" for i in range(players)]
+    lobby_ids = [f"load{os.getpid()}_{i}" for i in range(lobbies)]
+    
+    async def create(offset: int) -> None:
+        for lobby in lobby_ids[offset::connections]:
+            await request(streams[offset], f"{lobby} new {','.join(names)}")
+    await asyncio.gather(*(create(i) for i in range(connections)))
+    
+    latencies: List[float] = []
+    remaining = [commands]
+    
+    async def worker(stream) -> None:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            command = random.choice(LOADGEN_COMMANDS).format(name=random.choice(names))
+            started = time.perf_counter()
+            await request(stream, f"{random.choice(lobby_ids)} {command}")
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(stream) for stream in streams))
+    elapsed = time.perf_counter() - started
+    
+    for i, lobby in enumerate(lobby_ids):
+        await request(streams[i % connections], f"{lobby} close")
+    for _, writer in streams:
+        writer.close()
+    
+    latencies.sort()
+    return {
+        "commands": len(latencies),
+        "seconds": elapsed,
+        "commands_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
 
 # ================ ОСНОВНА ФУНКЦІЯ ================
 
-def main() -> None:
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Створює парсер аргументів командного рядка."""
+    parser = argparse.ArgumentParser(description="Bunker Game — генерація карток та адмін панель")
+    parser.add_argument("--seed", type=int, default=None, help="зерно нової сесії (для відтворюваності)")
+    commands = parser.add_subparsers(dest="command")
+    
+    compile_cmd = commands.add_parser("compile", help="перевірити data.json та перебудувати кеш каталогу")
+    compile_cmd.add_argument("--data", default=DATA_FILE, help="шлях до data.json")
+    
+    convert = commands.add_parser("convert", help="конвертувати знімок стану між JSON та бінарним форматом")
+    convert.add_argument("source", help="вхідний знімок (формат визначається автоматично)")
+    convert.add_argument("target", help="результат: *.json — JSON, інше — бінарний")
+    convert.add_argument("--compression", choices=sorted(BINARY_CODECS), default=STATE_COMPRESSION,
+                         help="стиснення бінарного знімка")
+    
+    generate = commands.add_parser("generate", help="згенерувати багато лобі без діалогу")
+    generate.add_argument("--lobbies", type=int, default=1)
+    generate.add_argument("--players", type=int, default=8)
+    generate.add_argument("--out", default=GENERATE_DIR, help="директорія для лобі")
+    generate.add_argument("--workers", type=int, default=None, help="кількість процесів (за замовчуванням — усі ядра)")
+    generate.add_argument("--items", type=int, default=2, help="предметів у рюкзаку на гравця")
+    generate.add_argument("--cards", type=int, default=2, help="спеціальних карток на гравця")
+    generate.add_argument("--bulk", action="store_true", help="векторна генерація гравців (потрібен NumPy)")
+    
+    run = commands.add_parser("run", help="виконати команди зі скрипта однією транзакцією")
+    run.add_argument("script", nargs="?", default="-", help="файл з командами (за замовчуванням — stdin)")
+    
+    serve = commands.add_parser("serve", help="запустити асинхронний сервер для багатьох лобі")
+    serve.add_argument("--host", default=SERVER_HOST)
+    serve.add_argument("--port", type=int, default=SERVER_PORT)
+    serve.add_argument("--dir", default=LOBBIES_DIR, help="директорія для файлів лобі")
+    
+    card = commands.add_parser("card", help="показати картку гравця чи бункер лобі (з архіву або окремого файлу)")
+    card.add_argument("name", help="ім'я гравця або bunker")
+    card.add_argument("--dir", default=PLAYERS_DIR, help="директорія лобі")
+    card.add_argument("--format", choices=list(CARD_FORMATS), default="txt",
+                      help="json та html рендеряться зі збереженого стану лобі")
+    
+    simulate_parser = commands.add_parser("simulate", help="Монте-Карло: частоти карток і подій у багатьох роздачах")
+    simulate_parser.add_argument("--deals", type=int, default=100000)
+    simulate_parser.add_argument("--players", type=int, default=8)
+    simulate_parser.add_argument("--workers", type=int, default=None, help="кількість процесів (за замовчуванням — усі ядра)")
+    simulate_parser.add_argument("--items", type=int, default=2, help="предметів у рюкзаку на гравця")
+    simulate_parser.add_argument("--cards", type=int, default=2, help="спеціальних карток на гравця")
+    simulate_parser.add_argument("--top", type=int, default=5, help="скільки найчастіших значень поля виводити")
+    simulate_parser.add_argument("--output", help="записати всі частоти у JSON")
+    
+    loadgen = commands.add_parser("loadgen", help="навантажити сервер і виміряти команди/с та p99")
+    loadgen.add_argument("--host", default=SERVER_HOST)
+    loadgen.add_argument("--port", type=int, default=SERVER_PORT)
+    loadgen.add_argument("--lobbies", type=int, default=200)
+    loadgen.add_argument("--players", type=int, default=8)
+    loadgen.add_argument("--commands", type=int, default=20000)
+    loadgen.add_argument("--connections", type=int, default=50)
+    
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> None:
     """Головна функція програми."""
+    args = build_arg_parser().parse_args(argv)
+    
+    if DURABILITY not in DURABILITY_LEVELS:
+        print(f"❌ BUNKER_DURABILITY={DURABILITY}: очікується одне з {', '.join(DURABILITY_LEVELS)}")
+        sys.exit(1)
+    if OUTPUT_LAYOUT not in OUTPUT_LAYOUTS:
+        print(f"❌ BUNKER_OUTPUT_LAYOUT={OUTPUT_LAYOUT}: очікується одне з {', '.join(OUTPUT_LAYOUTS)}")
+        sys.exit(1)
+    
+    if args.command == "convert":
+        convert_state_file(args.source, args.target, args.compression)
+        print(f"✅ {args.source} → {args.target}")
+        return
+    
+    if args.command == "compile":
+        try:
+            catalog = compile_data_file(args.data, os.path.splitext(args.data)[0] + ".cache")
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        cards = sum(len(catalog[section]) for section in CARD_SECTIONS)
+        print(f"✅ Каталог скомпільовано: {cards} унікальних карток")
+        return
+    
+    if args.command == "generate":
+        if args.bulk and load_numpy() is None:
+            print("⚠️ NumPy не встановлено — гравці генеруються звичайним способом")
+        report = generate_lobbies(args.lobbies, args.players, args.out, args.workers, args.items, args.cards,
+                                  seed=args.seed, bulk=args.bulk)
+        print(f"✅ {report['lobbies']} лобі ({report['players']} гравців) за {report['seconds']:.2f} с "
+              f"на {report['workers']} процесах — {report['lobbies_per_sec']:.0f} лобі/с (зерно {report['seed']})")
+        return
+    
+    if args.command == "card":
+        if args.format != "txt":
+            sys.exit(0 if print_card(args.dir, args.name, args.format) else 1)
+        name = BUNKER_FILE if args.name == "bunker" else player_card_name({"name": args.name})
+        text = read_card_text(args.dir, name)
+        if text is None:
+            print(f"❌ Картку {args.name} у {args.dir} не знайдено")
+            sys.exit(1)
+        print(text)
+        return
+    
+    if args.command == "simulate":
+        stats, report = simulate(args.deals, args.players, args.workers, args.items, args.cards, seed=args.seed)
+        print(f"✅ {report['deals']} роздач по {report['players']} гравців за {report['seconds']:.2f} с "
+              f"на {report['workers']} процесах — {report['deals_per_sec']:.0f} роздач/с (зерно {report['seed']})")
+        print_simulation(stats, args.top)
+        if args.output:
+            save_json_file(args.output, {**report, **stats.to_dict()})
+            print(f"💾 Частоти записано у {args.output}")
+        return
+    
+    if args.command == "run":
+        sys.exit(0 if run_script_file(args.script) else 1)
+    
+    if args.command == "serve":
+        import asyncio
+        server = GameServer(load_data(), args.dir)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            print("\n🛑 Сервер зупинено")
+        finally:
+            sync_writes()
+        return
+    
+    if args.command == "loadgen":
+        import asyncio
+        report = asyncio.run(run_load_generator(
+            args.host, args.port, args.lobbies, args.players, args.commands, args.connections
+        ))
+        print(f"Команд: {report['commands']} за {report['seconds']:.2f} с "
+              f"({report['commands_per_sec']:.0f} команд/с)")
+        print(f"Затримка: p50 {report['p50_ms']:.2f} мс, p99 {report['p99_ms']:.2f} мс, "
+              f"макс {report['max_ms']:.2f} мс")
+        return
+    
+    run_admin_panel(args.seed)
+
+def print_card(directory: str, name: str, card_format: str) -> bool:
+    """Друкує картку гравця лобі у форматі card_format, рендерячи її зі збереженого стану."""
+    try:
+        data = load_data()
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    
+    state = load_state(data, directory)
+    if state is None:
+        print(f"❌ Стану лобі у {directory} не знайдено")
+        return False
+    _, player = PlayerOperations.find_player(state, name)
+    if player is None:
+        print(f"❌ Гравця {name} не знайдено")
+        return False
+    print(render_card(player, (card_format,))[card_format])
+    return True
+
+def run_script_file(script: str) -> bool:
+    """Виконує скрипт команд над збереженою сесією ("-" — читати stdin)."""
+    try:
+        data = load_data()
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    
+    state = load_state(data)
+    if state is None:
+        print("❌ Збереженої сесії не знайдено — спершу запустіть гру")
+        return False
+    if BACKGROUND_WRITES:
+        state["_writer"] = BackgroundWriter()
+    
+    if script == "-":
+        return run_script(state, data, sys.stdin)
+    try:
+        with open(script, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError as e:
+        print(f"❌ Не вдалося прочитати скрипт: {e}")
+        return False
+    return run_script(state, data, lines)
+
+def run_admin_panel(seed: Optional[int] = None) -> None:
+    """Інтерактивна сесія: нова генерація або продовження збереженої гри."""
     if not os.path.exists(DATA_FILE):
         print(f"Не знайдено {DATA_FILE}. Створи data.json")
         sys.exit(1)
     
-    data = load_data()
+    try:
+        data = load_data()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
     
     # Спробувати завантажити збережений стан
-    state = load_state()
+    state = load_state(data)
     if state:
         print("Знайдено попередній стан гри.")
         answer = input("Завантажити попередній стан? (Y/n) > ").strip().lower()
         if answer in ("", "y", "yes"):
             print("Завантажую стан...")
+            if BACKGROUND_WRITES:
+                state["_writer"] = BackgroundWriter()
             interactive_loop(state, data)
             return
     
@@ -1198,31 +4373,54 @@ def main() -> None:
         print("❌ Не введено жодного імені")
         return
     
-    items_per_player = 2
-    cards_per_player = 2
-    
-    # Генеруємо гравців
-    players, pool_manager = generate_players(player_names, data, items_per_player, cards_per_player)
+    state = create_session_state(player_names, data, seed=seed)
+    print(f"Зерно сесії: {state['seed']}")
+    if BACKGROUND_WRITES:
+        state["_writer"] = BackgroundWriter()
     
     # Зберігаємо файли
-    save_player_files(players)
-    generate_bunker(data)
+    writer = state.get("_writer")
+    save_player_files(state["players"], state_dir(state), card_cache(state), writer)
+    save_bunker_file(state["bunker"], state_dir(state), card_cache(state), writer)
+    
+    save_state(state)
+    print("Генерація завершена.")
+    interactive_loop(state, data)
+
+def create_session_state(player_names: List[str], data: dict, items_per_player: int = 2,
+                         cards_per_player: int = 2, seed: Optional[int] = None, bulk: bool = False) -> dict:
+    """Генерує гравців та створює стан нової сесії (без запису на диск).
+    
+    Гравці та бункер генеруються потоком для tick 0, тож обидва залежать
+    від зерна. Команди починаються з tick 1. bulk — векторна генерація
+    (generate_players_bulk), якщо встановлено NumPy; з тим самим зерном
+    вона дає інших гравців, ніж звичайна.
+    """
+    if seed is None:
+        seed = new_seed()
+    rng = random.Random(derive_seed(seed, 0))
+    if bulk and load_numpy() is not None:
+        batch, pools = generate_players_bulk(player_names, data, items_per_player, cards_per_player,
+                                             derive_seed(seed, 0))
+        players = batch.players()
+    else:
+        players, pool_manager = generate_players(player_names, data, items_per_player, cards_per_player, rng)
+        pools = pool_manager.pools
     
-    # Створюємо стан
     state = {
         "players": players,
+        "bunker": roll_bunker(data, rng),
         "items_per_player": items_per_player,
         "cards_per_player": cards_per_player,
+        "seed": seed,
+        "tick": 1,
+        "_index": PlayerIndex(players),
     }
     
     # Додаємо всі пули до стану
-    for pool_name, pool in pool_manager.pools.items():
-        if pool_name != "ages":  # ages не зберігається окремо
-            state[f"{pool_name}_pool"] = pool
-    
-    save_state(state)
-    print("Генерація завершена.")
-    interactive_loop(state, data)
+    for pool_name, pool in pools.items():
+        state[f"{pool_name}_pool"] = pool
+    return state
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import load_catalog  # noqa: E402
+
+
+@pytest.fixture
+def data():
+    return load_catalog()
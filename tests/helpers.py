@@ -0,0 +1,35 @@
+import os
+
+import bunker
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data.json")
+NAMES = ["Анна", "Богдан", "Віра", "Гліб"]
+COMMANDS = ["job Анна", "hobby Богдан", "fobia_percent Віра", "regen Гліб all", "add backpack Анна 2",
+            "regen_all health", "regen bunker"]
+
+
+def load_catalog():
+    return bunker.compile_data(bunker.load_json_file(DATA_PATH))
+
+
+def new_session(data, directory, names=NAMES, seed=21):
+    state = bunker.create_session_state(names, data, seed=seed)
+    state["_dir"] = str(directory)
+    bunker.save_player_files(state["players"], str(directory), bunker.card_cache(state))
+    bunker.save_bunker_file(state["bunker"], str(directory), bunker.card_cache(state))
+    bunker.save_state(state)
+    return state
+
+
+def run_commands(state, data, commands):
+    command_map = bunker.build_command_map(state, data)
+    for line in commands:
+        assert bunker.dispatch_command(state, data, command_map, line.split()), line
+
+
+def read_files(directory):
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            files[name] = f.read()
+    return files
@@ -0,0 +1,34 @@
+from collections import Counter
+
+import pytest
+
+import bunker
+
+from helpers import run_commands
+
+pytest.importorskip("numpy")
+
+NAMES = [f"Гравець{i}" for i in range(30)]
+
+
+def test_bulk_generation_deals_from_decks(data):
+    state = bunker.create_session_state(NAMES, data, seed=4, bulk=True)
+    again = bunker.create_session_state(NAMES, data, seed=4, bulk=True)
+    assert state["players"] == again["players"]
+    
+    players = list(state["players"].values())
+    assert all(isinstance(player, bunker.Player) for player in players)
+    assert all(len(player.backpack) == state["items_per_player"] for player in players)
+    assert all(len(player.special_cards) == state["cards_per_player"] for player in players)
+    
+    # Роздані картки і залишок колоди разом дають секцію каталогу
+    dealt = Counter(player.job for player in players)
+    assert dealt + Counter(state["jobs_pool"].to_list()) == Counter(data["jobs"])
+
+
+def test_bulk_session_accepts_commands(data, tmp_path, capsys):
+    state = bunker.create_session_state(NAMES, data, seed=4, bulk=True)
+    state["_dir"] = str(tmp_path)
+    run_commands(state, data, ["job Гравець3", "regen_all fobia", "add backpack Гравець7 1"])
+    capsys.readouterr()
+    assert len(state["players"]["Гравець7"].backpack) == state["items_per_player"] + 1
@@ -0,0 +1,72 @@
+import os
+
+import bunker
+
+from helpers import load_catalog, new_session, run_commands
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data.json")
+
+
+def test_card_cache_writes_compiled_text(tmp_path):
+    data = bunker.compile_data(bunker.load_json_file(DATA_PATH))
+    state = bunker.create_session_state(["Анна", "Богдан"], data, seed=5)
+    player = state["players"]["Анна"]
+    cache = bunker.CardCache()
+    path = bunker.player_card_path(player, str(tmp_path))
+    
+    assert cache.save(player, str(tmp_path))
+    assert not cache.save(player, str(tmp_path))
+    
+    player.job_level = 4
+    player.special_cards = ["Імунітет"]
+    assert cache.save(player, str(tmp_path))
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == bunker.render_player_card(player)
+    assert "професіонал" in bunker.render_player_card(player)
+
+
+def test_sessions_unpack_generated_archive(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bunker, "OUTPUT_LAYOUT", "archive")
+    data = bunker.compile_data(bunker.load_json_file(DATA_PATH))
+    bunker.generate_lobby(data, str(tmp_path), 3, seed=9)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [bunker.ARCHIVE_FILE, bunker.STATE_FILE]
+    
+    state = bunker.load_state(data, str(tmp_path))
+    assert not (tmp_path / bunker.ARCHIVE_FILE).exists()
+    command_map = bunker.build_command_map(state, data)
+    assert bunker.dispatch_command(state, data, command_map, ["job", "Гравець 2"])
+    capsys.readouterr()
+    
+    card = tmp_path / "Гравець 2.txt"
+    assert card.read_text(encoding="utf-8") == bunker.render_player_card(state["players"]["Гравець 2"])
+    assert not (tmp_path / bunker.ARCHIVE_FILE).exists()
+
+
+def test_command_rewrites_only_changed_player(tmp_path, monkeypatch, capsys):
+    data = load_catalog()
+    state = new_session(data, tmp_path)
+    written = []
+    apply_write = bunker._apply_write
+    
+    def record(path, op, content=None):
+        written.append(os.path.basename(path))
+        apply_write(path, op, content)
+    
+    monkeypatch.setattr(bunker, "_apply_write", record)
+    run_commands(state, data, ["job Анна", "fobia_percent Віра"])
+    bunker.flush_writes(state)
+    capsys.readouterr()
+    
+    cards = [name for name in written if name.endswith(".txt")]
+    assert sorted(cards) == ["Анна.txt", "Віра.txt"]
+
+
+def test_text_card_matches_field_table():
+    data = load_catalog()
+    state = bunker.create_session_state([f"Гравець {i}" for i in range(20)], data, seed=6)
+    players = list(state["players"].values())
+    players[0].special_cards = ["Імунітет"]
+    players[1].backpack = []
+    players[2].job_level = None
+    for player in players:
+        assert bunker.text_card(player) == bunker.format_text_card(bunker.card_fields(player))
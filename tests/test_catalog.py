@@ -0,0 +1,30 @@
+import json
+import pickle
+
+import bunker
+
+
+def write_data(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"jobs": ["лікар", "лікар", {"card": "пілот", "weight": 3}]}), encoding="utf-8")
+    return str(path)
+
+
+def test_catalog_cache_round_trip(tmp_path):
+    path, cache = write_data(tmp_path), str(tmp_path / "data.cache")
+    compiled = bunker.load_data(path, cache)
+    cached = bunker.load_data(path, cache)
+    
+    assert isinstance(cached, bunker.LazyCatalog)
+    assert cached.loaded() == []
+    assert cached["jobs"] == compiled["jobs"]
+    assert cached.materialize() == {key: value for key, value in compiled.items() if not key.startswith("_")}
+
+
+def test_catalog_cache_ignores_pickle(tmp_path):
+    path, cache = write_data(tmp_path), tmp_path / "data.cache"
+    cache.write_bytes(pickle.dumps({"version": bunker.CATALOG_VERSION, "sections": {}}))
+    
+    catalog = bunker.load_data(path, str(cache))
+    assert catalog["jobs"] == ["лікар", "пілот"]
+    assert cache.read_bytes().startswith(bunker.CATALOG_MAGIC)
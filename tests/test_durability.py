@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+import bunker
+
+
+def test_batch_sync_has_deadline(monkeypatch, tmp_path):
+    synced = []
+    monkeypatch.setattr(bunker, "_fsync_paths", lambda paths: synced.append(set(paths)))
+    batch = bunker.SyncBatch(20)
+    path = str(tmp_path / "state.json")
+    batch.add(path)
+    assert synced == []
+    
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert synced == [{path}]
+
+
+def test_failed_replace_keeps_old_file(tmp_path):
+    path = tmp_path / "state.json"
+    bunker.write_file(str(path), "old")
+    with pytest.raises(UnicodeEncodeError):
+        bunker.write_file(str(path), "new \ud800")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
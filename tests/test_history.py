@@ -0,0 +1,28 @@
+import bunker
+from helpers import COMMANDS, new_session, read_files, run_commands
+
+
+def without_tick(snapshot):
+    return {key: value for key, value in snapshot.items() if key != "tick"}
+
+
+def test_undo_redo_restores_state_and_files(data, tmp_path, capsys):
+    state = new_session(data, tmp_path)
+    bunker.state_tracker(state)
+    state["_history"] = history = bunker.UndoHistory()
+    run_commands(state, data, COMMANDS)
+    snapshot, files = bunker.persistable_state(state), read_files(tmp_path)
+    
+    for _ in COMMANDS:
+        assert history.undo(state)
+    assert without_tick(bunker.persistable_state(state)) != without_tick(snapshot)
+    for _ in COMMANDS:
+        assert history.redo(state)
+    capsys.readouterr()
+    
+    assert without_tick(bunker.persistable_state(state)) == without_tick(snapshot)
+    restored = read_files(tmp_path)
+    state_file = bunker.STATE_FILE
+    assert {name: blob for name, blob in restored.items() if name != state_file} == \
+        {name: blob for name, blob in files.items() if name != state_file}
+    assert without_tick(bunker.load_snapshot(str(tmp_path / state_file))) == without_tick(snapshot)
@@ -0,0 +1,46 @@
+import bunker
+from helpers import COMMANDS, new_session, run_commands
+
+
+def test_journal_replay_matches_memory(data, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bunker, "PERSISTENCE_MODE", "journal")
+    state = new_session(data, tmp_path)
+    run_commands(state, data, COMMANDS)
+    capsys.readouterr()
+    
+    assert state["_journal"].records == len(COMMANDS)
+    loaded = bunker.load_state(data, str(tmp_path))
+    assert bunker.persistable_state(loaded) == bunker.persistable_state(state)
+
+
+def test_journal_replay_is_idempotent(data, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bunker, "PERSISTENCE_MODE", "journal")
+    state = new_session(data, tmp_path)
+    run_commands(state, data, COMMANDS)
+    capsys.readouterr()
+    expected = bunker.persistable_state(state)
+    assert expected["discards"]
+    
+    # Збій між записом знімка і очищенням журналу: старий журнал лягає на новіший знімок
+    bunker.write_state_snapshot(str(tmp_path), expected)
+    snapshot = bunker.load_snapshot(str(tmp_path / bunker.STATE_FILE))
+    journal = bunker.StateJournal(str(tmp_path / bunker.JOURNAL_FILE))
+    journal.replay(snapshot)
+    journal.replay(snapshot)
+    assert snapshot == expected
+    
+    loaded = bunker.load_state(data, str(tmp_path))
+    assert bunker.persistable_state(loaded) == expected
+
+
+def test_legacy_bunker_is_read_from_text(data, tmp_path, capsys):
+    state = new_session(data, tmp_path)
+    run_commands(state, data, ["regen bunker"])
+    capsys.readouterr()
+    
+    # Сесія, збережена до появи state["bunker"]: бункер є лише в bunker.txt
+    snapshot = bunker.persistable_state(state)
+    del snapshot["bunker"]
+    bunker.write_state_snapshot(str(tmp_path), snapshot)
+    loaded = bunker.load_state(data, str(tmp_path))
+    assert loaded["bunker"] == state["bunker"]
@@ -0,0 +1,54 @@
+import bunker
+
+from helpers import NAMES
+
+
+def test_find_player_by_prefix(data, capsys):
+    state = bunker.create_session_state(NAMES + ["Андрій"], data, seed=3)
+    find = bunker.PlayerOperations.find_player
+    assert find(state, "віра")[0] == "Віра"
+    assert find(state, "бог")[0] == "Богдан"
+    assert find(state, "АНН")[0] == "Анна"
+    
+    assert find(state, "ан") == (None, None)
+    assert "неоднозначне" in capsys.readouterr().out
+    assert find(state, "Дмитро") == (None, None)
+
+
+def test_index_follows_player_changes(data):
+    state = bunker.create_session_state(NAMES, data, seed=3)
+    find = bunker.PlayerOperations.find_player
+    assert find(state, "Гліб")[0] == "Гліб"
+    
+    state["players"]["Галина"] = state["players"].pop("Гліб")
+    assert find(state, "Гліб") == (None, None)
+    assert find(state, "гал")[0] == "Галина"
+    
+    del state["players"]["Анна"]
+    state["players"]["Андрій"] = state["players"]["Віра"]
+    assert find(state, "ан")[0] == "Андрій"
+
+
+# Гравець у старому форматі: стаж і відсоток — частина рядків карток
+def legacy_fields(player):
+    fields = player.to_dict()
+    for field in ("job_level", "hobby_level", "fobia_percent"):
+        del fields[field]
+    fields.update(job=bunker.job_text(player), hobies=bunker.hobby_text(player),
+                  fobias=bunker.fobia_text(player))
+    return fields
+
+
+def test_legacy_player_strings_round_trip(data):
+    state = bunker.create_session_state([f"Гравець {i}" for i in range(40)], data, seed=8)
+    players = list(state["players"].values())
+    players[0].job_level = None
+    players[1].job_level = 7
+    players[2].hobby_level = None
+    players[3].hobby_level = 12
+    for player in players:
+        fields = legacy_fields(player)
+        assert bunker.is_legacy_player(fields)
+        restored = bunker.Player.from_dict(fields)
+        assert restored == player
+        assert bunker.render_player_card(restored) == bunker.render_player_card(player)
@@ -0,0 +1,28 @@
+import os
+
+import bunker
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data.json")
+
+
+def test_sessions_share_catalog_lookup(capsys):
+    data = bunker.compile_data(bunker.load_json_file(DATA_PATH))
+    first = bunker.create_session_state(["Анна"], data, seed=1)
+    second = bunker.create_session_state(["Богдан"], data, seed=2)
+    first["jobs_pool"].discard(data["jobs"][0])
+    
+    loaded = dict(bunker.persistable_state(second))
+    bunker.attach_card_pools(loaded, data)
+    lookup = bunker.section_sampler(data, "jobs").lookup()
+    assert first["jobs_pool"].lookup() is lookup
+    assert first["jobs_pool"].copy().lookup() is lookup
+    assert loaded["jobs_pool"].lookup() is lookup
+
+
+def test_copy_keeps_pool_class():
+    pool = bunker.DealtPool(["a", "b", "c"], base=[0, 1, 2])
+    pool.refill()
+    copy = pool.copy()
+    assert type(copy) is bunker.DealtPool
+    assert copy.unshuffled == pool.unshuffled
+    assert copy == pool
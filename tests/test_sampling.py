@@ -0,0 +1,16 @@
+import bunker
+
+
+def test_regen_cataclysm_respects_card_weight(capsys):
+    data = bunker.compile_data({"cataclysms": [{"card": "Потоп", "weight": 50}, "Чума", "Зима"]})
+    state = {"seed": 7, "bunker": {"cataclysm": "Чума"}}
+    drawn = []
+    for tick in range(400):
+        state["tick"] = tick
+        state.pop("_rng", None)
+        assert bunker.regen_cataclysm(state, data)
+        drawn.append(state["bunker"]["cataclysm"])
+    capsys.readouterr()
+    
+    assert set(drawn) <= {"Потоп", "Чума", "Зима"}
+    assert drawn.count("Потоп") > 0.9 * len(drawn)
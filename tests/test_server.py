@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import bunker
+
+
+def test_command_output_is_per_session(data, tmp_path, monkeypatch, capsys):
+    regen_bunker = bunker.regen_bunker
+    
+    # Інший потік друкує, поки виконується команда лобі
+    def regen_with_background_print(state, data):
+        thread = threading.Thread(target=print, args=("фоновий запис",))
+        thread.start()
+        thread.join()
+        return regen_bunker(state, data)
+    
+    monkeypatch.setattr(bunker, "regen_bunker", regen_with_background_print)
+    server = bunker.GameServer(data, str(tmp_path))
+    
+    async def session():
+        created = await server.execute("alpha new Анна, Богдан seed=3")
+        response = await server.execute("alpha regen bunker")
+        missing = await server.execute("alpha job Дмитро")
+        await server.flush()
+        return created, response, missing
+    
+    try:
+        created, response, missing = asyncio.run(session())
+    finally:
+        server._executor.shutdown(wait=True)
+    assert created["ok"]
+    assert response == {"ok": True, "output": "✅ Бункер перегенеровано\n"}
+    assert missing == {"ok": False, "output": "❌ Гравця Дмитро не знайдено\n"}
+    assert capsys.readouterr().out == "фоновий запис\n"
+    assert "_output" not in server.sessions["alpha"]
@@ -0,0 +1,26 @@
+import bunker
+from helpers import new_session, read_files
+
+
+def test_failed_script_leaves_files_untouched(data, tmp_path, capsys):
+    state = new_session(data, tmp_path)
+    snapshot, files = bunker.persistable_state(state), read_files(tmp_path)
+    
+    assert not bunker.run_script(state, data, ["job Анна", "regen Богдан all", "job Нікого"])
+    capsys.readouterr()
+    
+    assert read_files(tmp_path) == files
+    assert bunker.persistable_state(state) == snapshot
+
+
+def test_script_commits_once(data, tmp_path, capsys):
+    state = new_session(data, tmp_path)
+    tick = state["tick"]
+    
+    assert bunker.run_script(state, data, ["# коментар", "job Анна", "", "hobby Богдан", "exit", "job Віра"])
+    capsys.readouterr()
+    
+    assert state["tick"] == tick + 2
+    assert bunker.load_snapshot(str(tmp_path / bunker.STATE_FILE)) == bunker.persistable_state(state)
+    card = (tmp_path / "Анна.txt").read_text(encoding="utf-8")
+    assert card == bunker.render_player_card(state["players"]["Анна"])
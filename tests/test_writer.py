@@ -0,0 +1,13 @@
+import bunker
+
+
+def test_background_writer_survives_unexpected_error(tmp_path, capsys):
+    writer = bunker.BackgroundWriter()
+    writer.submit(str(tmp_path / "bad.txt"), "replace", 42)
+    writer.flush()
+    assert "bad.txt" in capsys.readouterr().out
+    
+    writer.submit(str(tmp_path / "ok.txt"), "replace", "текст")
+    writer.flush()
+    assert (tmp_path / "ok.txt").read_text(encoding="utf-8") == "текст"
+    assert not writer.pending(str(tmp_path / "ok.txt"))